@@ -0,0 +1,27 @@
+"""
+Benchmarks for holtz.
+
+Run a benchmark module directly, for example::
+
+    python -m benchmarks.parse
+"""
+import time
+
+
+
+def timed(f, *args, **kwargs):
+    """
+    Calls f with the given arguments and returns the wall-clock seconds it
+    took.
+    """
+    start = time.time()
+    f(*args, **kwargs)
+    return time.time() - start
+
+
+
+def best(f, repeat=3, *args, **kwargs):
+    """
+    Returns the best of a few timings of f.
+    """
+    return min(timed(f, *args, **kwargs) for _ in range(repeat))
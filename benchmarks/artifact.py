@@ -0,0 +1,39 @@
+"""
+Compares loading a config by parsing it with loading its artifact.
+"""
+import os
+import shutil
+import tempfile
+
+from holtz import artifact
+
+from benchmarks import best
+from benchmarks.configs import deepConfig
+
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "holtz.conf")
+        print("{:>8} {:>10} {:>10}".format("lines", "parse", "artifact"))
+        for lines in 10000, 40000:
+            with open(path, "w") as f:
+                f.write("\n".join(deepConfig(lines, 4)))
+
+            def parse():
+                os.remove(path + artifact.SUFFIX)
+                artifact.load(path)
+
+            artifact.load(path)
+            parseSeconds = best(parse)
+            loadSeconds = best(artifact.load, 3, path)
+            print("{:>8} {:>10.3f} {:>10.3f}".format(
+                lines, parseSeconds, loadSeconds))
+    finally:
+        shutil.rmtree(directory)
+
+
+
+if __name__ == "__main__":
+    main()
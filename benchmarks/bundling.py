@@ -0,0 +1,66 @@
+"""
+Compares serving a page's scripts one by one with serving them as a
+bundle: how long the requests for a page take in-process, from looking
+their paths up to writing their bodies, and how many there are.
+"""
+import shutil
+import tempfile
+
+from twisted.internet import defer
+from twisted.python import filepath
+
+from holtz import caching, config, execution, processing, resolve, server
+
+from benchmarks import best
+from benchmarks.suite import BenchmarkRequest
+
+siteConfig = """
+js/
+    app.js: Bundle("*.js")
+    *.js: None
+""".lstrip("\n")
+
+
+
+def servePaths(tree, directory, paths, pages):
+    for _ in range(pages):
+        for path in paths:
+            filePath, effect = server.lookup(tree, directory, path)
+            request = BenchmarkRequest()
+            effect(filePath, request, {})
+            assert request.written, path
+
+
+
+def main(scripts=30, size=2 ** 11, pages=1000):
+    synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+    processing.executor = execution.Executor(synchronous)
+    processing.cache = caching.OutputCache()
+    processing.files = caching.FileCache(maxMemorySize=2 ** 16)
+    tree = resolve.PathResolver(config.parse(siteConfig.splitlines(True)))
+
+    directory = filepath.FilePath(tempfile.mkdtemp())
+    try:
+        js = directory.child("js")
+        js.makedirs()
+        for i in range(scripts):
+            js.child("s{:02}.js".format(i)).setContent(b"x" * size)
+
+        request = BenchmarkRequest()
+        filePath, effect = server.lookup(tree, directory, "/js/app.js")
+        effect(filePath, request, {})
+        bundled = "/js/" + request.responseHeaders["Location"]
+
+        separate = ["/js/s{:02}.js".format(i) for i in range(scripts)]
+        print("{:>10} {:>9} {:>14}".format("", "requests", "ms per page"))
+        for name, paths in ("separate", separate), ("bundled", [bundled]):
+            seconds = best(servePaths, 3, tree, directory, paths, pages)
+            print("{:>10} {:>9} {:>14.3f}".format(
+                name, len(paths), seconds / pages * 1e3))
+    finally:
+        shutil.rmtree(directory.path)
+
+
+
+if __name__ == "__main__":
+    main()
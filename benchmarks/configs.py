@@ -0,0 +1,66 @@
+"""
+Generators of synthetic configs, as lists of lines ending with an empty one.
+
+Deep configs nest directories, wide configs put many entries in a single
+directory, and glob-heavy configs are made of conditions with alternations,
+wildcards and escapes.
+"""
+from holtz import config
+
+
+
+def deepConfig(lines, depth, indent=config.FOUR_SPACES):
+    """
+    Generates a config of roughly the given number of lines, made of blocks
+    of directories nested to the given depth with a few entries at every
+    level.
+    """
+    out = []
+    block = 0
+    while len(out) < lines:
+        for level in range(depth):
+            out.append("{}d{}_{}/".format(indent * level, block, level))
+            for i in range(3):
+                entry = "f{}_*.{{js,css}}: Minify()".format(i)
+                out.append(indent * (level + 1) + entry)
+        block += 1
+    out.append("")
+    return out
+
+
+
+def wideConfig(lines, globEvery=10):
+    """
+    Generates a config with the given number of entries in its root
+    directory. Every globEvery-th entry is a glob; the others are literal
+    names.
+    """
+    out = []
+    for i in range(lines):
+        if i % globEvery:
+            out.append("page{}.html: None".format(i))
+        else:
+            out.append("g{}_*.{{js,css}}: Minify()".format(i))
+    out.append("")
+    return out
+
+
+
+def globConfig(lines, perDirectory=50):
+    """
+    Generates a config of roughly the given number of lines, made of
+    directories with entries that are all globs with alternations,
+    wildcards, single-character wildcards and escapes.
+    """
+    out = []
+    block = 0
+    while len(out) < lines:
+        out.append("g{}/".format(block))
+        for i in range(perDirectory):
+            entry = ("*-{0}-?*.{{min.js,js,css,le\\,ss}}: Minify()",
+                     "{{a,b,c}}{0}_*_*_\\*.txt: None",
+                     "x?{0}*\\{{raw\\}}*: None")[i % 3].format(i)
+            out.append(config.FOUR_SPACES + entry)
+        block += 1
+    out.append("")
+    return out
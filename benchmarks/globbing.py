@@ -0,0 +1,104 @@
+"""
+Compares matching names against glob patterns with the glob automaton and
+with regexes, as conditions used to be matched.
+
+The adversarial patterns have several wildcards and the names almost match
+them, which makes a backtracking regex engine try every way of splitting
+the name between the wildcards. The wide directory has many globs, which
+regexes had to be combined in chunks for.
+"""
+import re
+
+from holtz import globbing
+from holtz.globbing import ANY, STAR
+
+from benchmarks import best
+
+
+# Regexes taking longer than this are not tried on longer names.
+SLOW_SECONDS = 2.0
+
+
+
+def regexPattern(pattern):
+    """
+    Translates a glob pattern into a regex, the way conditions used to be.
+    """
+    parts = []
+    for part in pattern:
+        if part == STAR:
+            parts.append(".*")
+        elif part == ANY:
+            parts.append(".")
+        elif isinstance(part, tuple):
+            options = "|".join(re.escape(option) for option in part)
+            parts.append("(?:{})".format(options))
+        else:
+            parts.append(re.escape(part))
+    return "".join(parts) + "$"
+
+
+
+def adversarial(stars=4, lengths=(25, 50, 100, 200, 400)):
+    print("adversarial: ({}) against a*n".format(
+        "*a" * stars + "b"))
+    print("{:>8} {:>12} {:>12}".format("n", "regex", "automaton"))
+
+    pattern = (STAR, "a") * stars + ("b",)
+    regex = re.compile(regexPattern(pattern))
+    matches = globbing.compile(pattern)
+    regexSeconds = 0
+    for length in lengths:
+        name = "a" * length
+        if regexSeconds < SLOW_SECONDS:
+            regexSeconds = best(regex.match, 1, name)
+            regexColumn = "{:>12.6f}".format(regexSeconds)
+        else:
+            regexColumn = "{:>12}".format("-")
+        automatonSeconds = best(matches, 3, name)
+        print("{:>8} {} {:>12.6f}".format(length, regexColumn,
+                                          automatonSeconds))
+
+
+
+def wide(globs=(10, 100, 1000), repeat=10000, chunk=90):
+    print("wide: microseconds per match of the last of many globs")
+    print("{:>8} {:>12} {:>12}".format("globs", "regex", "automaton"))
+
+    for count in globs:
+        patterns = [(i, ("f{}_".format(i), STAR, ".", ("js", "css")))
+                    for i in range(count)]
+        regexes = []
+        for start in range(0, count, chunk):
+            alternatives = ["(?P<e{}>{})".format(i, regexPattern(p))
+                            for i, p in patterns[start:start + chunk]]
+            regexes.append(re.compile("|".join(alternatives)))
+        automaton = globbing.Automaton(patterns)
+        name = "f{}_app.js".format(count - 1)
+
+        def matchRegexes():
+            for _ in range(repeat):
+                for regex in regexes:
+                    if regex.match(name) is not None:
+                        break
+
+        def matchAutomaton():
+            for _ in range(repeat):
+                automaton.match(name)
+
+        print("{:>8} {:>12.3f} {:>12.3f}".format(
+            count,
+            best(matchRegexes, 3) / repeat * 1e6,
+            best(matchAutomaton, 3) / repeat * 1e6))
+
+
+
+def main():
+    adversarial()
+    print("")
+    wide()
+
+
+
+if __name__ == "__main__":
+    main()
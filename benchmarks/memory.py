@@ -0,0 +1,57 @@
+"""
+Measures how much memory a parsed config takes.
+
+Every config is parsed in a fresh interpreter, and the growth of its peak
+resident set size is reported, so earlier runs don't skew later ones.
+"""
+import resource
+import subprocess
+import sys
+
+from benchmarks.configs import deepConfig
+from benchmarks.parse import parseLines
+
+
+
+def peakKilobytes():
+    """
+    Returns the peak resident set size of this process, in kilobytes.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+
+def measure(lines, depth):
+    """
+    Parses a generated config in this process and returns how many
+    kilobytes the peak resident set size grew by.
+    """
+    generated = deepConfig(lines, depth)
+    before = peakKilobytes()
+    root = parseLines(generated) # kept alive until measured
+    del generated
+    return peakKilobytes() - before
+
+
+
+def main(argv=sys.argv[1:]):
+    if argv:
+        lines, depth = map(int, argv)
+        print(measure(lines, depth))
+        return
+
+    print("{:>8} {:>6} {:>10} {:>12}".format("lines", "depth", "KiB",
+                                             "bytes/line"))
+    for lines in 10000, 40000, 160000:
+        for depth in 1, 8:
+            output = subprocess.check_output([
+                sys.executable, "-m", "benchmarks.memory",
+                str(lines), str(depth)])
+            kilobytes = int(output)
+            print("{:>8} {:>6} {:>10} {:>12.0f}".format(
+                lines, depth, kilobytes, kilobytes * 1024.0 / lines))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Compares parsing a large config in one process with parsing it in
+parallel with different numbers of processes.
+
+The pool is made before timing starts, so only parsing, shipping batches
+to the workers and putting the trees back together is measured.
+"""
+import multiprocessing
+
+from holtz import config, parallel
+
+from benchmarks import best
+from benchmarks.configs import deepConfig
+
+
+
+def main(lines=200000):
+    generated = deepConfig(lines, 4)
+    cpus = multiprocessing.cpu_count()
+    print("{} lines, {} CPUs".format(len(generated), cpus))
+    print("{:>10} {:>10}".format("processes", "seconds"))
+    print("{:>10} {:>10.3f}".format(
+        "-", best(config.parse, 3, generated)))
+
+    for processes in sorted(set([2, 4, cpus])):
+        pool = multiprocessing.Pool(processes)
+        try:
+            seconds = best(parallel.parse, 3, generated, None, pool,
+                           processes)
+        finally:
+            pool.close()
+            pool.join()
+        print("{:>10} {:>10.3f}".format(processes, seconds))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Measures how parse time scales with config size and nesting depth.
+
+Time per line should stay flat as the nesting depth grows.
+"""
+from holtz import config
+
+from benchmarks import best
+from benchmarks.configs import deepConfig
+
+
+
+def parseLines(lines):
+    parser = config.Parser()
+    for line in lines:
+        parser.push(line)
+    return parser.root
+
+
+
+def main():
+    print("{:>8} {:>6} {:>10} {:>12}".format("lines", "depth", "seconds",
+                                             "us/line"))
+    for lines in 10000, 40000:
+        for depth in 1, 8, 32, 128:
+            generated = deepConfig(lines, depth)
+            seconds = best(parseLines, 3, generated)
+            perLine = seconds / len(generated) * 1e6
+            print("{:>8} {:>6} {:>10.3f} {:>12.2f}".format(
+                len(generated), depth, seconds, perLine))
+
+
+
+if __name__ == "__main__":
+    main()
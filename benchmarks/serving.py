@@ -0,0 +1,172 @@
+"""
+Compares requests per second of the twisted.web and asyncio backends.
+
+Both serve the same generated directory with the same config, each from its
+own process. Clients run in separate processes too, and send requests one
+after the other over keep-alive connections.
+
+Needs Python 3.7 or later for the asyncio backend.
+"""
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from twisted.python import filepath
+
+from holtz import aio, config, processing, resolve, server
+
+siteConfig = """
+*.html: None
+*.js: None
+*.txt: Upper()
+""".lstrip("\n")
+
+FILES = {
+    "index.html": b"<p>hello</p>" * 100,
+    "app.js": b"var x = 1;\n" * 25000,
+    "notes.txt": b"shout\n" * 1000,
+}
+
+
+
+class Upper(object):
+    class producer(object):
+        contentType = "text/plain"
+
+
+    def process(self, content):
+        return content.upper()
+
+
+
+def _site(directory):
+    with open(os.path.join(directory, "holtz.conf")) as f:
+        tree = resolve.PathResolver(config.parse(f))
+    return tree, filepath.FilePath(directory), {"Upper": Upper}
+
+
+
+def serveTwisted(directory, port):
+    from twisted.internet import reactor
+    from twisted.web import server as web
+
+    resource = server.HoltzResource(*_site(directory))
+    reactor.listenTCP(port, web.Site(resource), interface="127.0.0.1")
+    reactor.callWhenRunning(_ready)
+    reactor.run()
+
+
+
+def serveAsyncio(directory, port):
+    loop = aio.asyncio.new_event_loop()
+    processing.executor = aio.executor(loop)
+    site = aio.Site(*_site(directory))
+    loop.run_until_complete(aio.serve(site, port=port, loop=loop))
+    _ready()
+    loop.run_forever()
+
+
+
+def _ready():
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+
+
+
+BACKENDS = {"twisted": serveTwisted, "asyncio": serveAsyncio}
+
+
+
+def client(args):
+    """
+    Sends some requests for a path over one connection.
+
+    Returns the number of body bytes received.
+    """
+    port, path, requests = args
+    connection = socket.create_connection(("127.0.0.1", port))
+    f = connection.makefile("rb")
+    request = "GET {} HTTP/1.1\r\nHost: x\r\n\r\n".format(path).encode()
+    received = 0
+    try:
+        for _ in range(requests):
+            connection.sendall(request)
+            length = 0
+            for line in iter(f.readline, b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            received += len(f.read(length))
+    finally:
+        f.close()
+        connection.close()
+    return received
+
+
+
+def _freePort():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+
+def measure(backend, directory, path, connections=4, requests=500):
+    """
+    Measures the requests per second a backend serves for a path.
+    """
+    port = _freePort()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serving", backend, directory,
+         str(port)], stdout=subprocess.PIPE)
+    try:
+        process.stdout.readline()
+        pool = multiprocessing.Pool(connections)
+        try:
+            pool.map(client, [(port, path, 10)] * connections) # warm up
+            start = time.time()
+            pool.map(client, [(port, path, requests)] * connections)
+            seconds = time.time() - start
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        process.terminate()
+        process.wait()
+    return connections * requests / seconds
+
+
+
+def main(argv=sys.argv[1:]):
+    if argv:
+        backend, directory, port = argv
+        BACKENDS[backend](directory, int(port))
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(directory, "holtz.conf"), "w") as f:
+            f.write(siteConfig)
+        for name, content in FILES.items():
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(content)
+
+        print("{:>12} {:>10} {:>10}".format("path", "twisted", "asyncio"))
+        for name in sorted(FILES):
+            path = "/" + name
+            rates = [measure(backend, directory, path)
+                     for backend in ("twisted", "asyncio")]
+            print("{:>12} {:>10.0f} {:>10.0f}".format(path, *rates))
+    finally:
+        shutil.rmtree(directory)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares processing whole files with streaming them through a processor
+chain: how long it takes until the first bytes of output are ready, and
+until all of them are.
+"""
+import os
+import tempfile
+import time
+
+from holtz import processing
+
+
+
+class Upper(object):
+    def process(self, content):
+        return content.upper()
+
+
+    def stream(self, chunks):
+        for chunk in chunks:
+            yield chunk.upper()
+
+
+
+def whole(path, processor):
+    start = time.time()
+    _, data = processing.processFile(path, processor)
+    end = time.time()
+    return end - start, end - start, len(data)
+
+
+
+def streamed(path, processor):
+    start = time.time()
+    first = None
+    largest = 0
+    for chunk in processing.streamFile(path, processor):
+        if first is None:
+            first = time.time()
+        largest = max(largest, len(chunk))
+    return first - start, time.time() - start, largest
+
+
+
+def main(megabytes=(1, 16, 64)):
+    chain = processing.chain([Upper(), Upper()])
+    print("{:>6} {:>9} {:>10} {:>10} {:>12}".format(
+        "MiB", "", "first (s)", "all (s)", "held (KiB)"))
+    for size in megabytes:
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(b"holtz " * (size * 2 ** 20 // 6))
+            for name, run in ("whole", whole), ("streamed", streamed):
+                first, total, held = min(run(path, chain) for _ in range(3))
+                print("{:>6} {:>9} {:>10.4f} {:>10.4f} {:>12.0f}".format(
+                    size, name, first, total, held / 1024.0))
+        finally:
+            os.remove(path)
+
+
+
+if __name__ == "__main__":
+    main()
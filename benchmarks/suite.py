@@ -0,0 +1,262 @@
+"""
+Runs the benchmarks of the parse, match and serve hot paths, and writes
+their results as JSON, so they can be compared across versions.
+
+Usage::
+
+    python -m benchmarks.suite [output.json]
+
+Results go to standard output if no file is given. Every timing is the best
+of a few runs.
+"""
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from twisted.internet import defer
+from twisted.python import filepath
+
+from holtz import caching, config, execution, processing
+
+from benchmarks import best
+from benchmarks.configs import deepConfig, globConfig, wideConfig
+from benchmarks.parse import parseLines
+
+
+
+def benchmarkPush(lines=40000):
+    """
+    Measures how many lines per second Parser.push takes, for every shape
+    of generated config.
+    """
+    shapes = {
+        "deep": deepConfig(lines, 8),
+        "wide": wideConfig(lines),
+        "glob": globConfig(lines),
+    }
+    results = {}
+    for name, generated in sorted(shapes.items()):
+        seconds = best(parseLines, 3, generated)
+        results[name] = {
+            "lines": len(generated),
+            "seconds": seconds,
+            "linesPerSecond": len(generated) / seconds,
+        }
+    return results
+
+
+
+CONDITIONS = {
+    "literal": "page{}.html",
+    "glob": "f{}_*.js",
+    "alternation": "f{}_*.{{min.js,js,css,le\\,ss}}",
+}
+
+def benchmarkConditions(count=10000):
+    """
+    Measures how long compiling a condition with _parseCondition takes, for
+    a few kinds of conditions. Every condition is different, so nothing is
+    cached.
+    """
+    results = {}
+    for name, template in sorted(CONDITIONS.items()):
+        strings = [template.format(i) for i in range(count)]
+
+        def compileAll():
+            for string in strings:
+                config._parseCondition(string)
+
+        seconds = best(compileAll, 3)
+        results[name] = {
+            "conditions": count,
+            "seconds": seconds,
+            "microsecondsPerCondition": seconds / count * 1e6,
+        }
+    return results
+
+
+
+def benchmarkMatch(sizes=(10, 100, 1000, 10000), repeat=20000):
+    """
+    Measures how long matching a name against the entries of a directory
+    takes, for directories with different numbers of entries.
+
+    Names are picked to match the first literal, the last literal and the
+    last glob of the directory, or to match nothing.
+    """
+    results = {}
+    for size in sizes:
+        generated = wideConfig(size)
+        root = parseLines(generated)
+        last = size - 1 if (size - 1) % 10 else size - 2
+        lastGlob = (size - 1) // 10 * 10
+        names = {
+            "firstLiteral": "page1.html",
+            "lastLiteral": "page{}.html".format(last),
+            "lastGlob": "g{}_app.js".format(lastGlob),
+            "miss": "nothing.png",
+        }
+
+        perName = {}
+        for kind, name in sorted(names.items()):
+            assert (root.match(name) is None) == (kind == "miss"), name
+
+            def matchRepeatedly():
+                for _ in range(repeat):
+                    root.match(name)
+
+            seconds = best(matchRepeatedly, 3)
+            perName[kind] = seconds / repeat * 1e9
+        results[str(size)] = {"nanosecondsPerMatch": perName}
+    return results
+
+
+
+class BenchmarkRequest(object):
+    """
+    An in-process stand-in for a twisted.web request, with the parts of its
+    interface that effects use.
+
+    Written bytes are counted, not kept. Producers are driven until they
+    unregister, without a reactor.
+    """
+    def __init__(self, method=b"GET"):
+        self.method = method
+        self.requestHeaders = {}
+        self.responseHeaders = {}
+        self.responseCode = 200
+        self.written = 0
+        self._producer = None
+
+
+    def getHeader(self, name):
+        return self.requestHeaders.get(name)
+
+
+    def setHeader(self, name, value):
+        self.responseHeaders[name] = value
+
+
+    def setResponseCode(self, code):
+        self.responseCode = code
+
+
+    def write(self, data):
+        self.written += len(data)
+
+
+    def registerProducer(self, producer, streaming):
+        self._producer = producer
+        if not streaming:
+            while self._producer is not None:
+                producer.resumeProducing()
+
+
+    def unregisterProducer(self):
+        self._producer = None
+
+
+
+class Upper(object):
+    class producer(object):
+        contentType = "text/plain"
+
+
+    def process(self, content):
+        return content.upper()
+
+
+
+SIZES = [2 ** 10, 2 ** 16, 2 ** 20, 2 ** 23]
+
+def benchmarkServe(sizes=SIZES, totalBytes=2 ** 26, maxRequests=5000):
+    """
+    Measures how many bytes per second go through the effect closure, for
+    static and processed files of a few sizes.
+
+    Processors run synchronously, and their output is cached after the
+    first request, like it would be in a running server.
+    """
+    synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+    processing.executor = execution.Executor(synchronous)
+    processing.cache = caching.OutputCache()
+    registry = {"Upper": Upper}
+
+    directory = tempfile.mkdtemp()
+    results = {}
+    try:
+        for effectString in "None", "Upper()":
+            effect = config._parseEffect(effectString)
+            perSize = results[effectString] = {}
+            for size in sizes:
+                filePath = filepath.FilePath(directory).child(str(size))
+                filePath.setContent(b"x" * size)
+                requests = min(max(totalBytes // size, 10), maxRequests)
+
+                def serve():
+                    for _ in range(requests):
+                        request = BenchmarkRequest()
+                        d = effect(filePath, request, registry)
+                        d.addErrback(_raise)
+                        assert request.written == size
+
+                serve() # warm up the caches
+                seconds = best(serve, 3)
+                perSize[str(size)] = {
+                    "requests": requests,
+                    "seconds": seconds,
+                    "bytesPerSecond": requests * size / seconds,
+                    "requestsPerSecond": requests / seconds,
+                }
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+
+def _raise(failure):
+    failure.raiseException()
+
+
+
+BENCHMARKS = [
+    ("push", benchmarkPush),
+    ("conditions", benchmarkConditions),
+    ("match", benchmarkMatch),
+    ("serve", benchmarkServe),
+]
+
+def run():
+    """
+    Runs every benchmark and returns the results with some information
+    about where they were run.
+    """
+    results = {
+        "time": time.time(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "benchmarks": {},
+    }
+    for name, benchmark in BENCHMARKS:
+        sys.stderr.write("running {}\n".format(name))
+        results["benchmarks"][name] = benchmark()
+    return results
+
+
+
+def main(argv=sys.argv[1:]):
+    results = json.dumps(run(), indent=2, sort_keys=True)
+    if argv:
+        with open(argv[0], "w") as f:
+            f.write(results + "\n")
+    else:
+        sys.stdout.write(results + "\n")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Measures how fast entry lines are tokenized, and how fast configs where
+every condition is different are parsed.
+
+Parsers remember the conditions they've seen, so only configs with many
+different conditions spend much time tokenizing them.
+"""
+from holtz import config
+
+from benchmarks import best
+from benchmarks.parse import parseLines
+
+
+TEMPLATES = {
+    "literal": "page{}.html: None",
+    "escaped": "we\\:ird\\*{}.txt: None",
+    "glob": "f{}_*-?.js: Minify()",
+    "alternation": "f{}_*.{{min.js,js,css,le\\,ss}}: Minify()",
+}
+
+
+
+def tokenize(lines):
+    for line in lines:
+        condition, _ = config._splitEntryLine(line)
+        config._conditionPattern(condition)
+
+
+
+def uniqueConfig(lines, perDirectory=50):
+    """
+    Generates a config of roughly the given number of lines, made of
+    directories of entries that all have different conditions.
+    """
+    templates = [TEMPLATES[name] for name in sorted(TEMPLATES)]
+    out = []
+    while len(out) < lines:
+        out.append("d{}/".format(len(out)))
+        for i in range(perDirectory):
+            template = templates[i % len(templates)]
+            out.append(config.FOUR_SPACES + template.format(len(out)))
+    out.append("")
+    return out
+
+
+
+def main(count=20000):
+    print("{:>12} {:>14}".format("entries", "lines/second"))
+    for name, template in sorted(TEMPLATES.items()):
+        lines = [template.format(i) for i in range(count)]
+        seconds = best(tokenize, 3, lines)
+        print("{:>12} {:>14.0f}".format(name, count / seconds))
+
+    generated = uniqueConfig(100000)
+    seconds = best(parseLines, 3, generated)
+    print("{:>12} {:>14.0f}".format("parse", len(generated) / seconds))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Serving with asyncio.
+
+This serves the same directory trees with the same effects as the twisted.web
+backend. Requests implement the parts of twisted.web's request interface
+effects use, and the Deferreds effects return are driven by the event loop;
+no reactor runs. Files are sent with C{loop.sendfile}, which falls back to
+reading and writing where the platform or transport can't send files
+directly.
+
+Processors run through C{processing.executor}, which by default needs a
+running reactor. Replace it with one made by L{executor} to run processors
+in an executor of the loop instead.
+
+This needs Python 3.7 or later.
+"""
+try:
+    import asyncio
+    from concurrent import futures
+except ImportError:
+    asyncio = None
+
+from twisted.internet import defer
+from twisted.python import failure, log
+from twisted.web import http
+from zope.interface import implementer
+
+from holtz import execution, server, transfer
+
+
+MAX_HEAD_BYTES = 2 ** 16
+
+
+
+def executor(loop, pool=None, **kwargs):
+    """
+    Creates an executor that runs processors in an executor of a loop.
+
+    The pool is a concurrent.futures executor, like a process pool. If it's
+    None, the loop's default executor is used. Other keyword arguments go
+    to L{execution.Executor}; jobs in a process pool don't run in this
+    process unless told otherwise.
+    """
+    def submit(f, *args):
+        return defer.Deferred.fromFuture(loop.run_in_executor(pool, f, *args))
+
+    inProcess = not isinstance(pool, futures.ProcessPoolExecutor)
+    kwargs.setdefault("inProcess", inProcess)
+    return execution.Executor(submit, **kwargs)
+
+
+
+class Site(object):
+    """
+    Serves a directory with asyncio.
+    """
+    def __init__(self, tree, directory, registry, resolver=None):
+        self.tree = tree
+        self.directory = directory
+        self.registry = registry
+        self.resolver = resolver
+
+
+    def handle(self, request):
+        """
+        Handles a request.
+
+        Returns a Deferred that fires when the response has been written.
+        """
+        if request.method not in (b"GET", b"HEAD"):
+            request.setHeader("Allow", "GET, HEAD")
+            return _empty(request, http.NOT_ALLOWED)
+
+        filePath, effect = server.lookup(self.tree, self.directory,
+                                         request.path)
+        if effect is None:
+            return _empty(request, http.NOT_FOUND)
+
+        return defer.maybeDeferred(effect, filePath, request,
+                                   self.registry, self.resolver)
+
+
+
+def _empty(request, code):
+    request.setResponseCode(code)
+    request.setHeader("Content-Length", "0")
+    request.write(b"")
+    return defer.succeed(None)
+
+
+
+def serve(site, host="127.0.0.1", port=8080, loop=None):
+    """
+    Serves a site.
+
+    Returns the coroutine from C{loop.create_server}, which gives the server
+    once it's listening.
+    """
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    return loop.create_server(lambda: HTTPProtocol(site, loop), host, port)
+
+
+
+class HTTPProtocol(asyncio.Protocol if asyncio is not None else object):
+    """
+    A minimal HTTP/1.1 server protocol, enough to serve static files.
+
+    Pipelined requests are handled one after the other. Request bodies
+    aren't supported.
+    """
+    def __init__(self, site, loop):
+        self.site = site
+        self.loop = loop
+        self.transport = None
+        self.paused = False
+        self._buffer = b""
+        self._request = None
+
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if self._request is not None:
+            self._request._connectionLost()
+
+
+    def pause_writing(self):
+        self.paused = True
+        if self._request is not None:
+            self._request._pauseProducing()
+
+
+    def resume_writing(self):
+        self.paused = False
+        if self._request is not None:
+            self._request._resumeProducing()
+
+
+    def data_received(self, data):
+        self._buffer += data
+        self._handleNext()
+
+
+    def _handleNext(self):
+        if self._request is not None or self.transport is None:
+            return
+
+        head, separator, rest = self._buffer.partition(b"\r\n\r\n")
+        if not separator:
+            if len(self._buffer) > MAX_HEAD_BYTES:
+                self.transport.close()
+            return
+        self._buffer = rest
+
+        try:
+            request = self._request = Request.fromHead(self, head)
+        except ValueError:
+            self.transport.write(b"HTTP/1.1 400 Bad Request\r\n"
+                                 b"Content-Length: 0\r\n"
+                                 b"Connection: close\r\n\r\n")
+            self.transport.close()
+            return
+
+        d = self.site.handle(request)
+        d.addBoth(self._finished, request)
+
+
+    def _finished(self, result, request):
+        if isinstance(result, failure.Failure):
+            log.err(result, "Handling {!r} failed".format(request.path))
+            if not request.startedWriting:
+                request.setResponseCode(http.INTERNAL_SERVER_ERROR)
+                request.setHeader("Content-Length", "0")
+            else:
+                # Close the connection without ending the body, so that
+                # the client can tell it was cut short.
+                request.keepAlive = request.chunked = False
+        request.finish()
+
+        self._request = None
+        if self.transport is None:
+            return
+        if request.keepAlive:
+            self.loop.call_soon(self._handleNext)
+        else:
+            self.transport.close()
+
+
+
+@implementer(transfer.IFileSendingRequest)
+class Request(object):
+    """
+    An HTTP request, with the parts of twisted.web's request interface that
+    effects use.
+
+    Header names and values are text.
+    """
+    def __init__(self, protocol, method, uri, clientproto, headers):
+        self.protocol = protocol
+        self.method = method
+        self.uri = uri
+        self.path = uri.split(b"?", 1)[0]
+        self.clientproto = clientproto
+        self.requestHeaders = headers
+        self.responseCode = http.OK
+        self.responseHeaders = {}
+        self.startedWriting = False
+        self.finished = False
+        self.chunked = False
+        self._producer = None
+        self._streaming = False
+        self._producing = False
+
+        connection = headers.get("connection", "").lower()
+        if clientproto == b"HTTP/1.0":
+            self.keepAlive = connection == "keep-alive"
+        else:
+            self.keepAlive = connection != "close"
+
+
+    @classmethod
+    def fromHead(cls, protocol, head):
+        """
+        Parses the head of a request: the request line and the headers.
+
+        Raises ValueError if it's malformed.
+        """
+        lines = head.split(b"\r\n")
+        method, uri, clientproto = lines[0].split()
+        if not clientproto.startswith(b"HTTP/"):
+            raise ValueError("Not an HTTP request")
+
+        headers = {}
+        for line in lines[1:]:
+            name, separator, value = line.partition(b":")
+            if not separator:
+                raise ValueError("Malformed header")
+            name = name.strip().decode("latin-1").lower()
+            headers[name] = value.strip().decode("latin-1")
+        return cls(protocol, method, uri, clientproto, headers)
+
+
+    @property
+    def transport(self):
+        return self.protocol.transport
+
+
+    def getHeader(self, name):
+        return self.requestHeaders.get(name.lower())
+
+
+    def setHeader(self, name, value):
+        if isinstance(value, bytes):
+            value = value.decode("latin-1")
+        self.responseHeaders[name.lower()] = name, value
+
+
+    def setResponseCode(self, code):
+        self.responseCode = code
+
+
+    def write(self, data):
+        if not self.startedWriting:
+            self._writeHead()
+        if data and self.method != b"HEAD" and self.transport is not None:
+            if self.chunked:
+                size = "{:x}\r\n".format(len(data)).encode("ascii")
+                self.transport.write(size + data + b"\r\n")
+            else:
+                self.transport.write(data)
+
+
+    def _writeHead(self):
+        self.startedWriting = True
+        code = self.responseCode
+        bodyless = (self.method == b"HEAD"
+                    or code in (http.NO_CONTENT, http.NOT_MODIFIED))
+        if "content-length" not in self.responseHeaders and not bodyless:
+            if self.clientproto == b"HTTP/1.1":
+                self.chunked = True
+                self.setHeader("Transfer-Encoding", "chunked")
+            else:
+                self.keepAlive = False
+        if not self.keepAlive:
+            self.setHeader("Connection", "close")
+
+        message = http.RESPONSES.get(code, b"")
+        lines = [b" ".join([b"HTTP/1.1", str(code).encode("ascii"), message])]
+        for name, value in self.responseHeaders.values():
+            lines.append("{}: {}".format(name, value).encode("latin-1"))
+        lines.extend([b"", b""])
+        if self.transport is not None:
+            self.transport.write(b"\r\n".join(lines))
+
+
+    def finish(self):
+        """
+        Finishes the response, writing its head if nothing was written yet.
+        """
+        if not self.startedWriting:
+            self.write(b"")
+        if self.chunked and self.transport is not None:
+            self.transport.write(b"0\r\n\r\n")
+        self.finished = True
+
+
+    def registerProducer(self, producer, streaming):
+        """
+        Registers a producer.
+
+        Push producers are paused and resumed along with the transport.
+        Pull producers are resumed whenever the transport isn't paused, until
+        they're unregistered.
+        """
+        self._producer = producer
+        self._streaming = streaming
+        if streaming:
+            if self.protocol.paused:
+                producer.pauseProducing()
+        else:
+            self._resumeProducing()
+
+
+    def unregisterProducer(self):
+        self._producer = None
+
+
+    def _pauseProducing(self):
+        if self._producer is not None and self._streaming:
+            self._producer.pauseProducing()
+
+
+    def _resumeProducing(self):
+        if self._producer is None:
+            return
+        if self._streaming:
+            self._producer.resumeProducing()
+        elif not self._producing:
+            self._producing = True
+            self.protocol.loop.call_soon(self._produce)
+
+
+    def _produce(self):
+        self._producing = False
+        if self._producer is None or self.protocol.paused:
+            return
+        self._producer.resumeProducing()
+        self._resumeProducing()
+
+
+    def _connectionLost(self):
+        if self._producer is not None:
+            self._producer.stopProducing()
+
+
+    def sendFile(self, f, offset, length):
+        """
+        Sends a range of an open file with C{loop.sendfile}.
+
+        The file may be shared with other transfers, so asyncio's fallback,
+        which reads from the file's current position, isn't used. Where
+        sendfile isn't available, the range is read a chunk at a time.
+        """
+        self.write(b"")
+        if self.method == b"HEAD" or self.transport is None:
+            return defer.succeed(None)
+        loop = self.protocol.loop
+        task = loop.create_task(loop.sendfile(self.transport, f,
+                                              offset, length, fallback=False))
+        d = defer.Deferred.fromFuture(task)
+        d.addErrback(self._sendRead, f, offset, length)
+        return d
+
+
+    def _sendRead(self, failure, f, offset, length):
+        failure.trap(asyncio.SendfileNotAvailableError)
+        return transfer.ReadProducer(f, self, offset, length).begin()
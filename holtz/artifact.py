@@ -0,0 +1,149 @@
+"""
+Precompiled configuration artifacts.
+
+An artifact holds a parsed directory tree: the condition sources and their
+glob patterns, and the validated effect expressions. It is written next
+to the configuration file and keyed by a hash of that file, so later
+processes can skip parsing as long as the configuration hasn't changed.
+
+Artifacts are pickles. Loading one is as trustworthy as the directory the
+configuration file lives in.
+"""
+import gc
+import hashlib
+import os
+import tempfile
+
+from holtz import compat, config, contenttype, matching, structure
+
+
+SUFFIX = ".holtzc"
+FORMAT = "holtz-artifact-2"
+
+
+
+def load(path):
+    """
+    Loads the configuration file at the given path.
+
+    If an up to date artifact exists next to it, that is loaded instead of
+    parsing the file. Otherwise, the file is parsed and an artifact is
+    written for next time.
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+
+    artifactPath = path + SUFFIX
+    root = read(artifactPath, digest)
+    if root is None:
+        if not isinstance(source, str):
+            source = source.decode("utf-8")
+        root = config.parse(source.splitlines(True))
+        try:
+            write(artifactPath, digest, root)
+        except EnvironmentError:
+            pass # e.g. a read-only directory; just parse again next time
+
+    return root
+
+
+
+def read(path, digest):
+    """
+    Reads the directory tree from an artifact.
+
+    Returns None if there is no artifact, if it was built from a different
+    configuration, or if it can't be read.
+    """
+    # Building lots of small objects triggers the cyclic garbage collector
+    # over and over, which makes loading large trees quadratic.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        try:
+            with open(path, "rb") as f:
+                header = f.readline().split()
+                expected = [FORMAT.encode("ascii"), digest.encode("ascii")]
+                if header != expected:
+                    return None
+                tree = compat.pickle.load(f)
+        except Exception:
+            return None
+
+        root = _thaw(tree)
+        root.freeze()
+        matching.compileTree(root)
+        return root
+    finally:
+        if enabled:
+            gc.enable()
+
+
+
+def write(path, digest, root):
+    """
+    Atomically writes an artifact for a directory tree.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temporaryPath = tempfile.mkstemp(prefix=name, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            header = "{} {}\n".format(FORMAT, digest)
+            f.write(header.encode("ascii"))
+            tree = _freeze(root)
+            compat.pickle.dump(tree, f, compat.pickle.HIGHEST_PROTOCOL)
+        os.rename(temporaryPath, path)
+    except:
+        os.remove(temporaryPath)
+        raise
+
+
+
+def _freeze(directory):
+    """
+    Turns a directory tree into nested tuples that can be pickled.
+    """
+    entries = [(e.source, e.pattern, e.expression) for e in directory.entries]
+    subdirectories = [(name, _freeze(subdirectory))
+                      for name, subdirectory
+                      in directory.subdirectories.items()]
+    return entries, subdirectories
+
+
+
+def _thaw(tree, conditions=None, effects=None):
+    """
+    Rebuilds a directory tree from the nested tuples made by _freeze.
+
+    Like the parser, entries with the same condition or effect share it.
+    """
+    if conditions is None:
+        conditions, effects = {}, {}
+    entries, subdirectories = tree
+
+    directory = structure.Directory()
+    for source, pattern, expression in entries:
+        try:
+            condition = conditions[source, pattern]
+        except KeyError:
+            condition = config._compileCondition(source, pattern)
+            conditions[source, pattern] = condition
+
+        # Pickling keeps shared expressions shared, so they're found by id.
+        extension = contenttype.ruleExtension(source, pattern)
+        try:
+            effect = effects[id(expression), extension]
+        except KeyError:
+            effect = config._compileEffect(expression, extension)
+            effects[id(expression), extension] = effect
+
+        entry = structure.Entry(condition, effect,
+                                source, pattern, expression)
+        directory.entries.append(entry)
+
+    for name, subtree in subdirectories:
+        directory.subdirectories[compat.intern(name)] = \
+            _thaw(subtree, conditions, effects)
+
+    return directory
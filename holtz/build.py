@@ -0,0 +1,246 @@
+"""
+Building a whole tree ahead of time.
+
+Instead of processing files as they're requested, a build walks a source
+tree, runs the effect of every file that matches a rule and writes the
+results to an output tree, along with a manifest. Files that haven't
+changed since the last build are skipped.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+
+from twisted.python import reflect, usage
+
+from holtz import artifact, bundling, processing
+
+
+MANIFEST = "manifest.json"
+
+
+
+def build(root, sourceDirectory, outputDirectory, registry, processes=None):
+    """
+    Builds every file in a source directory that matches a rule.
+
+    Jobs run in a pool of the given number of processes, or in this process
+    if that number is 1. Processor classes must be picklable to run in a
+    pool. Returns the new manifest, which maps the relative paths of built
+    files to what they were built from.
+    """
+    manifestPath = os.path.join(outputDirectory, MANIFEST)
+    old = _readManifest(manifestPath)
+    new, jobs = {}, []
+
+    for relativePath, sourcePath, entry in _walk(root, sourceDirectory):
+        stages = _stages(entry)
+        record = _record(sourcePath, stages)
+        previous = old.get(relativePath)
+        outputPath = os.path.join(outputDirectory, relativePath)
+
+        if _unchanged(record, previous, sourcePath, outputPath):
+            new[relativePath] = previous
+            continue
+
+        new[relativePath] = record
+        processorStages = [(registry[name], args, kwargs)
+                           for name, args, kwargs in stages]
+        jobs.append((relativePath, sourcePath, outputPath, processorStages))
+
+    for relativePath, digest in _run(jobs, processes):
+        new[relativePath]["digest"] = digest
+
+    for relativePath in set(old) - set(new):
+        try:
+            os.remove(os.path.join(outputDirectory, relativePath))
+        except EnvironmentError:
+            pass
+
+    _writeManifest(manifestPath, new)
+    return new
+
+
+
+def _walk(root, sourceDirectory):
+    """
+    Finds the files in a source directory handled by an entry other than a
+    bundle, which isn't built.
+
+    Yields relative paths, absolute paths and the entries handling them.
+    """
+    stack = [(root, sourceDirectory, [])]
+    while stack:
+        directory, path, segments = stack.pop()
+        for name in sorted(os.listdir(path)):
+            childPath = os.path.join(path, name)
+            if os.path.isdir(childPath):
+                subdirectory = directory.subdirectories.get(name)
+                if subdirectory is not None:
+                    stack.append((subdirectory, childPath, segments + [name]))
+                continue
+
+            entry = directory.match(name)
+            if entry is not None and not bundling.isBundle(entry):
+                yield "/".join(segments + [name]), childPath, entry
+
+
+
+def _stages(entry):
+    if entry.expression is None:
+        return []
+    return processing.evaluateStages(entry.expression)
+
+
+
+def _record(sourcePath, stages):
+    """
+    Describes the source file and rule an output is built from.
+    """
+    st = os.stat(sourcePath)
+    processor = arguments = None
+    if stages:
+        processor, arguments = processing.chainKey(stages)
+    return {"mtime": st.st_mtime, "size": st.st_size, "digest": None,
+            "processor": processor, "arguments": arguments}
+
+
+
+def _unchanged(record, previous, sourcePath, outputPath):
+    """
+    Checks if an output built from the previous record is still current.
+
+    The content is only hashed if the modification time or size changed.
+    """
+    if previous is None or not os.path.exists(outputPath):
+        return False
+
+    for key in "processor", "arguments":
+        if record[key] != previous[key]:
+            return False
+
+    if (record["mtime"], record["size"]) != (previous["mtime"],
+                                             previous["size"]):
+        if _digest(sourcePath) != previous["digest"]:
+            return False
+        previous.update(mtime=record["mtime"], size=record["size"])
+
+    return True
+
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+
+def _run(jobs, processes):
+    if not jobs:
+        return []
+    if processes == 1:
+        return [_buildFile(job) for job in jobs]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_buildFile, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+
+def _buildFile(job):
+    """
+    Builds a single file. This is what runs in the worker processes.
+
+    Returns the relative path and the digest of the source content.
+    """
+    relativePath, sourcePath, outputPath, processorStages = job
+
+    if not processorStages:
+        with open(sourcePath, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+    else:
+        processor = processing.chain([processorClass(*args, **kwargs)
+                                      for processorClass, args, kwargs
+                                      in processorStages])
+        digest, data = processing.processFile(sourcePath, processor)
+
+    directory = os.path.dirname(outputPath)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory): # raced another worker
+                raise
+
+    with open(outputPath, "wb") as f:
+        f.write(data)
+
+    return relativePath, digest
+
+
+
+def _readManifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (EnvironmentError, ValueError):
+        return {}
+
+
+
+def _writeManifest(path, manifest):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+
+class Options(usage.Options):
+    synopsis = "CONFIG SOURCE OUTPUT"
+
+    optParameters = [
+        ["registry", "r", None,
+         "Fully qualified name of the processor registry."],
+        ["processes", "j", None,
+         "Number of worker processes (default: one per CPU).", int]
+    ]
+
+
+    def parseArgs(self, config, source, output):
+        self["config"] = config
+        self["source"] = source
+        self["output"] = output
+
+
+    def postOptions(self):
+        if self["registry"] is None:
+            raise usage.UsageError("A registry is required.")
+
+
+
+def main(argv=None):
+    options = Options()
+    try:
+        options.parseOptions(argv)
+    except usage.UsageError as e:
+        sys.stderr.write("{}\n\n{}\n".format(options, e))
+        return 2
+
+    root = artifact.load(options["config"])
+    registry = reflect.namedAny(options["registry"])
+    manifest = build(root, options["source"], options["output"],
+                     registry, options["processes"])
+    sys.stdout.write("{} files in manifest\n".format(len(manifest)))
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Bundles: the files of a directory that match a condition, concatenated and
+served as one file.
+
+A rule like C{app.js: Bundle("*.js")} serves the files in its directory
+whose names match the condition, other than the bundle itself, in order of
+their names. An optional C{separator} keyword argument goes between them;
+it's a newline by default.
+
+Bundles are served under names with a fingerprint of their content in
+them, like C{app.0123456789abcdef.js}, which can be cached forever: once a
+member changes, the bundle gets another name. The plain name, and names
+with an old fingerprint, redirect to the current one.
+
+A bundle is built once, and kept in the output cache. Its manifest, the
+list of its members and their stat results, is checked again when the
+bundle is requested more than a TTL after it was last checked, and the
+bundle is only rebuilt if the manifest changed.
+"""
+import hashlib
+import os
+import re
+import stat
+import time
+
+from twisted.internet import defer
+
+from holtz import caching, processing
+
+
+NAME = "Bundle"
+FINGERPRINT_LENGTH = 16
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+
+def isBundle(entry):
+    """
+    Checks if an entry's effect serves a bundle.
+    """
+    return (entry is not None and entry.expression is not None
+            and entry.expression.func.id == NAME)
+
+
+
+def fingerprint(digest):
+    """
+    Returns the fingerprint of content with the given hex digest.
+    """
+    return digest[:FINGERPRINT_LENGTH]
+
+
+
+def fingerprinted(name, digest):
+    """
+    Inserts the fingerprint of content with the given hex digest into a
+    name, before its extension.
+    """
+    stem, extension = os.path.splitext(name)
+    return "{}.{}{}".format(stem, fingerprint(digest), extension)
+
+
+
+_FINGERPRINTED = re.compile(r"^(.*)\.([0-9a-f]{%d})(\.[^./]*)?$"
+                            % FINGERPRINT_LENGTH).match
+
+def splitFingerprint(path):
+    """
+    Splits the fingerprint out of the last segment of a path.
+
+    Returns the path without the fingerprint and the fingerprint, or the
+    path and None if it has none.
+    """
+    match = _FINGERPRINTED(path)
+    if match is None:
+        return path, None
+    stem, found, extension = match.groups()
+    return stem + (extension or ""), found
+
+
+
+class Bundler(object):
+    """
+    Builds the bundles of a rule, and remembers them until one of their
+    members changes.
+
+    The key identifies the rule in output cache keys. Manifests are checked
+    again after ttl seconds.
+    """
+    def __init__(self, condition, separator, key, ttl=caching.DEFAULT_TTL,
+                 clock=time.time):
+        self.condition = condition
+        self.separator = separator
+        self.key = key
+        self.ttl = ttl
+        self.clock = clock
+        self._bundles = {}
+
+
+    def current(self, filePath):
+        """
+        Gets the current bundle with the plain name of a file path.
+
+        Returns a Deferred that fires with the bundle's digest, its
+        modification time, which is the latest of its members', and its
+        content.
+        """
+        now = self.clock()
+        bundle = self._bundles.get(filePath.path)
+        if bundle is None or now - bundle.checked > self.ttl:
+            manifest = self._manifest(filePath)
+            if bundle is None or manifest != bundle.manifest:
+                return self._build(filePath, manifest, now)
+            bundle.checked = now
+
+        data = processing.cache.get((bundle.digest,) + self.key)
+        if data is None: # evicted
+            return self._build(filePath, bundle.manifest, now)
+        return defer.succeed((bundle.digest, bundle.lastModified, data))
+
+
+    def _manifest(self, filePath):
+        """
+        Lists the members of a bundle, in order, with the parts of their
+        stat results that change when their content does.
+        """
+        directory, name = os.path.split(filePath.path)
+        manifest = []
+        for member in sorted(os.listdir(directory)):
+            if member == name or not self.condition(member):
+                continue
+            try:
+                st = os.stat(os.path.join(directory, member))
+            except EnvironmentError:
+                continue # removed since it was listed
+            if stat.S_ISREG(st.st_mode):
+                manifest.append((member, st.st_size, st.st_mtime,
+                                 st.st_ino))
+        return tuple(manifest)
+
+
+    def _build(self, filePath, manifest, now):
+        directory = os.path.dirname(filePath.path)
+        paths = [os.path.join(directory, member) for member, _, _, _
+                 in manifest]
+        d = processing.executor.run((filePath.path, manifest) + self.key,
+                                    build, paths, self.separator)
+
+        @d.addCallback
+        def store(result):
+            digest, data = result
+            lastModified = max([mtime for _, _, mtime, _ in manifest] or [0])
+            processing.cache.put((digest,) + self.key, data)
+            self._bundles[filePath.path] = _Bundle(manifest, now, digest,
+                                                   lastModified)
+            return digest, lastModified, data
+
+        return d
+
+
+
+class _Bundle(object):
+    __slots__ = "manifest", "checked", "digest", "lastModified"
+
+    def __init__(self, manifest, checked, digest, lastModified):
+        self.manifest = manifest
+        self.checked = checked
+        self.digest = digest
+        self.lastModified = lastModified
+
+
+
+def build(paths, separator):
+    """
+    Concatenates some files, with a separator between them.
+
+    This is what runs in the executor. Returns the digest of the bundle and
+    its content.
+    """
+    parts = []
+    for path in paths:
+        with open(path, "rb") as f:
+            parts.append(f.read())
+    data = separator.join(parts)
+    return hashlib.sha256(data).hexdigest(), data
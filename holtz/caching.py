@@ -0,0 +1,352 @@
+"""
+Caches for open files, file digests and processed output.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from holtz import compat
+
+
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+DEFAULT_MAX_FILES = 256
+DEFAULT_MAX_DIGESTS = 2 ** 16
+DEFAULT_TTL = 1.0
+
+
+
+def _stat(filePath, st=None):
+    """
+    Returns the parts of a file's stat that change when its content does.
+
+    The file is only stat'ed if no stat result is given.
+    """
+    if st is None:
+        st = os.stat(filePath.path)
+    return st.st_size, st.st_mtime, st.st_ino
+
+
+
+def fileDigest(f):
+    """
+    Computes the hex SHA-256 digest of the rest of an open file.
+    """
+    h = hashlib.sha256()
+    for chunk in iter(lambda: f.read(2 ** 16), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+
+class DigestCache(object):
+    """
+    An LRU cache of the content digests of files.
+
+    At most maxDigests digests are remembered. A digest is recomputed when
+    the file's size, modification time or inode change.
+    """
+    def __init__(self, maxDigests=DEFAULT_MAX_DIGESTS):
+        self.maxDigests = maxDigests
+        self._digests = compat.OrderedDict()
+
+
+    def digest(self, filePath):
+        """
+        Returns the hex SHA-256 digest of a file's content.
+        """
+        return self.validators(filePath)[0]
+
+
+    def validators(self, filePath, st=None):
+        """
+        Returns the hex SHA-256 digest of a file's content and its
+        modification time.
+
+        If the file's stat result is given, it's used instead of stat'ing
+        the file again.
+        """
+        if st is None:
+            st = os.stat(filePath.path)
+        digest = self.known(filePath, st)
+        if digest is None:
+            f = filePath.open()
+            try:
+                digest = fileDigest(f)
+            finally:
+                f.close()
+            self.remember(filePath, digest, st)
+        return digest, st.st_mtime
+
+
+    def known(self, filePath, st=None):
+        """
+        Returns the digest of a file's content if it's known and the file
+        hasn't changed since, or None.
+        """
+        try:
+            cached = self._digests.pop(filePath.path)
+        except KeyError:
+            return None
+        self._digests[filePath.path] = cached
+        if cached[0] == _stat(filePath, st):
+            return cached[1]
+        return None
+
+
+    def remember(self, filePath, digest, st=None):
+        """
+        Remembers the digest of a file's content, computed elsewhere.
+
+        The stat result should be from before the file was read, so that
+        the digest is recomputed if the file changed in the meantime.
+        """
+        self._digests.pop(filePath.path, None)
+        if len(self._digests) >= self.maxDigests:
+            self._digests.popitem(last=False)
+        self._digests[filePath.path] = _stat(filePath, st), digest
+
+
+    def forget(self, filePath):
+        """
+        Forgets the digest of a file.
+        """
+        self._digests.pop(filePath.path, None)
+
+
+
+class CachedFile(object):
+    """
+    A file remembered by a file cache.
+
+    Either file is the open file, or data is its whole content. Whoever
+    acquired it from the cache releases it when they're done with it; the
+    file is only closed once it's been evicted and nobody uses it anymore.
+    """
+    def __init__(self, path, stat, checked):
+        self.path = path
+        self.stat = stat
+        self.checked = checked
+        self.file = self.data = None
+        self.users = 0
+        self.evicted = False
+
+
+    def release(self):
+        """
+        Stops using the file.
+        """
+        self.users -= 1
+        if self.evicted and not self.users:
+            self._close()
+
+
+    def _evict(self):
+        self.evicted = True
+        if not self.users:
+            self._close()
+
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+
+class FileCache(object):
+    """
+    An LRU cache of open files and their stat results.
+
+    At most maxFiles files are remembered, so at most that many descriptors
+    stay open, not counting evicted files still being sent. A remembered
+    file is stat'ed again when it's used after more than ttl seconds, and
+    forgotten if it changed. Non-empty files no larger than maxMemorySize
+    bytes are read into memory instead of being kept open.
+
+    Transfers send files at explicit offsets, so concurrent transfers can
+    share an open file.
+    """
+    def __init__(self, maxFiles=DEFAULT_MAX_FILES, ttl=DEFAULT_TTL,
+                 maxMemorySize=0, clock=time.time):
+        self.maxFiles = maxFiles
+        self.ttl = ttl
+        self.maxMemorySize = maxMemorySize
+        self.clock = clock
+        self.hits = self.misses = 0
+        self._files = compat.OrderedDict()
+
+
+    def stat(self, filePath):
+        """
+        Returns the stat result of a file.
+
+        Raises EnvironmentError if the file doesn't exist, like os.stat.
+        """
+        return self._lookup(filePath).stat
+
+
+    def acquire(self, filePath):
+        """
+        Returns the cached file for a file, opening it if needed.
+
+        The cached file must be released when it's not used anymore.
+        """
+        cached = self._lookup(filePath)
+        if cached.file is None and cached.data is None:
+            f = filePath.open()
+            if 0 < cached.stat.st_size <= self.maxMemorySize:
+                try:
+                    cached.data = f.read()
+                finally:
+                    f.close()
+            else:
+                cached.file = f
+        cached.users += 1
+        return cached
+
+
+    def _lookup(self, filePath):
+        path = filePath.path
+        now = self.clock()
+        cached = self._files.pop(path, None)
+
+        if cached is not None and now - cached.checked > self.ttl:
+            try:
+                st = os.stat(path)
+            except EnvironmentError:
+                cached._evict()
+                raise
+            if _stat(filePath, st) != _stat(filePath, cached.stat):
+                cached._evict()
+                cached = None
+            else:
+                cached.checked = now
+
+        if cached is None:
+            self.misses += 1
+            cached = CachedFile(path, os.stat(path), now)
+            while self._files and len(self._files) >= self.maxFiles:
+                _, evicted = self._files.popitem(last=False)
+                evicted._evict()
+        else:
+            self.hits += 1
+
+        self._files[path] = cached
+        return cached
+
+
+    def clear(self):
+        """
+        Forgets every file.
+        """
+        for cached in self._files.values():
+            cached._evict()
+        self._files.clear()
+
+
+
+class OutputCache(object):
+    """
+    A two-tier cache of processed output.
+
+    Keys are tuples of strings. The memory tier is an LRU cache bounded by
+    the total size of the cached values. If a directory is given, values
+    are also written there, and values evicted from memory are read back
+    from disk when they're requested again.
+    """
+    def __init__(self, maxBytes=DEFAULT_MAX_BYTES, directory=None):
+        self.maxBytes = maxBytes
+        self.directory = directory
+        self.size = 0
+        self.hits = self.misses = 0
+        self._memory = compat.OrderedDict()
+
+
+    def get(self, key):
+        """
+        Returns the value for a key, or None if it isn't cached.
+        """
+        try:
+            value = self._memory.pop(key)
+        except KeyError:
+            value = self._read(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._remember(key, value)
+        else:
+            self._memory[key] = value
+
+        self.hits += 1
+        return value
+
+
+    def put(self, key, value):
+        """
+        Caches a value for a key.
+        """
+        self.discard(key)
+        self._write(key, value)
+        self._remember(key, value)
+
+
+    def discard(self, key):
+        """
+        Removes the value for a key from memory, if it is cached there.
+
+        The on-disk copy, which is only found again for the same content
+        hash, is left alone.
+        """
+        value = self._memory.pop(key, None)
+        if value is not None:
+            self.size -= len(value)
+
+
+    def discardWhere(self, predicate):
+        """
+        Removes every value whose key satisfies a predicate from memory.
+        """
+        for key in [key for key in self._memory if predicate(key)]:
+            self.discard(key)
+
+
+    def _remember(self, key, value):
+        """
+        Keeps a value in memory, unless it's too big to fit at all.
+        """
+        if len(value) > self.maxBytes:
+            return
+        self._memory[key] = value
+        self.size += len(value)
+        while self.size > self.maxBytes:
+            _, evicted = self._memory.popitem(last=False)
+            self.size -= len(evicted)
+
+
+    def _path(self, key):
+        name = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name)
+
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except EnvironmentError:
+            return None
+
+
+    def _write(self, key, value):
+        if self.directory is None:
+            return
+        fd, temporaryPath = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.rename(temporaryPath, self._path(key))
+        except:
+            os.remove(temporaryPath)
+            raise
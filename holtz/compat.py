@@ -7,9 +7,28 @@ different names with a consistent name.
 try:
     from cStringIO import StringIO
 except ImportError:
-    from StringIO import StringIO
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
 
 try:
     from collections import OrderedDict
 except ImportError:
-    from ordereddict import OrderedDict
\ No newline at end of file
+    from ordereddict import OrderedDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+try:
+    intern = intern
+except NameError:
+    from sys import intern
+
+try:
+    from urllib.parse import unquote
+except ImportError:
+    from urllib import unquote
@@ -0,0 +1,79 @@
+"""
+Conditional requests: ETags, Last-Modified and 304 Not Modified.
+"""
+import hashlib
+
+from twisted.web import http
+
+
+
+def strongETag(digest):
+    """
+    Returns the strong ETag for content with the given hex digest.
+    """
+    return '"{}"'.format(digest)
+
+
+
+def processedETag(key):
+    """
+    Returns the strong ETag for the processed output with some cache key.
+
+    The output cache serves the same output for the same key, so a hash of
+    the key identifies that output without having to process anything.
+    """
+    return strongETag(hashlib.sha256(repr(key).encode("utf-8")).hexdigest())
+
+
+
+def respondIfNotModified(request, etag, lastModified):
+    """
+    Sets the ETag and Last-Modified headers of a response, and responds
+    with 304 Not Modified if the client's copy is current.
+
+    Returns True if the response was a 304.
+    """
+    request.setHeader("ETag", etag)
+    request.setHeader("Last-Modified", http.datetimeToString(lastModified))
+
+    if not _isCurrent(request, etag, lastModified):
+        return False
+
+    request.setResponseCode(http.NOT_MODIFIED)
+    request.write(b"")
+    return True
+
+
+
+def _isCurrent(request, etag, lastModified):
+    """
+    Checks the request's validators against the current ones.
+
+    If-None-Match takes precedence over If-Modified-Since.
+    """
+    ifNoneMatch = request.getHeader("If-None-Match")
+    if ifNoneMatch is not None:
+        tags = [tag.strip() for tag in ifNoneMatch.split(",")]
+        return "*" in tags or etag in tags or "W/" + etag in tags
+
+    since = parseDate(request.getHeader("If-Modified-Since"))
+    if since is None:
+        return False
+    return int(lastModified) <= since
+
+
+
+def parseDate(value):
+    """
+    Parses an HTTP date into seconds since the epoch.
+
+    Returns None if there's no date or it can't be parsed.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, bytes):
+        value = value.encode("ascii", "replace")
+    try:
+        return http.stringToDatetime(value)
+    except (ValueError, IndexError, KeyError):
+        return None
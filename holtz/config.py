@@ -5,9 +5,12 @@ import ast
 import itertools
 import re
 
-from twisted.protocols import basic
+from twisted.internet import defer
+from twisted.web import http
 
-from holtz import structure
+from holtz import bundling, compat, conditional, contenttype, encoding
+from holtz import execution, globbing, matching, processing, ranges, stats
+from holtz import structure, transfer
 
 
 FOUR_SPACES = " " * 4
@@ -15,11 +18,27 @@ FOUR_SPACES = " " * 4
 
 
 class Parser(object):
-    def __init__(self, indent=FOUR_SPACES):
+    """
+    Parses a configuration one line at a time.
+
+    Unless told otherwise, getting the root builds the matchers of every
+    directory in the tree. The tree stays mutable, so more lines can be
+    pushed afterwards; L{parse} freezes it once it's complete.
+
+    Names are interned, and entries with the same condition or effect share
+    their condition or effect.
+    """
+    def __init__(self, indent=FOUR_SPACES, compileMatchers=True):
         self._root = structure.Directory()
         self._breadcrumbs = []
+        self._directories = [self._root]
         self._indent = indent
         self._expectingNewBlock = False
+        self._compiled = not compileMatchers
+        self._compileMatchers = compileMatchers
+        self._lineNumber = 0
+        self._conditions = {}
+        self._effects = {}
 
 
     @property
@@ -29,12 +48,7 @@ class Parser(object):
 
     @property
     def _currentDirectory(self):
-        # Yes, looking this up every time is inefficient. This is not a
-        # problem until proven otherwise. -- lvh
-        d = self._root
-        for b in self._breadcrumbs:
-            d = d.subdirectories[b]
-        return d
+        return self._directories[-1]
 
 
     @property
@@ -45,10 +59,28 @@ class Parser(object):
         if self._breadcrumbs:
             message = "Incomplete tree: missing newline at end?"
             raise ParseError(message)
+        if not self._compiled:
+            matching.compileTree(self._root)
+            self._compiled = True
         return self._root
 
 
     def push(self, line):
+        """
+        Parses the next line of the configuration.
+
+        Parse errors are annotated with the line and its line number.
+        """
+        self._lineNumber += 1
+        try:
+            self._push(line)
+        except ParseError as e:
+            e._locate(line, self._lineNumber)
+            raise
+
+
+    def _push(self, line):
+        self._compiled = not self._compileMatchers
         delta = _indentLevel(line, self._indent) - self._indentLevel
 
         if delta > 0:
@@ -59,6 +91,7 @@ class Parser(object):
             if self._expectingNewBlock:
                 raise ParseError("Preceding block is empty!")
             del self._breadcrumbs[delta:]
+            del self._directories[delta:]
 
         line = line.strip()
         if not line:
@@ -71,52 +104,128 @@ class Parser(object):
 
 
     def _parseDirectory(self, line):
-        name = line.rstrip("/")
+        name = compat.intern(line.rstrip("/"))
         directory = structure.Directory()
         self._currentDirectory.subdirectories[name] = directory
 
         self._breadcrumbs.append(name)
+        self._directories.append(directory)
         self._expectingNewBlock = True
 
 
     def _parseEntry(self, line):
         conditionString, effectString = _splitEntryLine(line)
 
-        condition = _parseCondition(conditionString)
-        effect = _parseEffect(effectString)
-
-        entry = structure.Entry(condition, effect)
+        # Most conditions of large configs are new, so look them up without
+        # raising and catching KeyErrors.
+        cached = self._conditions.get(conditionString)
+        if cached is None:
+            conditionString = compat.intern(conditionString)
+            pattern = _conditionPattern(conditionString)
+            condition = _compileCondition(conditionString, pattern)
+            extension = contenttype.ruleExtension(conditionString, pattern)
+            cached = self._conditions[conditionString] = \
+                conditionString, pattern, condition, extension
+        conditionString, pattern, condition, extension = cached
+
+        try:
+            expression, effect = self._effects[effectString, extension]
+        except KeyError:
+            expression = _parseEffectExpression(effectString)
+            effect = _compileEffect(expression, extension)
+            self._effects[effectString, extension] = expression, effect
+
+        entry = structure.Entry(condition, effect,
+                                conditionString, pattern, expression)
         self._currentDirectory.entries.append(entry)
 
         self._expectingNewBlock = False
 
 
 
+def parse(source, indent=None, compileMatchers=True):
+    """
+    Parses a configuration from a file or any other iterable of lines.
+
+    The source is only iterated over once, so pipes and generators work. If
+    no indent is given, it is detected from the first few lines. Errors
+    found at the end of the input are reported one line past the end.
+
+    Directories build their matchers lazily when compileMatchers is false.
+    Otherwise, the tree is frozen, since nothing can be added to it anymore.
+    """
+    lines = iter(source)
+
+    lookahead = []
+    if indent is None:
+        indent, lookahead = _detectIndentationFromLines(lines)
+
+    parser = Parser(indent or FOUR_SPACES, compileMatchers)
+    for line in itertools.chain(lookahead, lines):
+        parser.push(line)
+    parser.push("")
+
+    try:
+        root = parser.root
+    except ParseError as e:
+        e._locate(None, parser._lineNumber)
+        raise
+
+    if compileMatchers:
+        root.freeze()
+    return root
+
+
+
 def _detectIndentation(f):
     """
     Attempts to detect the indentation of a configuration file.
-    
+
+    The file is rewound afterwards.
+    """
+    indent, _ = _detectIndentationFromLines(iter(f.readline, ""))
+    f.seek(0, 0)
+    return indent
+
+
+
+def _detectIndentationFromLines(lines):
+    """
+    Attempts to detect the indentation of an iterator of lines.
+
     This consumes lines until it finds one that does not consist entirely of
     whitespace. That line must specify a directory, so the next line must be
     a block indented with by one level.
+
+    Returns the indent and a list of the lines that were consumed.
     """
+    lookahead = []
+
     # find the first non-whitespace line
-    line = ""
-    while not line:
-        line = f.readline().strip()
-        if f.tell() == 0: # empty file
-            return ""
-    
+    for line in lines:
+        lookahead.append(line)
+        if line.strip():
+            break
+    else: # empty file
+        return "", lookahead
+
     # find leading whitespace
-    indent = "".join(itertools.takewhile(str.isspace, f.readline()))
-    f.seek(0, 0)
-    return indent
+    for line in lines:
+        lookahead.append(line)
+        line = line.rstrip("\r\n")
+        return "".join(itertools.takewhile(str.isspace, line)), lookahead
+
+    return "", lookahead
 
 
 def _indentLevel(line, indent=FOUR_SPACES):
     """
     Finds the indent level for a given line with the given indentation.
     """
+    if indent and indent.count(indent[0]) == len(indent):
+        width = len(line) - len(line.lstrip(indent[0]))
+        return width // len(indent)
+
     level = i = 0
     while line.startswith(indent, i):
         level += 1
@@ -125,35 +234,41 @@ def _indentLevel(line, indent=FOUR_SPACES):
     return level
 
 
+_untilToken = {}
+
 def _readUntilToken(string, tokens, start=0):
     """
     Reads the string until one of the given tokens is found.
+
+    Returns the index of the first unescaped token and the token itself.
     """
-    it = itertools.islice(enumerate(string), start, None)
-    for i, x in it:
-        if x == "\\":
-            try:
-                it.next()
-            except StopIteration:
-                raise ParseError("Lone backslash at end", string)
-        elif x in tokens:
-            break
-    else:
+    try:
+        regex = _untilToken[tokens]
+    except KeyError:
+        other = r"[^\\{}]*".format(re.escape(tokens))
+        regex = re.compile(r"{0}(?:\\.{0})*".format(other), re.DOTALL)
+        regex = _untilToken[tokens] = regex.match
+
+    i = regex(string, start).end()
+    if i == len(string):
         raise NoTokens(tokens, string)
+    if string[i] == "\\":
+        raise ParseError("Lone backslash at end", string)
+    return i, string[i]
 
-    return i, x
 
+_escaped = re.compile(r"\\(.)", re.DOTALL)
 
 def _unescape(string):
-    def unescaped():
-        it = iter(string)
-        for x in it:
-            if x == "\\":
-                yield it.next()
-            else:
-                yield x
+    if "\\" not in string:
+        return string
+    if "\\\\" not in string:
+        return "".join(string.split("\\"))
+    return _escaped.sub(_firstGroup, string)
 
-    return "".join(unescaped())
+
+def _firstGroup(match):
+    return match.group(1)
 
 
 def _splitEntryLine(line):
@@ -176,48 +291,111 @@ def _splitEntryLine(line):
 
 
 def _parseCondition(string):
+    return _compileCondition(string, _conditionPattern(string))
+
+
+def _compileCondition(string, pattern):
+    """
+    Builds the condition callable for a condition string and its pattern.
+    """
+    if pattern is None:
+        return string.__eq__
+    return globbing.compile(pattern)
+
+
+_special = re.compile(r"[\\{*?]")
+
+_OPTIONS = r"(?:[^\\,}]|\\.)*(?:,(?:[^\\,}]|\\.)*)*"
+_conditionToken = re.compile(r"""
+    (?P<literal>(?:[^\\{*?]|\\.)+)
+  | (?P<star>\*)
+  | (?P<any>\?)
+  | \{(?P<options>%s)\}
+""" % _OPTIONS, re.DOTALL | re.VERBOSE).match
+_alternation = re.compile(r"(%s)\}" % _OPTIONS, re.DOTALL).match
+_optionBreak = re.compile(r"\\.|,", re.DOTALL).finditer
+
+def _conditionPattern(string):
+    """
+    Translates a condition into a glob pattern for L{globbing}.
+
+    Returns None if the condition is a literal name, without any wildcards,
+    alternations or escapes.
+
+    The condition is tokenized in a single pass: every token is a run of
+    literal characters, a wildcard or a whole alternation.
+    """
+    if _special.search(string) is None:
+        return None
+
     index, parts = 0, []
-    try:
-        while True:
-            oldIndex = index
-            index, token = _readUntilToken(string, "{*?", index)
-
-            parts.append(re.escape(string[oldIndex:index]))
-
-            if token == "{":
-                index, options = _parseAlternation(string, index + 1)
-                part = "({})".format("|".join(map(re.escape, options)))
-                parts.append(part)
-            if token == "*":
-                parts.append(".*")
-            if token == "?":
-                parts.append(".")
-            
-            index += 1
-    except NoTokens:
-        if parts:
-            parts.append(string[index:])
-            return re.compile("".join(parts)).match
+    while index < len(string):
+        match = _conditionToken(string, index)
+        if match is None: # an unclosed alternation or a lone backslash
+            if string[index] == "{":
+                _parseAlternation(string, index + 1)
+            raise ParseError("Lone backslash at end", string)
+
+        literal, star, any, options = match.groups()
+        if literal is not None:
+            parts.append(_unescape(literal))
+        elif star is not None:
+            parts.append(globbing.STAR)
+        elif any is not None:
+            parts.append(globbing.ANY)
         else:
-            return string.__eq__
+            parts.append(_splitOptions(options))
+        index = match.end()
+
+    return tuple(parts)
 
 
 def _parseAlternation(string, start):
-    oldIndex, token = start, "{"
+    """
+    Parses an alternation, starting just after its opening brace.
+
+    Returns the index of its closing brace and its unescaped options.
+    """
+    match = _alternation(string, start)
+    if match is None:
+        _readUntilToken(string, ",}", start) # raises on a lone backslash
+        raise NoTokens(",}", string)
+    return match.end() - 1, list(_splitOptions(match.group(1)))
 
-    options = []
-    while token != "}":
-        newIndex, token = _readUntilToken(string, ",}", oldIndex)
-        options.append(string[oldIndex:newIndex])
-        oldIndex = newIndex + 1
 
-    return newIndex, map(_unescape, options)
+def _splitOptions(options):
+    """
+    Splits the options of an alternation on its unescaped commas, and
+    unescapes them.
+    """
+    if "\\" not in options:
+        return tuple(options.split(","))
+
+    split, start = [], 0
+    for match in _optionBreak(options):
+        if match.group() == ",":
+            split.append(options[start:match.start()])
+            start = match.end()
+    split.append(options[start:])
+    return tuple(_unescape(option) for option in split)
 
 
 def _parseEffect(string):
-    expr = ast.parse(string, mode="eval").body
-    
-    if isinstance(expr, ast.Name) and expr.id == "None":
+    return _compileEffect(_parseEffectExpression(string))
+
+
+def _parseEffectExpression(string):
+    """
+    Parses and validates an effect expression.
+
+    Returns the call expression, or None if the effect is None.
+    """
+    try:
+        expr = ast.parse(string, mode="eval").body
+    except SyntaxError as e:
+        raise EffectSyntaxError("Effect isn't valid syntax: {}".format(e.msg))
+
+    if _isNone(expr):
         expr = None
     elif not isinstance(expr, ast.Call):
         exprType = expr.__class__
@@ -227,25 +405,302 @@ def _parseEffect(string):
         callee = expr.func.__class__
         message = "Effect must call names, was {}".format(callee)
         raise ParseError(message)
-    
-    # expr is None or a valid call expr
-    
-    def effect(filePath, request, registry, resolver):
-        if expr is not None:
-            processorClass = registry[expr.func.id]
-            contentType = processorClass.producer.contentType
-            expression = ast.Expression(expr)
+
+    return expr
+
+
+def _isNone(expr):
+    """
+    Checks if an expression is None, which Python 3 parses as a constant.
+    """
+    if isinstance(expr, ast.Name):
+        return expr.id == "None"
+    return isinstance(expr, _CONSTANTS) and expr.value is None
+
+
+_CONSTANTS = tuple(getattr(ast, name) for name in ("Constant", "NameConstant")
+                   if hasattr(ast, name))
+
+
+def _compileEffect(expr, extension=None):
+    """
+    Builds the effect callable for a validated effect expression.
+
+    The extension is the one every file the effect's rule handles has, if
+    there is one. Static files with such an extension get the content type
+    the default resolver has for it, which is looked up here, unless a
+    resolver is given with a request. Processed files get the content type
+    of the processor, or of the last processor in a chain, looked up when
+    the processor is created. The headers for those content types are
+    rendered ahead of time too.
+
+    The arguments are evaluated once, here. The processor classes come from
+    the registry given with each request, so the processor is created the
+    first time the effect handles a request, and created again only if the
+    registry maps one of their names to another class. Chains, and
+    processors with a C{stream} method, stream their output; see
+    L{processing.streams}. Files are digested in the executor, static ones
+    too; see L{processing.validators}.
+
+    The time it takes to handle a request is recorded under the name of the
+    effect's processor, or its chain, like C{Minify(Concat)}.
+
+    Bundle effects are built by L{_compileBundle}.
+    """
+    if expr is None:
+        processorName = "None"
+        ruleKey = processing.ruleKey(None, [], {})
+        ruleHeaders = None
+        if extension is not None:
+            contentType = contenttype.resolver.forExtension(extension)
+            ruleHeaders = contenttype.staticHeaders(contentType)
+    else:
+        stages = _evaluateStages(expr)
+        if any(name == bundling.NAME for name, _, _ in stages):
+            return _compileBundle(stages, extension)
+        ruleKey = processing.chainKey(stages)
+        processorName = ruleKey[0]
+    bound = [None, None, None] # the processor classes, processor and headers
+
+    def bind(registry):
+        classes = [registry[name] for name, _, _ in stages]
+        if classes != bound[0]:
+            processors = [processorClass(*args, **kwargs)
+                          for processorClass, (_, args, kwargs)
+                          in zip(classes, stages)]
+            contentType = classes[-1].producer.contentType
+            bound[:] = (classes, processing.chain(processors),
+                        contenttype.staticHeaders(contentType))
+        return bound
+
+    def effect(filePath, request, registry, resolver=None):
+        collector = stats.collector
+        start = collector.clock()
+        d = respond(filePath, request, registry, resolver)
+        d.addBoth(collector.handled, processorName, start)
+        return d
+
+    def respond(filePath, request, registry, resolver):
+        st = processing.files.stat(filePath)
+        if expr is None:
+            processor = processorHeaders = None
+            streamed = False
         else:
-            contentType = resolver(filePath)
+            _, processor, processorHeaders = bind(registry)
+            streamed = processing.streams(processor)
+        d = processing.validators(ruleKey, filePath, processor, st, streamed)
+        d.addCallback(send, filePath, request, processor, processorHeaders,
+                      resolver, streamed)
+        return d.addErrback(_overloaded, request)
+
+    def send(validators, filePath, request, processor, processorHeaders,
+             resolver, streamed=False):
+        digest, lastModified = validators
+        key = (digest,) + ruleKey
+
+        if processor is not None:
+            headers, compressible = processorHeaders
+            etag = conditional.processedETag(key)
+        else:
+            if resolver is None and ruleHeaders is not None:
+                headers, compressible = ruleHeaders
+            else:
+                contentType = (resolver or contenttype.resolver)(filePath)
+                headers, compressible = contenttype.staticHeaders(contentType)
+            etag = conditional.strongETag(digest)
+
+        for name, value in headers:
+            request.setHeader(name, value)
+
+        contentEncoding = None
+        if compressible:
+            accepted = request.getHeader("Accept-Encoding")
+            contentEncoding = encoding.negotiate(accepted)
+            if contentEncoding is not None:
+                etag = encoding.variantETag(etag, contentEncoding)
+
+        if conditional.respondIfNotModified(request, etag, lastModified):
+            return defer.succeed(None)
+
+        if contentEncoding is not None:
+            request.setHeader("Content-Encoding", contentEncoding)
+
+        if streamed:
+            d = processing.stream(key, contentEncoding, filePath, processor,
+                                  request)
+            return d.addErrback(_overloaded, request)
+        elif contentEncoding is not None:
+            d = processing.encode(key, contentEncoding, filePath, processor)
+            if processor is None:
+                # Encoding a file gives the same bytes every time, so its
+                # variant can be sent in ranges under the variant's ETag.
+                d.addCallback(_sendStatic, request, headers[0][1], etag,
+                              lastModified)
+                return d.addErrback(_overloaded, request)
+        elif processor is not None:
+            d = processing.process(key, filePath, processor)
+        else:
+            cached = processing.files.acquire(filePath)
+            source = cached.file if cached.data is None else cached.data
+            d = _sendStatic(source, request, headers[0][1], etag,
+                            lastModified)
+            d.addBoth(_releaseAfterTransfer, cached)
+            return d
+
+        d.addCallbacks(_writeBody, _overloaded,
+                       callbackArgs=(request,), errbackArgs=(request,))
+        return d
 
-        request.setHeader("Content-Type", contentType)
+    return effect
+
+
+def _compileBundle(stages, extension):
+    """
+    Builds the effect callable for a bundle rule.
+
+    Bundles have a content type like static files do, and are cached and
+    encoded like processed files are. See L{bundling}.
+    """
+    if len(stages) != 1:
+        raise ParseError("Bundles can't be chained with processors")
+    _, args, kwargs = stages[0]
+    separator = kwargs.pop("separator", b"\n")
+    if (len(args) != 1 or kwargs or not isinstance(args[0], str)
+            or not isinstance(separator, bytes)):
+        raise ParseError("Bundles take a condition and a separator")
+
+    condition = args[0]
+    ruleKey = processing.chainKey(stages)
+    bundler = bundling.Bundler(
+        _compileCondition(condition, _conditionPattern(condition)),
+        separator, ruleKey)
+    ruleHeaders = None
+    if extension is not None:
+        contentType = contenttype.resolver.forExtension(extension)
+        ruleHeaders = contenttype.staticHeaders(contentType)
+
+    def effect(filePath, request, registry, resolver=None):
+        collector = stats.collector
+        start = collector.clock()
+        d = respond(filePath, request, resolver)
+        d.addBoth(collector.handled, bundling.NAME, start)
+        return d
+
+    def respond(filePath, request, resolver):
+        name, fingerprint = bundling.splitFingerprint(filePath.basename())
+        plainPath = filePath.sibling(name)
+        d = bundler.current(plainPath)
+        d.addCallback(send, plainPath, fingerprint, request, resolver)
+        d.addErrback(_overloaded, request)
+        return d
+
+    def send(bundle, plainPath, fingerprint, request, resolver):
+        digest, lastModified, data = bundle
+        if fingerprint != bundling.fingerprint(digest):
+            location = bundling.fingerprinted(plainPath.basename(), digest)
+            request.setResponseCode(http.FOUND)
+            request.setHeader("Location", location)
+            request.setHeader("Cache-Control", "no-cache")
+            request.setHeader("Content-Length", "0")
+            request.write(b"")
+            return
+
+        if resolver is None and ruleHeaders is not None:
+            headers, compressible = ruleHeaders
+        else:
+            contentType = (resolver or contenttype.resolver)(plainPath)
+            headers, compressible = contenttype.staticHeaders(contentType)
+        for name, value in headers:
+            request.setHeader(name, value)
+        request.setHeader("Cache-Control", bundling.IMMUTABLE)
+
+        etag = conditional.strongETag(digest)
+        contentEncoding = None
+        if compressible:
+            accepted = request.getHeader("Accept-Encoding")
+            contentEncoding = encoding.negotiate(accepted)
+            if contentEncoding is not None:
+                etag = encoding.variantETag(etag, contentEncoding)
+
+        if conditional.respondIfNotModified(request, etag, lastModified):
+            return
+
+        if contentEncoding is None:
+            _writeBody(data, request)
+            return
+        request.setHeader("Content-Encoding", contentEncoding)
+        key = (digest,) + ruleKey
+        d = processing.encodeContent(key, contentEncoding, data)
+        return d.addCallback(_writeBody, request)
 
-        producer = basic.FileSender()        
-        producer.beginFileTransfer(filePath.open(), request)
-    
     return effect
 
 
+def _sendStatic(source, request, contentType, etag, lastModified):
+    """
+    Sends a static file, or an encoded variant of one, or the ranges of it
+    the request asks for.
+
+    Only files that can be sent in ranges, which are those in memory or with
+    a descriptor, advertise that they accept range requests.
+    """
+    size = transfer.sourceSize(source)
+    if size is None:
+        return transfer.send(source, request)
+
+    request.setHeader("Accept-Ranges", "bytes")
+    wanted = ranges.requested(request, size, etag, lastModified)
+    if wanted is None:
+        return transfer.send(source, request)
+    return ranges.send(source, request, size, contentType, wanted)
+
+
+def _evaluateStages(expr):
+    """
+    Evaluates the stages of an effect's call expression. Other than the
+    call whose output it processes, a call's arguments must all be
+    literals.
+    """
+    call = expr
+    while call is not None:
+        if not isinstance(call.func, ast.Name):
+            callee = call.func.__class__
+            raise ParseError("Effect must call names, was {}".format(callee))
+        if getattr(call, "starargs", None) or getattr(call, "kwargs", None):
+            raise ParseError("Effect arguments can't be unpacked")
+        if any(keyword.arg is None for keyword in call.keywords):
+            raise ParseError("Effect arguments can't be unpacked")
+        call = processing.innerCall(call)
+
+    try:
+        return processing.evaluateStages(expr)
+    except Exception as e: # like ValueError, or TypeError for {[]: 1}
+        message = "Effect arguments must be literals ({}: {})"
+        raise ParseError(message.format(type(e).__name__, e))
+
+
+def _releaseAfterTransfer(result, cached):
+    cached.release()
+    return result
+
+
+def _writeBody(data, request):
+    request.setHeader("Content-Length", str(len(data)))
+    request.write(data)
+    stats.collector.sent(len(data))
+
+
+def _overloaded(failure, request):
+    """
+    Tells the client to come back later when processors are overloaded.
+    """
+    failure.trap(execution.Overloaded)
+    request.setResponseCode(503)
+    request.setHeader("Retry-After", "1")
+    request.setHeader("Content-Length", "0")
+    request.write(b"")
+
+
 
 class ParseError(Exception):
     """
@@ -258,6 +713,31 @@ class ParseError(Exception):
         Exception.__init__(self, message, line, lineNumber)
 
 
+    def _locate(self, line, lineNumber):
+        """
+        Fills in the line and line number, unless they're already known.
+        """
+        if self.line is None:
+            self.line = line
+        if self.lineNumber is None:
+            self.lineNumber = lineNumber
+        self.args = self.message, self.line, self.lineNumber
+
+
+    def __reduce__(self):
+        # Subclasses take other arguments, so they're rebuilt from what they
+        # all have in common.
+        return _rebuildParseError, (self.__class__, self.message, self.line,
+                                    self.lineNumber)
+
+
+
+def _rebuildParseError(cls, message, line, lineNumber):
+    error = Exception.__new__(cls)
+    ParseError.__init__(error, message, line, lineNumber)
+    return error
+
+
 
 class IndentationError(ParseError):
     """
@@ -273,4 +753,15 @@ class NoTokens(ParseError):
     def __init__(self, tokens, line):
         tokens = ", ".join(tokens)
         message = "No unescaped tokens (expecting one of {})".format(tokens)
-        ParseError.__init__(self, message, line)
\ No newline at end of file
+        ParseError.__init__(self, message, line)
+
+
+
+class EffectSyntaxError(ParseError, SyntaxError):
+    """
+    Raised when an effect isn't a valid Python expression.
+
+    This is a SyntaxError as well, like the error it replaces, but it knows
+    which line of the configuration file the effect is on.
+    """
+    __str__ = Exception.__str__
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Content types of static files, and the headers that come with them.
+"""
+import mimetypes
+import os
+import re
+
+from holtz import compat, encoding
+
+
+DEFAULT_TYPE = "application/octet-stream"
+DEFAULT_CACHE_SIZE = 256
+
+if not mimetypes.inited:
+    mimetypes.init()
+
+TYPES = dict(mimetypes.types_map)
+TYPES.update({
+    ".js": "application/javascript",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".wasm": "application/wasm",
+    ".webp": "image/webp",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+})
+
+
+
+class Resolver(object):
+    """
+    Resolves the content types of files from their extensions.
+
+    Extensions in the table take a single lookup. Other extensions are
+    guessed with mimetypes, and the guesses are kept in a bounded LRU
+    cache. Files nothing is known about get the default type.
+    """
+    def __init__(self, types=TYPES, cacheSize=DEFAULT_CACHE_SIZE):
+        self.types = types
+        self.cacheSize = cacheSize
+        self._cache = compat.OrderedDict()
+
+
+    def __call__(self, filePath):
+        """
+        Resolves the content type of a file.
+        """
+        return self.forExtension(os.path.splitext(filePath.path)[1].lower())
+
+
+    def forExtension(self, extension):
+        """
+        Resolves the content type of files with some lowercase extension.
+        """
+        try:
+            return self.types[extension]
+        except KeyError:
+            pass
+
+        try:
+            contentType = self._cache.pop(extension)
+        except KeyError:
+            guessed, _ = mimetypes.guess_type("file" + extension)
+            contentType = guessed or DEFAULT_TYPE
+            if len(self._cache) >= self.cacheSize:
+                self._cache.popitem(last=False)
+
+        self._cache[extension] = contentType
+        return contentType
+
+
+
+resolver = Resolver()
+
+
+
+_FIXED_EXTENSION = re.compile(r"^.+(\.[^.*?{},\\]+)$")
+
+def ruleExtension(source, pattern):
+    """
+    Returns the lowercase extension every name matching a condition has, or
+    None if names matching it can have different extensions.
+    """
+    if pattern is None:
+        extension = os.path.splitext(source)[1]
+    else:
+        match = _FIXED_EXTENSION.match(source)
+        extension = match and match.group(1)
+    return extension.lower() if extension else None
+
+
+
+_headers = {}
+
+def staticHeaders(contentType):
+    """
+    Returns the headers of responses with some content type.
+
+    Returns a tuple of (name, value) header pairs and whether the content
+    is worth compressing. Responses with compressible content vary with
+    Accept-Encoding. Results are remembered, up to a bound.
+    """
+    try:
+        return _headers[contentType]
+    except KeyError:
+        pass
+
+    headers = [("Content-Type", contentType)]
+    compressible = encoding.isCompressible(contentType)
+    if compressible:
+        headers.append(("Vary", "Accept-Encoding"))
+
+    if len(_headers) >= DEFAULT_CACHE_SIZE:
+        _headers.clear()
+    result = _headers[contentType] = tuple(headers), compressible
+    return result
@@ -0,0 +1,148 @@
+"""
+Content encodings, negotiated with Accept-Encoding.
+
+gzip is always available. Brotli is used if the brotli package is
+installed.
+"""
+import gzip
+import io
+import zlib
+
+from holtz import compat
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = frozenset([
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "application/x-javascript",
+    "image/svg+xml",
+])
+
+
+
+def _gzip(data):
+    buf = io.BytesIO()
+    f = gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0)
+    try:
+        f.write(data)
+    finally:
+        f.close()
+    return buf.getvalue()
+
+
+
+def _gzipChunks(chunks):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+
+def _brotliChunks(chunks):
+    compressor = brotli.Compressor()
+    for chunk in chunks:
+        yield compressor.process(chunk)
+    yield compressor.finish()
+
+
+
+ENCODERS = compat.OrderedDict() # in order of preference
+CHUNK_ENCODERS = {}
+if brotli is not None:
+    ENCODERS["br"] = brotli.compress
+    if hasattr(brotli, "Compressor"):
+        CHUNK_ENCODERS["br"] = _brotliChunks
+ENCODERS["gzip"] = _gzip
+CHUNK_ENCODERS["gzip"] = _gzipChunks
+
+_ALIASES = {"x-gzip": "gzip"}
+
+
+
+def encode(data, encoding):
+    """
+    Encodes some data with the given content encoding.
+    """
+    return ENCODERS[encoding](data)
+
+
+
+def encodeChunks(chunks, encoding):
+    """
+    Encodes an iterator of chunks with the given content encoding.
+
+    Returns an iterator of encoded chunks, some of which may be empty.
+    Encodings that can't be applied a chunk at a time get all the chunks
+    at once.
+    """
+    encoder = CHUNK_ENCODERS.get(encoding)
+    if encoder is None:
+        return _encodeAll(chunks, encoding)
+    return encoder(chunks)
+
+
+
+def _encodeAll(chunks, encoding):
+    yield encode(b"".join(chunks), encoding)
+
+
+
+def isCompressible(contentType):
+    """
+    Checks if content of some type is worth compressing.
+    """
+    mediaType = contentType.split(";", 1)[0].strip().lower()
+    return (mediaType.startswith("text/")
+            or mediaType.endswith(("+xml", "+json"))
+            or mediaType in COMPRESSIBLE_TYPES)
+
+
+
+def negotiate(acceptEncoding):
+    """
+    Picks the best content encoding allowed by an Accept-Encoding header.
+
+    Returns None if the content should be sent unencoded.
+    """
+    if not acceptEncoding:
+        return None
+
+    weights = {}
+    for part in acceptEncoding.split(","):
+        name, _, parameters = part.partition(";")
+        name = name.strip().lower()
+        weights[_ALIASES.get(name, name)] = _quality(parameters)
+
+    best, bestWeight = None, 0
+    for encoding in ENCODERS:
+        weight = weights.get(encoding, weights.get("*", 0))
+        if weight > bestWeight:
+            best, bestWeight = encoding, weight
+    return best
+
+
+
+def _quality(parameters):
+    for parameter in parameters.split(";"):
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0
+    return 1
+
+
+
+def variantETag(etag, encoding):
+    """
+    Returns the ETag of an encoded variant of the content with some ETag.
+    """
+    return '{}-{}"'.format(etag[:-1], encoding)
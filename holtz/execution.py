@@ -0,0 +1,222 @@
+"""
+Running processors without blocking the reactor.
+"""
+import collections
+import multiprocessing
+import sys
+
+try:
+    from concurrent import futures
+    from concurrent.futures.process import BrokenProcessPool
+except ImportError: # Python 2
+    futures = BrokenProcessPool = None
+
+from twisted.internet import defer, threads
+from twisted.python import failure
+
+from holtz import compat
+
+
+DEFAULT_MAX_RUNNING = 4
+DEFAULT_MAX_WAITING = 64
+
+
+
+class Overloaded(Exception):
+    """
+    Raised when an executor's queue is full.
+    """
+
+
+
+class Executor(object):
+    """
+    Runs jobs through a submit function, such as deferToThread.
+
+    At most maxRunning jobs run at once, and at most maxWaiting more wait
+    for their turn; jobs beyond that fail with Overloaded straight away.
+    Jobs are identified by a key: a job with the same key as one that is
+    still running or waiting isn't run again, but shares that job's result.
+
+    inProcess says whether jobs run in this process, and can share state
+    with it. If it isn't given, they're taken to, unless the submit function
+    is a L{ProcessPool}.
+    """
+    def __init__(self, submit=threads.deferToThread,
+                 maxRunning=DEFAULT_MAX_RUNNING,
+                 maxWaiting=DEFAULT_MAX_WAITING, inProcess=None):
+        self._submit = submit
+        if inProcess is None:
+            inProcess = not isinstance(submit, ProcessPool)
+        self.inProcess = inProcess
+        self.maxRunning = maxRunning
+        self.maxWaiting = maxWaiting
+        self.running = self.coalesced = self.rejected = 0
+        self._waiting = collections.deque()
+        self._inFlight = {}
+
+
+    def run(self, key, f, *args):
+        """
+        Runs f with the given arguments, unless a job with the same key is
+        already in flight.
+
+        Returns a Deferred that fires with the job's result.
+        """
+        return self._run(key, f, args, True)
+
+
+    def resume(self, key, f, *args):
+        """
+        Runs f like L{run}, except that it waits for its turn even if the
+        queue is full.
+
+        This is for jobs that carry on work that was already accepted, like
+        the next chunk of a stream, which would be wasted if they failed.
+        """
+        return self._run(key, f, args, False)
+
+
+    def _run(self, key, f, args, reject):
+        d = defer.Deferred()
+
+        waiters = self._inFlight.get(key)
+        if waiters is not None:
+            self.coalesced += 1
+            waiters.append(d)
+            return d
+
+        if self.running >= self.maxRunning:
+            if reject and len(self._waiting) >= self.maxWaiting:
+                self.rejected += 1
+                message = "{} jobs waiting".format(len(self._waiting))
+                return defer.fail(Overloaded(message))
+            self._inFlight[key] = [d]
+            self._waiting.append((key, f, args))
+        else:
+            self._inFlight[key] = [d]
+            self._start(key, f, args)
+
+        return d
+
+
+    def _start(self, key, f, args):
+        self.running += 1
+        submitted = self._submit(f, *args)
+        submitted.addBoth(self._finished, key)
+
+
+    def _finished(self, result, key):
+        self.running -= 1
+        for d in self._inFlight.pop(key):
+            if isinstance(result, failure.Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+
+        if self._waiting and self.running < self.maxRunning:
+            self._start(*self._waiting.popleft())
+
+
+
+class ProcessPool(object):
+    """
+    A submit function that runs jobs in a pool of worker processes.
+
+    Jobs must be picklable: module-level functions with picklable
+    arguments and results. Jobs are pickled before they're submitted, and
+    their results before they're sent back, so a job that can't be pickled,
+    that raises, or whose result can't be pickled fails its Deferred
+    instead of leaving it waiting forever.
+
+    Workers run in a C{concurrent.futures} process pool where there is one,
+    so that jobs fail when a worker dies, and the pool is started again.
+    Python 2's C{multiprocessing} pools replace dead workers but never tell
+    anyone about the jobs they were running.
+    """
+    def __init__(self, processes=None, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._processes = processes
+        if futures is not None:
+            self._pool = futures.ProcessPoolExecutor(processes)
+        else:
+            self._pool = multiprocessing.Pool(processes)
+
+
+    def __call__(self, f, *args):
+        try:
+            job = compat.pickle.dumps((f, args), _PROTOCOL)
+        except Exception:
+            return defer.fail()
+
+        d = defer.Deferred()
+
+        def done(outcome):
+            succeeded, value = outcome
+            try:
+                value = compat.pickle.loads(value)
+            except Exception:
+                succeeded, value = False, sys.exc_info()[1]
+            if succeeded:
+                self._reactor.callFromThread(d.callback, value)
+            else:
+                failed(value)
+
+        def failed(exception):
+            self._reactor.callFromThread(d.errback, exception)
+
+        if futures is None:
+            self._pool.apply_async(_call, (job,), callback=done)
+            return d
+
+        def finished(future):
+            try:
+                outcome = future.result()
+            except Exception:
+                failed(sys.exc_info()[1])
+            else:
+                done(outcome)
+
+        try:
+            future = self._pool.submit(_call, job)
+        except BrokenProcessPool:
+            self._pool = futures.ProcessPoolExecutor(self._processes)
+            future = self._pool.submit(_call, job)
+        future.add_done_callback(finished)
+        return d
+
+
+    def close(self):
+        """
+        Waits for running jobs to finish and stops the worker processes.
+        """
+        if futures is not None:
+            self._pool.shutdown(wait=True)
+        else:
+            self._pool.close()
+            self._pool.join()
+
+
+
+_PROTOCOL = compat.pickle.HIGHEST_PROTOCOL
+
+
+def _call(job):
+    """
+    Calls a pickled job in a worker process.
+
+    Returns whether it succeeded and either its pickled result or the
+    pickled exception it raised.
+    """
+    try:
+        f, args = compat.pickle.loads(job)
+        return True, compat.pickle.dumps(f(*args), _PROTOCOL)
+    except Exception:
+        e = sys.exc_info()[1]
+        try:
+            return False, compat.pickle.dumps(e, _PROTOCOL)
+        except Exception:
+            unpicklable = RuntimeError("{}: {}".format(type(e).__name__, e))
+            return False, compat.pickle.dumps(unpicklable, _PROTOCOL)
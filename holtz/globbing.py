@@ -0,0 +1,224 @@
+"""
+Matching names against glob patterns in linear time.
+
+A pattern is a tuple of parts, matched one after the other against the
+whole of a name:
+
+  - a string matches itself,
+  - L{ANY} matches any single character,
+  - L{STAR} matches any run of characters, including none,
+  - a tuple of strings matches any one of those strings.
+
+Patterns are matched with an automaton instead of a backtracking regex
+engine, so names are matched in time linear in their length, however many
+wildcards the patterns have. Many patterns can share a single automaton,
+which then finds the first of them that matches a name in one pass.
+"""
+
+ANY = 1
+STAR = 2
+
+DEFAULT_MAX_STATES = 4096
+
+
+
+class Automaton(object):
+    """
+    Matches names against some patterns.
+
+    The patterns are compiled into a nondeterministic automaton with one
+    state per character of every pattern. That is turned into a
+    deterministic automaton lazily, one transition at a time, as names are
+    matched; matching a name takes a dictionary lookup per character once
+    the transitions it takes are known. If the deterministic automaton grows
+    past a number of states, it's thrown away and built up again.
+
+    Nothing is compiled until the first name is matched, so automata for
+    directories that are never requested cost next to nothing.
+    """
+    def __init__(self, patterns, maxStates=DEFAULT_MAX_STATES):
+        """
+        Takes some (index, pattern) pairs. Matching a name gives the lowest
+        index of the patterns that match it.
+        """
+        self.maxStates = maxStates
+        self._patterns = patterns
+        self._start = _UNCOMPILED
+
+
+    def _build(self):
+        self._edges = [] # (character or None for any, target) per state
+        self._epsilons = {}
+        self._accepting = {}
+
+        starts = []
+        for index, pattern in self._patterns:
+            starts.append(self._compile(index, pattern))
+        self._patterns = None
+        self._starts = frozenset(self._closure(starts))
+        self._reset()
+
+
+    def _newState(self):
+        self._edges.append([])
+        return len(self._edges) - 1
+
+
+    def _compile(self, index, pattern):
+        """
+        Adds a pattern to the nondeterministic automaton.
+
+        Returns its start state.
+        """
+        start = current = self._newState()
+        for part in pattern:
+            if part == STAR:
+                if (None, current) not in self._edges[current]:
+                    self._edges[current].append((None, current))
+            elif part == ANY:
+                target = self._newState()
+                self._edges[current].append((None, target))
+                current = target
+            elif isinstance(part, tuple):
+                join = self._newState()
+                for option in part:
+                    self._chain(current, option, join)
+                current = join
+            else:
+                current = self._chain(current, part)
+
+        previous = self._accepting.get(current, index)
+        self._accepting[current] = min(previous, index)
+        return start
+
+
+    def _chain(self, current, string, end=None):
+        """
+        Adds states matching a string after the current state.
+
+        Returns the last of them, which is the given end state if there is
+        one.
+        """
+        if not string:
+            if end is None:
+                return current
+            self._epsilons.setdefault(current, []).append(end)
+            return end
+
+        for i, character in enumerate(string):
+            if i == len(string) - 1 and end is not None:
+                target = end
+            else:
+                target = self._newState()
+            self._edges[current].append((character, target))
+            current = target
+        return current
+
+
+    def _closure(self, states):
+        """
+        Adds the states reachable without consuming any characters.
+        """
+        closure = set(states)
+        stack = list(states)
+        while stack:
+            for target in self._epsilons.get(stack.pop(), ()):
+                if target not in closure:
+                    closure.add(target)
+                    stack.append(target)
+        return closure
+
+
+    def _reset(self):
+        self._states = {}
+        self._start = self._state(self._starts)
+
+
+    def _state(self, states):
+        """
+        Returns the deterministic state for a set of states, or None if the
+        set is empty.
+        """
+        if not states:
+            return None
+        try:
+            return self._states[states]
+        except KeyError:
+            pass
+
+        accepts = [self._accepting[s] for s in states if s in self._accepting]
+        state = self._states[states] = _State(states, min(accepts or [None]))
+        return state
+
+
+    def _step(self, state, character):
+        """
+        Works out where a deterministic state goes with a character.
+        """
+        if len(self._states) >= self.maxStates:
+            self._reset()
+
+        targets = set()
+        for s in state.states:
+            for label, target in self._edges[s]:
+                if label is None or label == character:
+                    targets.add(target)
+
+        if self._epsilons:
+            targets = self._closure(targets)
+        target = state.next[character] = self._state(frozenset(targets))
+        return target
+
+
+    def match(self, name):
+        """
+        Returns the lowest index of the patterns matching a name, or None if
+        none of them match it.
+        """
+        state = self._start
+        if state is _UNCOMPILED:
+            self._build()
+            state = self._start
+
+        for character in name:
+            if state is None:
+                return None
+            try:
+                state = state.next[character]
+            except KeyError:
+                state = self._step(state, character)
+        return state.accepts if state is not None else None
+
+
+    def matches(self, name):
+        """
+        Checks if any of the patterns match a name.
+        """
+        return self.match(name) is not None
+
+
+
+_UNCOMPILED = object()
+
+
+
+class _State(object):
+    """
+    A state of the deterministic automaton: a set of states of the
+    nondeterministic one, with the transitions worked out so far.
+    """
+    __slots__ = "states", "accepts", "next"
+
+    def __init__(self, states, accepts):
+        self.states = states
+        self.accepts = accepts
+        self.next = {}
+
+
+
+def compile(pattern):
+    """
+    Compiles a single pattern into a function that checks if a name
+    matches it.
+    """
+    return Automaton([(0, pattern)]).matches
@@ -0,0 +1,71 @@
+"""
+Matching names against the entries of a directory.
+"""
+from holtz import globbing
+
+
+
+class Matcher(object):
+    """
+    Finds the first entry of a directory whose condition matches a name.
+
+    Literal conditions are looked up in a dictionary, and glob conditions
+    are compiled together into a single automaton, which finds the first
+    glob matching a name in one pass over it. The entry that comes first in
+    the directory always wins.
+    """
+    def __init__(self, entries):
+        self._entries = tuple(entries)
+        self._literals = {}
+        self._opaque = []
+
+        globs = []
+        for index, entry in enumerate(self._entries):
+            if entry.pattern is not None:
+                globs.append((index, entry.pattern))
+            elif entry.source is not None:
+                self._literals.setdefault(entry.source, index)
+            else:
+                self._opaque.append((index, entry.condition))
+
+        if globs:
+            self._firstGlob = globs[0][0]
+            self._globs = globbing.Automaton(globs)
+        else:
+            self._firstGlob = len(self._entries)
+            self._globs = None
+
+
+    def match(self, name):
+        """
+        Returns the first entry matching the given name, or None.
+        """
+        best = self._literals.get(name, len(self._entries))
+
+        if self._firstGlob < best:
+            index = self._globs.match(name)
+            if index is not None and index < best:
+                best = index
+
+        for index, condition in self._opaque:
+            if index >= best:
+                break
+            if condition(name):
+                best = index
+                break
+
+        if best < len(self._entries):
+            return self._entries[best]
+        return None
+
+
+
+def compileTree(root):
+    """
+    Builds matchers for a directory and all of its subdirectories.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        directory.matcher = Matcher(directory.entries)
+        stack.extend(directory.subdirectories.values())
@@ -0,0 +1,201 @@
+"""
+Parsing large configurations in parallel.
+
+Every top-level directory of a configuration is a block that can be parsed
+on its own. The configuration is split into batches of such blocks, the
+batches are parsed in a pool of processes, and the resulting trees are put
+back together in order. The tree is the same one L{config.parse} builds,
+and so are the errors, line numbers included.
+"""
+import gc
+import multiprocessing
+
+from holtz import compat, config, contenttype, matching, structure
+
+
+BATCHES_PER_PROCESS = 4
+
+
+
+def parse(source, indent=None, pool=None, processes=None,
+          compileMatchers=True):
+    """
+    Parses a configuration from a file or any other iterable of lines, in
+    parallel.
+
+    Batches are parsed in the given multiprocessing pool. If there is none,
+    a pool with the given number of processes is made for the occasion. The
+    configuration is split for that many processes, by default one per CPU.
+    Configurations too small to split are parsed in this process, and so
+    are all configurations if there's only one process and no pool.
+
+    See L{config.parse} for the other arguments.
+    """
+    lines = list(source)
+    if indent is None:
+        indent, _ = config._detectIndentationFromLines(iter(lines))
+    indent = indent or config.FOUR_SPACES
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    batches = _split(lines, processes * BATCHES_PER_PROCESS)
+    if len(batches) < 2 or (pool is None and processes < 2):
+        return config.parse(lines, indent, compileMatchers)
+
+    arguments = [(indent, lines[start:end]) for start, end in batches]
+    if pool is not None:
+        results = pool.map(_parseBatch, arguments)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_parseBatch, arguments)
+        finally:
+            pool.close()
+            pool.join()
+
+    # Building lots of small objects triggers the cyclic garbage collector
+    # over and over, like it does when loading artifacts.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        root = structure.Directory()
+        conditions, effects = {}, {}
+        for (start, end), (error, tree) in zip(batches, results):
+            if error is not None:
+                raise _relocate(error, lines, start, end)
+
+            batchRoot = _thaw(tree, conditions, effects)
+            root.entries.extend(batchRoot.entries)
+            for name, directory in batchRoot.subdirectories.items():
+                root.subdirectories[name] = directory
+
+        if compileMatchers:
+            root.freeze()
+            matching.compileTree(root)
+        return root
+    finally:
+        if enabled:
+            gc.enable()
+
+
+
+def _split(lines, count):
+    """
+    Splits lines into about the given number of batches of similar size,
+    at lines starting a top-level directory.
+
+    Returns (start, end) pairs of line indices.
+    """
+    target = max(len(lines) // count, 1)
+    batches, start = [], 0
+    for index, line in enumerate(lines):
+        if index - start < target or line[:1] in _NOT_TOP_LEVEL:
+            continue
+        if line.rstrip().endswith("/"):
+            batches.append((start, index))
+            start = index
+
+    batches.append((start, len(lines)))
+    return batches
+
+
+
+_NOT_TOP_LEVEL = frozenset(["", " ", "\t", "\r", "\n"])
+
+
+
+def _parseBatch(arguments):
+    """
+    Parses a batch of lines in a worker.
+
+    Returns an error and None if the batch doesn't parse, or None and the
+    tree made by L{_freeze}.
+    """
+    indent, lines = arguments
+    parser = config.Parser(indent, compileMatchers=False)
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for line in lines:
+            parser.push(line)
+        parser.push("")
+        effectStrings = dict((id(expression), effectString)
+                             for (effectString, _), (expression, _)
+                             in parser._effects.items())
+        return None, _freeze(parser.root, effectStrings)
+    except config.ParseError as e:
+        return e, None
+    finally:
+        if enabled:
+            gc.enable()
+
+
+
+def _freeze(directory, effectStrings):
+    """
+    Turns a directory tree into nested tuples that are quick to pickle.
+
+    Unlike artifacts, which keep the validated effect expressions, these
+    keep the effect strings, which are much smaller. There are few distinct
+    ones, so parsing them again is cheap.
+    """
+    entries = [(e.source, e.pattern, effectStrings[id(e.expression)])
+               for e in directory.entries]
+    subdirectories = [(name, _freeze(subdirectory, effectStrings))
+                      for name, subdirectory
+                      in directory.subdirectories.items()]
+    return entries, subdirectories
+
+
+
+def _thaw(tree, conditions, effects):
+    """
+    Rebuilds a directory tree from the nested tuples made by L{_freeze}.
+
+    Like the parser, entries with the same condition or effect share it.
+    """
+    entries, subdirectories = tree
+
+    directory = structure.Directory()
+    for source, pattern, effectString in entries:
+        try:
+            source, condition, extension = conditions[source, pattern]
+        except KeyError:
+            source = compat.intern(source)
+            condition = config._compileCondition(source, pattern)
+            extension = contenttype.ruleExtension(source, pattern)
+            conditions[source, pattern] = source, condition, extension
+
+        try:
+            expression, effect = effects[effectString, extension]
+        except KeyError:
+            expression = config._parseEffectExpression(effectString)
+            effect = config._compileEffect(expression, extension)
+            effects[effectString, extension] = expression, effect
+
+        entry = structure.Entry(condition, effect,
+                                source, pattern, expression)
+        directory.entries.append(entry)
+
+    for name, subtree in subdirectories:
+        directory.subdirectories[compat.intern(name)] = \
+            _thaw(subtree, conditions, effects)
+
+    return directory
+
+
+
+def _relocate(error, lines, start, end):
+    """
+    Turns the line number of an error in a batch into one in the whole
+    configuration.
+
+    Errors found at the end of a batch that isn't the last one are really
+    found at the first line of the next one.
+    """
+    if error.lineNumber is not None:
+        if error.lineNumber > end - start and end < len(lines):
+            error.line = lines[end]
+        error.lineNumber += start
+        error._locate(error.line, error.lineNumber)
+    return error
@@ -0,0 +1,443 @@
+"""
+Running processors on files.
+
+Effects call processors by name. The registry maps those names to
+processor classes, whose C{producer.contentType} is the content type of
+their output. Calling a processor class with the effect's arguments creates
+a processor, and its C{process} method takes the content of a file and
+returns the processed content. Every rule creates its processor once and
+reuses it, so a processor may be processing several files at once, in
+several threads: processors have to be thread-safe. When the executor runs
+jobs in worker processes, processors are pickled with every job, so they
+have to be picklable too.
+
+Effects can chain processors by nesting calls: C{Minify(Concat())} runs
+files through a C{Concat}, then through a C{Minify}. A processor may have a
+C{stream} method, which takes an iterator of chunks of content and returns
+an iterator of chunks of processed content. Chains, and processors with a
+C{stream} method, run a chunk at a time through the processors that have
+one, and stream their output to the client as it comes out. They're
+processed whole instead when the executor runs jobs in other processes,
+which can't share a stream with the reactor.
+
+Processors run through an executor, off the reactor thread. Processed
+content is cached, keyed by the digest of the file's content, the
+processor's name and the effect's arguments. Encoded variants of files and
+processed content are cached alongside it.
+"""
+import ast
+import hashlib
+
+from twisted.internet import defer
+
+from holtz import caching, encoding, execution, transfer
+
+
+# Streamed output up to this size is cached once it's complete.
+MAX_STREAMED_BYTES = 2 ** 20
+
+
+files = caching.FileCache()
+digests = caching.DigestCache()
+cache = caching.OutputCache()
+executor = execution.Executor()
+
+
+
+def evaluateArguments(expr):
+    """
+    Evaluates the literal arguments of an effect's call expression, leaving
+    out the call whose output it processes, if there is one.
+
+    Returns a list of positional arguments and a dict of keyword arguments.
+    """
+    args = expr.args[1:] if innerCall(expr) is not None else expr.args
+    args = [ast.literal_eval(arg) for arg in args]
+    kwargs = dict((keyword.arg, ast.literal_eval(keyword.value))
+                  for keyword in expr.keywords)
+    return args, kwargs
+
+
+
+def innerCall(expr):
+    """
+    Returns the call whose output a call expression processes, which is
+    its first argument, or None if there is none.
+    """
+    if expr.args and isinstance(expr.args[0], ast.Call):
+        return expr.args[0]
+    return None
+
+
+
+def evaluateStages(expr):
+    """
+    Evaluates the stages of an effect's call expression.
+
+    Returns a list of (name, args, kwargs) tuples, one for each processor
+    in the chain, in the order they run in.
+    """
+    stages = []
+    while expr is not None:
+        args, kwargs = evaluateArguments(expr)
+        stages.append((expr.func.id, args, kwargs))
+        expr = innerCall(expr)
+    stages.reverse()
+    return stages
+
+
+
+def cacheKey(digest, name, args, kwargs):
+    """
+    Builds the output cache key for processing content with some digest.
+    """
+    return (digest,) + ruleKey(name, args, kwargs)
+
+
+
+def ruleKey(name, args, kwargs):
+    """
+    Builds the part of output cache keys that identifies a rule: the name
+    of its processor and its arguments.
+    """
+    return name, repr((args, sorted(kwargs.items())))
+
+
+
+def chainKey(stages):
+    """
+    Builds the part of output cache keys that identifies a rule with a
+    chain of processors, given the chain's stages.
+
+    A single processor has the same key L{ruleKey} builds for it.
+    """
+    if len(stages) == 1:
+        return ruleKey(*stages[0])
+
+    name = stages[0][0]
+    for stageName, _, _ in stages[1:]:
+        name = "{}({})".format(stageName, name)
+    arguments = [(args, sorted(kwargs.items())) for _, args, kwargs in stages]
+    return name, repr(arguments)
+
+
+
+def chain(processors):
+    """
+    Makes a processor out of processors that run one after the other.
+
+    A single processor is returned as is.
+    """
+    if len(processors) == 1:
+        return processors[0]
+    return Chain(processors)
+
+
+
+class Chain(object):
+    """
+    A processor that runs processors one after the other, each one
+    processing the output of the one before it.
+
+    Processors without a C{stream} method get all of their input at once,
+    so they hold up the ones after them until it has all been read.
+    """
+    def __init__(self, processors):
+        self.processors = processors
+
+
+    def process(self, content):
+        return b"".join(self.stream(iter([content])))
+
+
+    def stream(self, chunks):
+        for processor in self.processors:
+            stream = getattr(processor, "stream", None)
+            if stream is not None:
+                chunks = stream(chunks)
+            else:
+                chunks = _processAll(processor, chunks)
+        return chunks
+
+
+
+def _processAll(processor, chunks):
+    yield processor.process(b"".join(chunks))
+
+
+
+def streams(processor):
+    """
+    Checks if a processor's output is streamed: if it has a C{stream}
+    method, and the executor runs jobs in this process.
+    """
+    return executor.inProcess and hasattr(processor, "stream")
+
+
+
+def process(key, filePath, processor):
+    """
+    Processes a file.
+
+    The key is the output cache key for the file's content and the effect.
+    The processor only runs if the output isn't cached yet, and concurrent
+    requests for the same output share a single run. Returns a Deferred
+    that fires with the processed content.
+    """
+    data = cache.get(key)
+    if data is not None:
+        return defer.succeed(data)
+
+    d = executor.run(key, processFile, filePath.path, processor)
+
+    @d.addCallback
+    def store(result):
+        # The file may have changed since it was digested.
+        digest, data = result
+        cache.put((digest,) + key[1:], data)
+        return data
+
+    return d
+
+
+
+def validators(ruleKey, filePath, processor, st, streamed=False):
+    """
+    Gets the digest of a file's content and its modification time, to
+    send it as is if the processor is None, or to process it with a rule's
+    processor.
+
+    Returns a Deferred, which fires straight away if the digest is known.
+    Otherwise, the file is digested in the executor, by the job that
+    processes it, which caches the output too, or by a job of its own if
+    the file is sent as is or the output is going to be streamed.
+    """
+    digest = digests.known(filePath, st)
+    if digest is not None:
+        return defer.succeed((digest, st.st_mtime))
+
+    streamed = streamed or processor is None
+    if streamed:
+        d = executor.run((filePath.path,), digestFile, filePath.path)
+    else:
+        d = executor.run((filePath.path,) + ruleKey, processFile,
+                         filePath.path, processor)
+
+    @d.addCallback
+    def remember(result):
+        if streamed:
+            digest = result
+        else:
+            digest, data = result
+            cache.put((digest,) + ruleKey, data)
+        digests.remember(filePath, digest, st)
+        return digest, st.st_mtime
+
+    return d
+
+
+
+def encode(key, contentEncoding, filePath, processor):
+    """
+    Encodes a file, or its processed content if there is a processor.
+
+    Returns a Deferred that fires with the encoded content, which is cached
+    next to the processed content.
+    """
+    variantKey = key + (contentEncoding,)
+    data = cache.get(variantKey)
+    if data is not None:
+        return defer.succeed(data)
+
+    if processor is not None:
+        d = process(key, filePath, processor)
+        return d.addCallback(lambda content: encodeContent(
+            key, contentEncoding, content))
+
+    d = executor.run(variantKey, encodeFile, filePath.path, contentEncoding)
+
+    @d.addCallback
+    def store(result):
+        digest, data = result
+        cache.put((digest,) + variantKey[1:], data)
+        return data
+
+    return d
+
+
+
+def encodeContent(key, contentEncoding, content):
+    """
+    Encodes some content, which is cached under the given output cache key.
+
+    Returns a Deferred that fires with the encoded content, which is cached
+    next to the content.
+    """
+    variantKey = key + (contentEncoding,)
+    data = cache.get(variantKey)
+    if data is not None:
+        return defer.succeed(data)
+
+    d = executor.run(variantKey, encoding.encode, content, contentEncoding)
+
+    @d.addCallback
+    def store(data):
+        cache.put(variantKey, data)
+        return data
+
+    return d
+
+
+
+def stream(key, contentEncoding, filePath, processor, request):
+    """
+    Streams a file through a processor, or a processor chain, to a request,
+    encoding the output if an encoding is given.
+
+    Output that is already cached is sent whole. Otherwise, the chain runs
+    a chunk at a time, each chunk being a job for the executor, and the
+    output is written as it comes out, without a Content-Length. Output no
+    larger than L{MAX_STREAMED_BYTES} is cached once it's complete. Streams
+    are run in turns across jobs, so the executor has to run jobs in this
+    process; see L{streams}.
+
+    Returns a Deferred that fires when the output has been sent. If the
+    executor is overloaded, it fails with Overloaded before anything is
+    written.
+    """
+    if contentEncoding is not None:
+        key += (contentEncoding,)
+    data = cache.get(key)
+    if data is not None:
+        return transfer.sendBytes(data, request)
+
+    if getattr(request, "method", None) == b"HEAD":
+        request.write(b"")
+        return defer.succeed(None)
+
+    digest = hashlib.sha256()
+    chunks = streamFile(filePath.path, processor, contentEncoding, digest)
+    chunks = _Stream(chunks, MAX_STREAMED_BYTES)
+    d = transfer.ChunkProducer(chunks, request, _fetchChunk).begin()
+
+    @d.addCallback
+    def store(_):
+        # The file may have changed since it was digested.
+        if chunks.kept is not None:
+            data = b"".join(chunks.kept)
+            cache.put((digest.hexdigest(),) + key[1:], data)
+
+    return d
+
+
+
+def _fetchChunk(chunks):
+    """
+    Fetches the next chunk of a stream in the executor. Only the first
+    chunk can be turned away.
+    """
+    if chunks.started:
+        return executor.resume(chunks, next, chunks, None)
+    chunks.started = True
+    return executor.run(chunks, next, chunks, None)
+
+
+
+class _Stream(object):
+    """
+    An iterator of the chunks of a stream's output, which keeps them on the
+    way unless there are too many bytes of them to cache.
+    """
+    def __init__(self, chunks, maxBytes):
+        self.chunks = chunks
+        self.maxBytes = maxBytes
+        self.kept = []
+        self.size = 0
+        self.started = False
+
+
+    def __iter__(self):
+        return self
+
+
+    def __next__(self):
+        chunk = next(self.chunks)
+        self.size += len(chunk)
+        if self.kept is not None:
+            if self.size <= self.maxBytes:
+                self.kept.append(chunk)
+            else:
+                self.kept = None
+        return chunk
+
+    next = __next__
+
+
+    def close(self):
+        self.chunks.close()
+
+
+
+def streamFile(path, processor, contentEncoding=None, digest=None):
+    """
+    Reads a file a chunk at a time and streams it through a processor, or a
+    processor chain, then through an encoder if an encoding is given.
+
+    Yields the chunks of output that aren't empty. The content that is read
+    is added to the digest, if there is one.
+    """
+    with open(path, "rb") as f:
+        chunks = _readChunks(f, digest)
+        chunks = processor.stream(chunks)
+        if contentEncoding is not None:
+            chunks = encoding.encodeChunks(chunks, contentEncoding)
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+
+
+
+def _readChunks(f, digest):
+    for chunk in iter(lambda: f.read(transfer.CHUNK_SIZE), b""):
+        if digest is not None:
+            digest.update(chunk)
+        yield chunk
+
+
+
+def encodeFile(path, contentEncoding):
+    """
+    Reads and encodes a file.
+
+    Returns the digest of the content that was read and the encoded
+    content.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    data = encoding.encode(content, contentEncoding)
+    return hashlib.sha256(content).hexdigest(), data
+
+
+
+def digestFile(path):
+    """
+    Reads and digests a file.
+
+    This is what runs in the executor. Returns the hex digest.
+    """
+    with open(path, "rb") as f:
+        return caching.fileDigest(f)
+
+
+
+def processFile(path, processor):
+    """
+    Reads and processes a file.
+
+    This is what runs in the executor. Returns the digest of the content
+    that was read and the processed content.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    data = processor.process(content)
+    return hashlib.sha256(content).hexdigest(), data
@@ -0,0 +1,194 @@
+"""
+Range requests: sending parts of static files.
+"""
+import binascii
+import os
+import re
+
+from twisted.internet import defer
+from twisted.web import http
+
+from holtz import conditional, transfer
+
+
+MAX_RANGES = 16
+
+
+
+def requested(request, size, etag, lastModified):
+    """
+    Returns the byte ranges of a response with some size that a request asks
+    for, as sorted (offset, length) pairs, with overlapping and adjacent
+    ranges merged.
+
+    Returns None if the whole response should be sent instead: there's no
+    Range header, the response has changed since the If-Range validator,
+    the header isn't a byte range set, or it asks for too many ranges.
+    Returns an empty list if none of the ranges are satisfiable.
+    """
+    header = _text(request.getHeader("Range"))
+    if header is None:
+        return None
+
+    ifRange = _text(request.getHeader("If-Range"))
+    if ifRange is not None and not _isCurrent(ifRange.strip(), etag,
+                                              lastModified):
+        return None
+
+    return parse(header, size)
+
+
+
+def _text(value):
+    if isinstance(value, bytes) and not isinstance(value, str):
+        return value.decode("latin-1")
+    return value
+
+
+
+def _isCurrent(ifRange, etag, lastModified):
+    """
+    Checks if an If-Range validator still holds.
+
+    Entity tags are compared strongly, so weak ones never hold. Dates only
+    hold if they're exactly the last modification date.
+    """
+    if ifRange.startswith(('"', "W/")):
+        return ifRange == etag
+    return conditional.parseDate(ifRange) == int(lastModified)
+
+
+
+_SPEC = re.compile(r"^(\d+)\s*-\s*(\d*)$|^-\s*(\d+)$")
+
+def parse(header, size):
+    """
+    Parses a Range header for a response with some size.
+
+    See L{requested} for what's returned.
+    """
+    unit, separator, specs = header.partition("=")
+    if not separator or unit.strip().lower() != "bytes":
+        return None
+
+    ranges = []
+    count = 0
+    for spec in specs.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        count += 1
+
+        match = _SPEC.match(spec)
+        if match is None:
+            return None
+        first, last, suffix = match.groups()
+
+        if suffix is not None:
+            suffix = int(suffix)
+            if not suffix or not size:
+                continue
+            ranges.append((max(size - suffix, 0), size - 1))
+            continue
+
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            end = int(last) if last else size - 1
+            ranges.append((start, min(end, size - 1)))
+
+    if not count or count > MAX_RANGES:
+        return None
+    return _coalesce(ranges)
+
+
+
+def _coalesce(ranges):
+    """
+    Sorts and merges overlapping or adjacent inclusive (start, end) ranges,
+    and turns them into (offset, length) pairs.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end - start + 1) for start, end in merged]
+
+
+
+def send(source, request, size, contentType, ranges):
+    """
+    Sends the ranges of some bytes or an open file a request asked for.
+
+    The ranges are those from L{requested}. No ranges get a 416 response.
+    A single range is sent as the body of a 206 response. Several ranges are
+    sent as the parts of a multipart/byteranges body, each with the content
+    type of the whole.
+
+    The ranges themselves are sent with L{transfer.sendRange}, so they're
+    sent from memory, with sendfile or a chunk at a time like whole files.
+
+    Returns a Deferred that fires when the response has been sent.
+    """
+    if not ranges:
+        request.setResponseCode(http.REQUESTED_RANGE_NOT_SATISFIABLE)
+        request.setHeader("Content-Range", "bytes */{}".format(size))
+        request.setHeader("Content-Length", "0")
+        request.write(b"")
+        return defer.succeed(None)
+
+    request.setResponseCode(http.PARTIAL_CONTENT)
+
+    if len(ranges) == 1:
+        (offset, length), = ranges
+        request.setHeader("Content-Range",
+                          _contentRange(offset, length, size))
+        request.setHeader("Content-Length", str(length))
+        return _sendParts(source, request, [(b"", offset, length)], b"")
+
+    boundary = binascii.hexlify(os.urandom(12)).decode("ascii")
+    parts = []
+    for offset, length in ranges:
+        head = "\r\n--{}\r\nContent-Type: {}\r\nContent-Range: {}\r\n\r\n"
+        head = head.format(boundary, contentType,
+                           _contentRange(offset, length, size))
+        parts.append((head.encode("latin-1"), offset, length))
+    tail = "\r\n--{}--\r\n".format(boundary).encode("ascii")
+
+    total = sum(len(head) + length for head, _, length in parts) + len(tail)
+    request.setHeader("Content-Type",
+                      "multipart/byteranges; boundary=" + boundary)
+    request.setHeader("Content-Length", str(total))
+    return _sendParts(source, request, parts, tail)
+
+
+
+def _contentRange(offset, length, size):
+    return "bytes {}-{}/{}".format(offset, offset + length - 1, size)
+
+
+
+def _sendParts(source, request, parts, tail):
+    """
+    Sends (head, offset, length) parts one after the other, then a tail.
+    """
+    if getattr(request, "method", None) == b"HEAD":
+        request.write(b"")
+        return defer.succeed(None)
+
+    d = defer.succeed(None)
+    for head, offset, length in parts:
+        d.addCallback(_sendPart, source, request, head, offset, length)
+    if tail:
+        d.addCallback(lambda _: request.write(tail))
+    return d
+
+
+
+def _sendPart(_, source, request, head, offset, length):
+    if head:
+        request.write(head)
+    return transfer.sendRange(source, request, offset, length)
@@ -0,0 +1,198 @@
+"""
+Reloading a configuration while serving.
+"""
+import ast
+import os
+import signal
+
+from twisted.internet import task
+from twisted.python import log
+
+from holtz import artifact, config, matching, processing, resolve
+
+
+DEFAULT_INTERVAL = 1.0
+
+
+
+class LiveConfig(object):
+    """
+    The live directory tree of a configuration file.
+
+    Reloading parses the file again and compares the new tree with the live
+    one. Directories that didn't change are kept, along with their compiled
+    matchers; only changed directories get new matchers. The new root then
+    replaces the old one in a single assignment. The old tree is never
+    modified, so requests that already resolved an entry are unaffected.
+
+    Cached path resolutions for changed directories are forgotten, as is
+    cached output of rules that no longer exist.
+    """
+    def __init__(self, path, cacheSize=resolve.DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.root = artifact.load(path)
+        self.resolver = resolve.PathResolver(self.root, cacheSize)
+        self._stat = _stat(path)
+
+
+    def resolve(self, path):
+        """
+        Resolves a path against the live tree.
+        """
+        return self.resolver.resolve(path)
+
+
+    def peek(self, path):
+        """
+        Resolves a path against the live tree, without recording it.
+        """
+        return self.resolver.peek(path)
+
+
+    def reload(self):
+        """
+        Reloads the configuration file.
+
+        If the new configuration doesn't parse, the live tree is kept and
+        the error is logged. Returns the list of changes, as (segments,
+        recursive) pairs describing the directories that changed.
+        """
+        self._stat = _stat(self.path)
+        try:
+            with open(self.path) as f:
+                new = config.parse(f, compileMatchers=False)
+        except (config.ParseError, EnvironmentError):
+            log.err(None, "Reloading {} failed".format(self.path))
+            return []
+
+        changes = []
+        root = _merge(self.root, new, [], changes)
+        if root is self.root:
+            return changes
+
+        root.freeze()
+        removedRules = _rules(self.root) - _rules(root)
+        self.root = self.resolver.root = root
+
+        for segments, recursive in changes:
+            self.resolver.invalidate(segments, recursive)
+        if removedRules:
+            processing.cache.discardWhere(
+                lambda key: tuple(key[1:3]) in removedRules)
+        return changes
+
+
+    def reloadIfChanged(self):
+        """
+        Reloads the configuration file if its stat changed.
+        """
+        if _stat(self.path) != self._stat:
+            self.reload()
+
+
+    def watch(self, interval=DEFAULT_INTERVAL, clock=None):
+        """
+        Starts checking the configuration file for changes periodically.
+
+        Returns the LoopingCall doing the checking.
+        """
+        call = task.LoopingCall(self.reloadIfChanged)
+        if clock is not None:
+            call.clock = clock
+        call.start(interval, now=False)
+        return call
+
+
+    def reloadOnSignal(self, signum=signal.SIGHUP, reactor=None):
+        """
+        Reloads the configuration when the process gets a signal.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+
+        def handler(signum, frame):
+            reactor.callFromThread(self.reload)
+
+        signal.signal(signum, handler)
+
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except EnvironmentError:
+        return None
+    return st.st_size, st.st_mtime, st.st_ino
+
+
+
+def _entryKey(entry):
+    expression = entry.expression
+    if expression is not None:
+        expression = ast.dump(expression)
+    return entry.source, entry.pattern, expression
+
+
+
+def _merge(old, new, segments, changes):
+    """
+    Merges a new directory into the live one at the same path.
+
+    Returns the old directory if nothing in it changed. Otherwise, returns
+    the new directory, with unchanged subdirectories replaced by the old
+    ones and a matcher reused or built as needed. The old directory is left
+    alone.
+    """
+    if old is None:
+        changes.append((segments, True))
+        matching.compileTree(new)
+        return new
+
+    subdirectories = []
+    for name, subdirectory in new.subdirectories.items():
+        oldSubdirectory = old.subdirectories.get(name)
+        merged = _merge(oldSubdirectory, subdirectory,
+                        segments + [name], changes)
+        subdirectories.append((name, merged))
+
+    for name in old.subdirectories:
+        if name not in new.subdirectories:
+            changes.append((segments + [name], True))
+
+    sameEntries = (list(map(_entryKey, old.entries))
+                   == list(map(_entryKey, new.entries)))
+    sameSubdirectories = (
+        len(old.subdirectories) == len(subdirectories)
+        and all(merged is old.subdirectories.get(name)
+                for name, merged in subdirectories))
+
+    if sameEntries and sameSubdirectories:
+        return old
+
+    if sameEntries:
+        new.entries, new.matcher = old.entries, old.matcher
+    else:
+        changes.append((segments, False))
+        new.matcher = matching.Matcher(new.entries)
+
+    for name, merged in subdirectories:
+        new.subdirectories[name] = merged
+    return new
+
+
+
+def _rules(root):
+    """
+    Collects the (processor, arguments) pairs of every rule in a tree, as
+    they appear in output cache keys.
+    """
+    rules = set()
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        for entry in directory.entries:
+            if entry.expression is not None:
+                stages = processing.evaluateStages(entry.expression)
+                rules.add(processing.chainKey(stages))
+        stack.extend(directory.subdirectories.values())
+    return rules
@@ -0,0 +1,110 @@
+"""
+Resolving request paths to the entries that handle them.
+"""
+from holtz import compat, stats
+
+
+DEFAULT_CACHE_SIZE = 1024
+_UNRESOLVED = (None, None), None
+
+
+
+class PathResolver(object):
+    """
+    Resolves request paths against a parsed directory tree.
+
+    The tree is walked like a trie: every segment but the last picks a
+    subdirectory, and the last segment is matched against that directory's
+    entries. Results, including misses, are kept in a bounded LRU cache.
+    """
+    def __init__(self, root, cacheSize=DEFAULT_CACHE_SIZE):
+        self.root = root
+        self.cacheSize = cacheSize
+        self._cache = compat.OrderedDict()
+        self.hits = self.misses = 0
+
+
+    def resolve(self, path):
+        """
+        Resolves a path to the entry handling it and that entry's effect.
+
+        Returns a (None, None) tuple if no entry handles the path.
+        """
+        collector = stats.collector
+        start = collector.clock()
+        try:
+            result, rule = self._cache.pop(path)
+        except KeyError:
+            self.misses += 1
+            result, rule = self._walk(path, collector)
+            if len(self._cache) >= self.cacheSize:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+
+        self._cache[path] = result, rule
+        collector.resolved(rule, collector.clock() - start)
+        return result
+
+
+    def peek(self, path):
+        """
+        Resolves a path like L{resolve}, without counting it in the stats or
+        keeping it in the cache.
+        """
+        cached = self._cache.get(path)
+        if cached is not None:
+            return cached[0]
+        return self._walk(path)[0]
+
+
+    def _walk(self, path, collector=None):
+        """
+        Walks the tree to the entry handling a path, timing the match with
+        the collector if there is one.
+
+        Returns the entry and its effect, and the rule stats count the
+        entry under.
+        """
+        segments = path.lstrip("/").split("/")
+        parents, name = segments[:-1], segments[-1]
+        directory = self.root
+        for segment in parents:
+            directory = directory.subdirectories.get(segment)
+            if directory is None:
+                return _UNRESOLVED
+
+        if collector is None:
+            entry = directory.match(name)
+        else:
+            start = collector.clock()
+            entry = directory.match(name)
+            collector.matched(collector.clock() - start)
+        if entry is None:
+            return _UNRESOLVED
+        rule = "".join(parent + "/" for parent in parents), entry.source
+        return (entry, entry.effect), rule
+
+
+    def invalidate(self, segments, recursive=False):
+        """
+        Forgets the cached resolutions of paths in a directory.
+
+        The directory is given as a list of path segments. If recursive is
+        true, paths in its subdirectories are forgotten as well.
+        """
+        depth = len(segments)
+        for path in list(self._cache):
+            parents = path.lstrip("/").split("/")[:-1]
+            if recursive:
+                parents = parents[:depth]
+            if parents == segments:
+                del self._cache[path]
+
+
+    def clear(self):
+        """
+        Empties the cache and resets the hit and miss counters.
+        """
+        self._cache.clear()
+        self.hits = self.misses = 0
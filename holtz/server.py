@@ -0,0 +1,97 @@
+"""
+Serving a directory with the rules of a directory tree.
+
+The lookup is shared by every serving backend. This module also has the
+twisted.web one.
+"""
+import stat
+
+from twisted.python import filepath, log
+from twisted.web import http, resource, server
+
+from holtz import bundling, compat, processing
+
+
+
+def lookup(tree, directory, path):
+    """
+    Finds the file a request path refers to, and the effect handling it.
+
+    The tree is anything with resolve and peek methods, like a path
+    resolver or a live config, and the directory is the FilePath of the
+    directory being served. The path may be quoted, and may be bytes.
+
+    Bundles aren't files, so they're found whether or not there's a file
+    with their name, and with or without a fingerprint in their name. Only
+    the rule that ends up handling the path is recorded.
+
+    Returns a (filePath, effect) pair, or (None, None) if no entry handles
+    the path or there is no such file.
+    """
+    if not isinstance(path, str):
+        path = path.decode("utf-8", "replace")
+    path = compat.unquote(path)
+
+    resolved = path
+    plainPath, fingerprint = bundling.splitFingerprint(path)
+    if fingerprint is not None and bundling.isBundle(tree.peek(plainPath)[0]):
+        resolved = plainPath
+    entry, effect = tree.resolve(resolved)
+    if effect is None:
+        return None, None
+
+    try:
+        filePath = directory.preauthChild(path.lstrip("/"))
+        if bundling.isBundle(entry):
+            return filePath, effect
+        st = processing.files.stat(filePath)
+    except (filepath.InsecurePath, EnvironmentError):
+        return None, None
+    if not stat.S_ISREG(st.st_mode):
+        return None, None
+    return filePath, effect
+
+
+
+class HoltzResource(resource.Resource):
+    """
+    Serves a directory with twisted.web.
+    """
+    isLeaf = True
+
+    def __init__(self, tree, directory, registry, resolver=None):
+        resource.Resource.__init__(self)
+        self.tree = tree
+        self.directory = directory
+        self.registry = registry
+        self.resolver = resolver
+
+
+    def render_GET(self, request):
+        filePath, effect = lookup(self.tree, self.directory, request.path)
+        if effect is None:
+            return resource.NoResource().render(request)
+
+        lost = []
+        request.notifyFinish().addErrback(lost.append)
+
+        d = effect(filePath, request, self.registry, self.resolver)
+        d.addErrback(_failed, request, lost)
+        d.addCallback(lambda _: lost or request.finish())
+        return server.NOT_DONE_YET
+
+    render_HEAD = render_GET
+
+
+
+def _failed(failure, request, lost):
+    log.err(failure, "Handling {!r} failed".format(request.path))
+    if not request.startedWriting:
+        request.setResponseCode(http.INTERNAL_SERVER_ERROR)
+        request.setHeader("Content-Length", "0")
+    else:
+        # Don't end the body as if it were complete, so that the client can
+        # tell it was cut short. The connection is as good as lost, even
+        # before the request hears about it.
+        request.transport.abortConnection()
+        lost.append(failure)
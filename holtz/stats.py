@@ -0,0 +1,216 @@
+"""
+Instrumentation of the request path.
+
+The collector counts how often every rule matched a request, keeps
+histograms of how long resolving paths, matching names against rules and
+handling requests per processor took, and counts the body bytes that were
+sent. Recording is a few dict and list updates, cheap enough to leave on.
+
+Snapshots are plain dicts that can be turned into JSON, and can be served
+from a stats resource, preferably on a local interface only.
+"""
+import ast
+import bisect
+import json
+import time
+
+from twisted.web import resource, server
+
+
+BOUNDS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+
+class Histogram(object):
+    """
+    Counts durations in buckets with fixed upper bounds, in seconds.
+
+    The last bucket counts everything above the largest bound.
+    """
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+
+    def record(self, seconds):
+        """
+        Records a duration.
+        """
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+
+    def snapshot(self):
+        """
+        Returns the histogram as a dict.
+
+        Buckets are (upper bound, count) pairs; the bound of the last one
+        is None.
+        """
+        bounds = list(self.bounds) + [None]
+        return {
+            "count": self.count,
+            "total": self.total,
+            "buckets": list(zip(bounds, self.counts)),
+        }
+
+
+
+class Collector(object):
+    """
+    Collects statistics about requests.
+
+    Rules are the entries of a directory tree, counted by their directory
+    and condition, so that counts carry over to the entries of a reloaded
+    tree and don't keep old ones alive. Static files are handled by the
+    processor named "None", like in configs.
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.ruleHits = {}
+        self.unmatched = 0
+        self.resolving = Histogram()
+        self.matching = Histogram()
+        self.processors = {}
+        self.bytesSent = 0
+
+
+    def resolved(self, rule, seconds):
+        """
+        Records that a path resolved to a rule, or to None if no rule
+        handles it, and how long that took.
+
+        Rules are given as their directory, like C{"js/"}, and condition.
+        """
+        self.resolving.record(seconds)
+        if rule is None:
+            self.unmatched += 1
+        else:
+            self.ruleHits[rule] = self.ruleHits.get(rule, 0) + 1
+
+
+    def matched(self, seconds):
+        """
+        Records how long matching a name against the rules of a directory
+        took.
+        """
+        self.matching.record(seconds)
+
+
+    def handled(self, result, name, start):
+        """
+        Records how long a processor took to handle a request that started
+        at some time.
+
+        Returns the result, so it can be added to a Deferred.
+        """
+        try:
+            histogram = self.processors[name]
+        except KeyError:
+            histogram = self.processors[name] = Histogram()
+        histogram.record(self.clock() - start)
+        return result
+
+
+    def sent(self, count):
+        """
+        Records that some body bytes were sent.
+        """
+        self.bytesSent += count
+
+
+    def snapshot(self, root):
+        """
+        Returns the statistics as a dict.
+
+        Every rule in the given directory tree is listed, with its
+        directory, condition, processor and hit count. Rules that were
+        never hit are listed too, so dead rules stand out.
+        """
+        rules = []
+        stack = [("", root)]
+        while stack:
+            path, directory = stack.pop()
+            for entry in directory.entries:
+                rules.append({
+                    "directory": path,
+                    "condition": entry.source,
+                    "processor": _processorName(entry),
+                    "hits": self.ruleHits.get((path, entry.source), 0),
+                })
+            for name, subdirectory in directory.subdirectories.items():
+                stack.append((path + name + "/", subdirectory))
+
+        rules.sort(key=lambda rule: (rule["directory"], rule["condition"]))
+        return {
+            "rules": rules,
+            "unmatched": self.unmatched,
+            "resolving": self.resolving.snapshot(),
+            "matching": self.matching.snapshot(),
+            "processors": dict((name, histogram.snapshot())
+                               for name, histogram in self.processors.items()),
+            "bytesSent": self.bytesSent,
+        }
+
+
+
+def _processorName(entry):
+    """
+    Returns the name an entry's effect records requests under: the name of
+    its processor, or of its chain, like C{Minify(Concat)}.
+    """
+    expr = entry.expression
+    if expr is None:
+        return "None"
+
+    names = []
+    while isinstance(expr, ast.Call):
+        names.append(expr.func.id)
+        expr = expr.args[0] if expr.args else None
+    name = names.pop()
+    while names:
+        name = "{}({})".format(names.pop(), name)
+    return name
+
+
+
+collector = Collector()
+
+
+
+class StatsResource(resource.Resource):
+    """
+    Serves snapshots of a collector as JSON.
+
+    The rules are taken from the root of the tree, which can be anything
+    with a root attribute, like a path resolver or a live config.
+    """
+    isLeaf = True
+
+    def __init__(self, tree, collector=None):
+        resource.Resource.__init__(self)
+        self.tree = tree
+        self.collector = collector
+
+
+    def render_GET(self, request):
+        snapshot = (self.collector or collector).snapshot(self.tree.root)
+        request.setHeader("Content-Type", "application/json")
+        return json.dumps(snapshot, sort_keys=True).encode("utf-8")
+
+
+
+def listen(port, tree, collector=None, interface="127.0.0.1", reactor=None):
+    """
+    Serves stats for a tree over HTTP, on the loopback interface unless
+    told otherwise.
+
+    Returns the listening port.
+    """
+    if reactor is None:
+        from twisted.internet import reactor
+    site = server.Site(StatsResource(tree, collector))
+    return reactor.listenTCP(port, site, interface=interface)
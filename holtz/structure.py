@@ -1,23 +1,74 @@
 """
 Representations of the structure of a static directory being served by holtz.
 """
-from holtz import compat
+import sys
+
+from holtz import compat, matching
+
+
+# Plain dicts remember insertion order from Python 3.7 on.
+_ORDERED_DICTS = sys.version_info >= (3, 7)
 
 
 class Directory(object):
     """
     A directory being served.
     """
+    __slots__ = "subdirectories", "entries", "matcher"
+
     def __init__(self):
         self.subdirectories = compat.OrderedDict()
         self.entries = []
+        self.matcher = None
+
+
+    def match(self, name):
+        """
+        Returns the first entry in this directory matching the given name.
+
+        If this directory's matcher hasn't been built yet, builds it.
+        """
+        if self.matcher is None:
+            self.matcher = matching.Matcher(self.entries)
+        return self.matcher.match(name)
+
+
+    def freeze(self):
+        """
+        Compacts this directory and its subdirectories once they're complete.
+
+        Entries become tuples, and subdirectories become plain dicts where
+        that doesn't lose their order. Directories that are already frozen
+        are left alone.
+        """
+        stack = [self]
+        while stack:
+            directory = stack.pop()
+            if isinstance(directory.entries, tuple):
+                continue
+            directory.entries = tuple(directory.entries)
+            subdirectories = directory.subdirectories
+            if _ORDERED_DICTS or len(subdirectories) <= 1:
+                directory.subdirectories = dict(subdirectories)
+            stack.extend(subdirectories.values())
 
 
 
 class Entry(object):
     """
     An entry in a directory.
+
+    The source is the condition as written in the configuration file. The
+    pattern is the glob pattern it compiled to, or None if the condition is
+    a literal name. The expression is the effect's validated
+    call expression, or None if the effect is None.
     """
-    def __init__(self, condition, effect):
+    __slots__ = "condition", "effect", "source", "pattern", "expression"
+
+    def __init__(self, condition, effect,
+                 source=None, pattern=None, expression=None):
         self.condition = condition
-        self.effect = effect
\ No newline at end of file
+        self.effect = effect
+        self.source = source
+        self.pattern = pattern
+        self.expression = expression
\ No newline at end of file
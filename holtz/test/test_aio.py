@@ -0,0 +1,162 @@
+import socket
+import sys
+
+from twisted.python import filepath
+from twisted.trial import unittest
+
+from holtz import aio, caching, compat, config, processing, resolve
+
+siteConfig = """
+*.html: None
+*.txt: Upper()
+*.md: Upper(Upper())
+""".lstrip("\n")
+
+
+
+class Upper(object):
+    class producer(object):
+        contentType = "text/plain"
+
+
+    def process(self, content):
+        return content.upper()
+
+
+
+class AsyncioServingTest(unittest.TestCase):
+    if aio.asyncio is None or sys.version_info < (3, 7):
+        skip = "asyncio serving needs Python 3.7 or later"
+
+    def setUp(self):
+        self.directory = filepath.FilePath(self.mktemp())
+        self.directory.makedirs()
+        self.directory.child("index.html").setContent(b"<p>hello</p>")
+        self.directory.child("a.txt").setContent(b"shout")
+        self.directory.child("big.html").setContent(b"<br>" * 2 ** 16)
+
+        self.loop = aio.asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.patch(processing, "digests", caching.DigestCache())
+        self.patch(processing, "files", caching.FileCache())
+        self.patch(processing, "cache", caching.OutputCache())
+        self.patch(processing, "executor", aio.executor(self.loop))
+
+        tree = resolve.PathResolver(config.parse(compat.StringIO(siteConfig)))
+        site = aio.Site(tree, self.directory, {"Upper": Upper})
+        self.server = self.loop.run_until_complete(
+            aio.serve(site, port=0, loop=self.loop))
+        self.addCleanup(self.server.close)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+
+    def _exchange(self, *requests):
+        """
+        Sends some requests over one connection, and returns everything the
+        server sent back until it closed the connection.
+        """
+        def client():
+            connection = socket.create_connection(("127.0.0.1", self.port))
+            try:
+                connection.sendall(b"".join(requests))
+                chunks = []
+                for chunk in iter(lambda: connection.recv(65536), b""):
+                    chunks.append(chunk)
+                return b"".join(chunks)
+            finally:
+                connection.close()
+
+        future = self.loop.run_in_executor(None, client)
+        return self.loop.run_until_complete(future)
+
+
+    def _request(self, path, method=b"GET", headers=b""):
+        return (method + b" " + path + b" HTTP/1.1\r\n"
+                + headers + b"Connection: close\r\n\r\n")
+
+
+    def test_static(self):
+        response = self._exchange(self._request(b"/index.html"))
+        self.assertTrue(response.startswith(b"HTTP/1.1 200 OK\r\n"))
+        self.assertIn(b"Content-Type: text/html\r\n", response)
+        self.assertIn(b"Content-Length: 12\r\n", response)
+        self.assertTrue(response.endswith(b"\r\n\r\n<p>hello</p>"))
+
+
+    def test_sendfile(self):
+        """
+        Files larger than a chunk are sent with the loop's sendfile.
+        """
+        response = self._exchange(self._request(b"/big.html"))
+        self.assertIn(b"Content-Length: 262144\r\n", response)
+        self.assertTrue(response.endswith(b"\r\n\r\n" + b"<br>" * 2 ** 16))
+
+
+    def test_keepAlive(self):
+        first = b"GET /index.html HTTP/1.1\r\n\r\n"
+        response = self._exchange(first, self._request(b"/index.html"))
+        self.assertEqual(response.count(b"<p>hello</p>"), 2)
+
+
+    def test_head(self):
+        response = self._exchange(self._request(b"/index.html", b"HEAD"))
+        self.assertIn(b"Content-Length: 12\r\n", response)
+        self.assertTrue(response.endswith(b"\r\n\r\n"))
+
+
+    def test_processed(self):
+        response = self._exchange(self._request(b"/a.txt"))
+        self.assertIn(b"Content-Type: text/plain\r\n", response)
+        self.assertTrue(response.endswith(b"\r\n\r\nSHOUT"))
+
+
+    def test_chunked(self):
+        """
+        Streamed output is sent in chunks, and the connection is kept open.
+        """
+        self.directory.child("a.md").setContent(b"shout")
+        first = b"GET /a.md HTTP/1.1\r\n\r\n"
+        response = self._exchange(first, self._request(b"/index.html"))
+        self.assertIn(b"Transfer-Encoding: chunked\r\n", response)
+        self.assertIn(b"\r\n\r\n5\r\nSHOUT\r\n0\r\n\r\n", response)
+        self.assertTrue(response.endswith(b"<p>hello</p>"))
+
+
+    def test_processPool(self):
+        """
+        Chains are processed whole when processors run in a process pool,
+        which can't share a stream.
+        """
+        pool = aio.futures.ProcessPoolExecutor(1)
+        self.addCleanup(pool.shutdown)
+        pool.submit(int).result() # fork the worker before any threads start
+        executor = aio.executor(self.loop, pool)
+        self.assertFalse(executor.inProcess)
+        self.patch(processing, "executor", executor)
+
+        self.directory.child("a.md").setContent(b"shout")
+        response = self._exchange(self._request(b"/a.md"))
+        self.assertIn(b"Content-Length: 5\r\n", response)
+        self.assertTrue(response.endswith(b"\r\n\r\nSHOUT"))
+
+
+    def test_notModified(self):
+        response = self._exchange(self._request(b"/index.html"))
+        etag = response.split(b"ETag: ", 1)[1].split(b"\r\n", 1)[0]
+
+        headers = b"If-None-Match: " + etag + b"\r\n"
+        response = self._exchange(self._request(b"/index.html",
+                                                headers=headers))
+        self.assertTrue(response.startswith(b"HTTP/1.1 304 "))
+
+
+    def test_notFound(self):
+        for path in b"/nope.html", b"/nope.css", b"/../x.html":
+            response = self._exchange(self._request(path))
+            self.assertTrue(response.startswith(b"HTTP/1.1 404 "))
+
+
+    def test_notAllowed(self):
+        response = self._exchange(self._request(b"/index.html", b"POST"))
+        self.assertTrue(response.startswith(b"HTTP/1.1 405 "))
+        self.assertIn(b"Allow: GET, HEAD\r\n", response)
@@ -0,0 +1,116 @@
+import io
+import os
+
+import mock
+
+from twisted.internet import defer
+from twisted.trial import unittest
+
+from holtz import artifact, config, execution, processing
+
+siteConfig = """
+index.html: None
+js/
+    *.{js,coffee}: JavascriptSomething(level=2)
+    vendor/
+        jquery.js: None
+""".lstrip("\n")
+
+
+
+class ArtifactTest(unittest.TestCase):
+    def setUp(self):
+        self.path = self.mktemp()
+        self._writeConfig(siteConfig)
+
+
+    def _writeConfig(self, text):
+        with open(self.path, "w") as f:
+            f.write(text)
+
+
+    def assertSiteTree(self, root):
+        index, = root.entries
+        self.assertTrue(index.condition("index.html"))
+        self.assertIdentical(index.expression, None)
+
+        js = root.subdirectories["js"]
+        entry, = js.entries
+        self.assertEqual(entry.source, "*.{js,coffee}")
+        self.assertIdentical(js.match("app.coffee"), entry)
+        self.assertEqual(entry.expression.func.id, "JavascriptSomething")
+        self.assertEqual(entry.expression.keywords[0].arg, "level")
+
+        vendor = js.subdirectories["vendor"]
+        self.assertIdentical(vendor.match("jquery.js"), vendor.entries[0])
+
+
+    def test_writesArtifact(self):
+        self.assertSiteTree(artifact.load(self.path))
+        self.assertTrue(os.path.exists(self.path + artifact.SUFFIX))
+
+
+    def test_loadsArtifact(self):
+        """
+        When the artifact is up to date, the configuration isn't parsed.
+        """
+        artifact.load(self.path)
+        parse = mock.Mock(side_effect=AssertionError("parsed"))
+        self.patch(config, "parse", parse)
+        self.assertSiteTree(artifact.load(self.path))
+
+
+    def test_staleArtifact(self):
+        artifact.load(self.path)
+        self._writeConfig("other.html: None\n")
+        root = artifact.load(self.path)
+        self.assertEqual(root.entries[0].source, "other.html")
+        self.assertEqual(len(root.subdirectories), 0)
+
+
+    def test_corruptArtifact(self):
+        artifact.load(self.path)
+        with open(self.path + artifact.SUFFIX, "r+b") as f:
+            f.readline()
+            f.truncate(f.tell() + 3)
+        self.assertSiteTree(artifact.load(self.path))
+
+
+    def test_unwritableDirectory(self):
+        """
+        Failing to write the artifact doesn't stop the config from loading.
+        """
+        self.patch(artifact, "write", mock.Mock(side_effect=OSError()))
+        self.assertSiteTree(artifact.load(self.path))
+
+
+    def test_effects(self):
+        """
+        Entries loaded from an artifact have working effects.
+        """
+        artifact.load(self.path)
+        root = artifact.load(self.path)
+        synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+        self.patch(processing, "executor", execution.Executor(synchronous))
+
+        request = mock.Mock()
+        request.getHeader.return_value = None
+        filePath = mock.Mock()
+        filePath.path = self.path
+        filePath.open.return_value = io.BytesIO()
+        resolver = lambda fp: "text/html"
+        root.entries[0].effect(filePath, request, {}, resolver)
+        request.setHeader.assert_any_call("Content-Type", "text/html")
+
+
+    def test_sharedEffects(self):
+        """
+        Entries loaded from an artifact share effects like parsed ones do,
+        and the loaded tree is frozen.
+        """
+        self._writeConfig("a.html: None\nb/\n    c.html: None\n")
+        artifact.load(self.path)
+        root = artifact.load(self.path)
+        b = root.subdirectories["b"]
+        self.assertIdentical(b.entries[0].effect, root.entries[0].effect)
+        self.assertIsInstance(root.entries, tuple)
@@ -0,0 +1,194 @@
+import json
+import os
+
+from twisted.trial import unittest
+
+from holtz import build, config
+
+siteConfig = """
+index.html: None
+js/
+    *.js: Upper()
+    vendor/
+        *.js: Upper(b"!")
+""".lstrip("\n")
+
+
+
+class Upper(object):
+    """
+    A processor that uppercases content, optionally adding a suffix.
+    """
+    def __init__(self, suffix=b""):
+        self.suffix = suffix
+
+
+    def process(self, content):
+        return content.upper() + self.suffix
+
+
+
+registry = {"Upper": Upper}
+
+
+
+class BuildTest(unittest.TestCase):
+    def setUp(self):
+        self.root = config.parse(siteConfig.splitlines(True))
+        self.source = self.mktemp()
+        self.output = self.mktemp()
+        self._write("index.html", b"<html>")
+        self._write("README", b"not matched")
+        self._write("js/app.js", b"app")
+        self._write("js/vendor/lib.js", b"lib")
+        self._write("css/style.css", b"not configured")
+
+        self.built = []
+        self.buildFile = build._buildFile
+        def recordingBuildFile(job):
+            self.built.append(job[0])
+            return self.buildFile(job)
+        self.patch(build, "_buildFile", recordingBuildFile)
+
+
+    def _write(self, relativePath, content):
+        path = os.path.join(self.source, relativePath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(content)
+
+
+    def _build(self, processes=1, root=None):
+        del self.built[:]
+        return build.build(root or self.root, self.source, self.output,
+                           registry, processes)
+
+
+    def _output(self, relativePath):
+        with open(os.path.join(self.output, relativePath), "rb") as f:
+            return f.read()
+
+
+    def assertOutputs(self):
+        self.assertEqual(self._output("index.html"), b"<html>")
+        self.assertEqual(self._output("js/app.js"), b"APP")
+        self.assertEqual(self._output("js/vendor/lib.js"), b"LIB!")
+        for unbuilt in "README", "css/style.css":
+            path = os.path.join(self.output, unbuilt)
+            self.assertFalse(os.path.exists(path))
+
+
+    def test_build(self):
+        manifest = self._build()
+        self.assertOutputs()
+        self.assertEqual(sorted(manifest),
+                         ["index.html", "js/app.js", "js/vendor/lib.js"])
+        self.assertEqual(manifest["js/app.js"]["processor"], "Upper")
+        self.assertIdentical(manifest["index.html"]["processor"], None)
+
+
+    def test_manifestWritten(self):
+        manifest = self._build()
+        with open(os.path.join(self.output, build.MANIFEST)) as f:
+            self.assertEqual(json.load(f), manifest)
+
+
+    def test_pool(self):
+        """
+        Jobs can run in a pool of processes.
+        """
+        self.patch(build, "_buildFile", self.buildFile)
+        self._build(processes=2)
+        self.assertOutputs()
+
+
+    def test_unchanged(self):
+        self._build()
+        self._build()
+        self.assertEqual(self.built, [])
+
+
+    def test_changedContent(self):
+        self._build()
+        self._write("js/app.js", b"new app")
+        os.utime(os.path.join(self.source, "js/app.js"), (0, 0))
+        self._build()
+        self.assertEqual(self.built, ["js/app.js"])
+        self.assertEqual(self._output("js/app.js"), b"NEW APP")
+
+
+    def test_touchedOnly(self):
+        """
+        Files whose modification time changed but whose content didn't
+        aren't rebuilt.
+        """
+        self._build()
+        os.utime(os.path.join(self.source, "js/app.js"), (0, 0))
+        manifest = self._build()
+        self.assertEqual(self.built, [])
+        self.assertEqual(manifest["js/app.js"]["mtime"], 0)
+
+
+    def test_changedRule(self):
+        self._build()
+        changed = siteConfig.replace('b"!"', 'b"?"')
+        root = config.parse(changed.splitlines(True))
+        self._build(root=root)
+        self.assertEqual(self.built, ["js/vendor/lib.js"])
+        self.assertEqual(self._output("js/vendor/lib.js"), b"LIB?")
+
+
+    def test_chain(self):
+        changed = siteConfig.replace('Upper(b"!")', 'Upper(Upper(b"?"), b"!")')
+        root = config.parse(changed.splitlines(True))
+        manifest = self._build(root=root)
+        self.assertEqual(self._output("js/vendor/lib.js"), b"LIB?!")
+        self.assertEqual(manifest["js/vendor/lib.js"]["processor"],
+                         "Upper(Upper)")
+
+
+    def test_missingOutput(self):
+        self._build()
+        os.remove(os.path.join(self.output, "index.html"))
+        self._build()
+        self.assertEqual(self.built, ["index.html"])
+
+
+    def test_removedSource(self):
+        self._build()
+        os.remove(os.path.join(self.source, "js/app.js"))
+        manifest = self._build()
+        self.assertNotIn("js/app.js", manifest)
+        path = os.path.join(self.output, "js/app.js")
+        self.assertFalse(os.path.exists(path))
+
+
+
+class MainTest(unittest.TestCase):
+    def test_missingRegistry(self):
+        self.patch(build.sys, "stderr", _Discard())
+        self.assertEqual(build.main(["config", "source", "output"]), 2)
+
+
+    def test_main(self):
+        configPath = self.mktemp()
+        with open(configPath, "w") as f:
+            f.write(siteConfig)
+        source, output = self.mktemp(), self.mktemp()
+        os.makedirs(os.path.join(source, "js"))
+        with open(os.path.join(source, "js", "a.js"), "wb") as f:
+            f.write(b"a")
+
+        self.patch(build.sys, "stdout", _Discard())
+        registry = __name__ + ".registry"
+        argv = ["-r", registry, "-j", "1", configPath, source, output]
+        self.assertEqual(build.main(argv), 0)
+        with open(os.path.join(output, "js", "a.js"), "rb") as f:
+            self.assertEqual(f.read(), b"A")
+
+
+
+class _Discard(object):
+    def write(self, data):
+        pass
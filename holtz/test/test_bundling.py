@@ -0,0 +1,114 @@
+import hashlib
+import os
+
+from twisted.internet import defer, task
+from twisted.python import filepath
+from twisted.trial import unittest
+
+from holtz import bundling, caching, execution, processing
+
+
+
+class FingerprintTest(unittest.TestCase):
+    digest = "0123456789abcdef" + "0" * 48
+
+    def test_fingerprinted(self):
+        self.assertEqual(bundling.fingerprinted("app.js", self.digest),
+                         "app.0123456789abcdef.js")
+        self.assertEqual(bundling.fingerprinted("app", self.digest),
+                         "app.0123456789abcdef")
+
+
+    def test_split(self):
+        split = bundling.splitFingerprint
+        self.assertEqual(split("/js/app.0123456789abcdef.js"),
+                         ("/js/app.js", "0123456789abcdef"))
+        self.assertEqual(split("app.0123456789abcdef"),
+                         ("app", "0123456789abcdef"))
+
+
+    def test_noFingerprint(self):
+        for path in ("/js/app.js", "/app.0123456789abcde.js",
+                     "/x.0123456789abcdef/app.js"):
+            self.assertEqual(bundling.splitFingerprint(path), (path, None))
+
+
+
+class BundlerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = filepath.FilePath(self.mktemp())
+        self.directory.makedirs()
+        self.directory.child("b.js").setContent(b"b")
+        self.directory.child("a.js").setContent(b"a")
+        self.directory.child("c.css").setContent(b"c")
+        self.directory.child("d.js").makedirs()
+
+        self.builds = []
+        original = bundling.build
+        def build(paths, separator):
+            self.builds.append(paths)
+            return original(paths, separator)
+        self.patch(bundling, "build", build)
+        self.patch(processing, "cache", caching.OutputCache())
+        synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+        self.patch(processing, "executor", execution.Executor(synchronous))
+
+        self.clock = task.Clock()
+        matches = lambda name: name.endswith(".js")
+        self.bundler = bundling.Bundler(matches, b";", ("Bundle", "()"),
+                                        ttl=1.0, clock=self.clock.seconds)
+        self.bundlePath = self.directory.child("app.js")
+
+
+    def _current(self):
+        return self.successResultOf(self.bundler.current(self.bundlePath))
+
+
+    def test_current(self):
+        """
+        Bundles are the files matching the condition, other than the bundle
+        itself, in order of their names.
+        """
+        self.bundlePath.setContent(b"not a member")
+        digest, lastModified, data = self._current()
+        self.assertEqual(data, b"a;b")
+        self.assertEqual(digest, hashlib.sha256(b"a;b").hexdigest())
+        mtimes = [os.stat(self.directory.child(name).path).st_mtime
+                  for name in ("a.js", "b.js")]
+        self.assertEqual(lastModified, max(mtimes))
+
+
+    def test_builtOnce(self):
+        first = self._current()
+        self.clock.advance(5)
+        self.assertEqual(self._current(), first)
+        self.assertEqual(len(self.builds), 1)
+
+
+    def test_changedMember(self):
+        self._current()
+        self.directory.child("a.js").setContent(b"A!")
+        self.assertEqual(self._current()[2], b"a;b") # not checked yet
+        self.clock.advance(2)
+        self.assertEqual(self._current()[2], b"A!;b")
+        self.assertEqual(len(self.builds), 2)
+
+
+    def test_newMember(self):
+        self._current()
+        self.directory.child("0.js").setContent(b"0")
+        self.clock.advance(2)
+        self.assertEqual(self._current()[2], b"0;a;b")
+
+
+    def test_evicted(self):
+        self._current()
+        processing.cache.discardWhere(lambda key: True)
+        self.assertEqual(self._current()[2], b"a;b")
+        self.assertEqual(len(self.builds), 2)
+
+
+    def test_empty(self):
+        bundler = bundling.Bundler(lambda name: False, b"", ("Bundle", "()"))
+        bundle = bundler.current(self.bundlePath)
+        self.assertEqual(self.successResultOf(bundle)[1:], (0, b""))
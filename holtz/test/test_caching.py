@@ -0,0 +1,219 @@
+import os
+
+from twisted.internet import task
+from twisted.python import filepath
+from twisted.trial import unittest
+
+from holtz import caching
+
+
+
+class DigestCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.filePath = filepath.FilePath(self.mktemp())
+        self.filePath.setContent(b"abc")
+        self.digests = caching.DigestCache()
+
+
+    def test_digest(self):
+        self.assertEqual(self.digests.digest(self.filePath),
+            "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad")
+
+
+    def test_cached(self):
+        first = self.digests.digest(self.filePath)
+        self.patch(caching, "fileDigest", lambda f: self.fail("rehashed"))
+        self.assertEqual(self.digests.digest(self.filePath), first)
+
+
+    def test_changed(self):
+        first = self.digests.digest(self.filePath)
+        self.filePath.setContent(b"abcd")
+        self.assertNotEqual(self.digests.digest(self.filePath), first)
+
+
+    def test_forget(self):
+        self.digests.digest(self.filePath)
+        self.digests.forget(self.filePath)
+        hashed = []
+        self.patch(caching, "fileDigest", lambda f: hashed.append(f) or "")
+        self.digests.digest(self.filePath)
+        self.assertEqual(len(hashed), 1)
+
+
+    def test_known(self):
+        self.assertIdentical(self.digests.known(self.filePath), None)
+        digest = self.digests.digest(self.filePath)
+        self.assertEqual(self.digests.known(self.filePath), digest)
+        self.filePath.setContent(b"abcd")
+        self.assertIdentical(self.digests.known(self.filePath), None)
+
+
+    def test_remember(self):
+        self.digests.remember(self.filePath, "digest")
+        self.patch(caching, "fileDigest", lambda f: self.fail("rehashed"))
+        self.assertEqual(self.digests.digest(self.filePath), "digest")
+
+
+    def test_bounded(self):
+        """
+        Only the most recently used digests are remembered.
+        """
+        digests = caching.DigestCache(maxDigests=2)
+        others = [filepath.FilePath(self.mktemp()) for _ in range(2)]
+        for other in others:
+            other.setContent(b"xyz")
+        digests.digest(self.filePath)
+        digests.digest(others[0])
+        digests.known(self.filePath)
+        digests.digest(others[1])
+        self.assertNotIdentical(digests.known(self.filePath), None)
+        self.assertIdentical(digests.known(others[0]), None)
+        self.assertNotIdentical(digests.known(others[1]), None)
+
+
+
+class FileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.filePath = filepath.FilePath(self.mktemp())
+        self.filePath.setContent(b"abc")
+        self.clock = task.Clock()
+        self.files = caching.FileCache(maxFiles=2, ttl=1.0,
+                                       clock=self.clock.seconds)
+        self.addCleanup(self.files.clear)
+
+
+    def _otherFile(self):
+        other = filepath.FilePath(self.mktemp())
+        other.setContent(b"xyz")
+        return other
+
+
+    def test_shared(self):
+        first = self.files.acquire(self.filePath)
+        second = self.files.acquire(self.filePath)
+        self.assertIdentical(first.file, second.file)
+        self.assertEqual(first.file.read(), b"abc")
+        self.assertEqual((self.files.hits, self.files.misses), (1, 1))
+
+
+    def test_stat(self):
+        self.assertEqual(self.files.stat(self.filePath).st_size, 3)
+        self.assertRaises(EnvironmentError,
+                          self.files.stat, filepath.FilePath(self.mktemp()))
+
+
+    def test_revalidatedAfterTTL(self):
+        cached = self.files.acquire(self.filePath)
+        cached.release()
+        self.filePath.setContent(b"abcd")
+        self.assertEqual(self.files.stat(self.filePath).st_size, 3)
+
+        self.clock.advance(2)
+        self.assertEqual(self.files.stat(self.filePath).st_size, 4)
+        self.assertTrue(cached.evicted)
+        self.assertIdentical(cached.file, None)
+
+
+    def test_removedAfterTTL(self):
+        self.files.stat(self.filePath)
+        self.filePath.remove()
+        self.clock.advance(2)
+        self.assertRaises(EnvironmentError, self.files.stat, self.filePath)
+
+
+    def test_eviction(self):
+        """
+        Evicted files are closed once they're released.
+        """
+        cached = self.files.acquire(self.filePath)
+        f = cached.file
+        self.files.stat(self._otherFile())
+        self.files.stat(self._otherFile())
+        self.assertTrue(cached.evicted)
+        self.assertFalse(f.closed)
+
+        cached.release()
+        self.assertTrue(f.closed)
+
+
+    def test_inMemory(self):
+        self.files.maxMemorySize = 3
+        cached = self.files.acquire(self.filePath)
+        self.assertEqual(cached.data, b"abc")
+        self.assertIdentical(cached.file, None)
+
+
+
+class OutputCacheTest(unittest.TestCase):
+    def test_miss(self):
+        cache = caching.OutputCache()
+        self.assertIdentical(cache.get(("a",)), None)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+
+    def test_hit(self):
+        cache = caching.OutputCache()
+        cache.put(("a",), b"xyz")
+        self.assertEqual(cache.get(("a",)), b"xyz")
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        self.assertEqual(cache.size, 3)
+
+
+    def test_replace(self):
+        cache = caching.OutputCache()
+        cache.put(("a",), b"xyz")
+        cache.put(("a",), b"uv")
+        self.assertEqual(cache.get(("a",)), b"uv")
+        self.assertEqual(cache.size, 2)
+
+
+    def test_evictsLeastRecentlyUsed(self):
+        cache = caching.OutputCache(maxBytes=6)
+        cache.put(("a",), b"aaa")
+        cache.put(("b",), b"bbb")
+        cache.get(("a",))
+        cache.put(("c",), b"ccc")
+        self.assertIdentical(cache.get(("b",)), None)
+        self.assertEqual(cache.get(("a",)), b"aaa")
+        self.assertEqual(cache.get(("c",)), b"ccc")
+        self.assertEqual(cache.size, 6)
+
+
+    def test_tooBig(self):
+        cache = caching.OutputCache(maxBytes=2)
+        cache.put(("a",), b"aaa")
+        self.assertIdentical(cache.get(("a",)), None)
+        self.assertEqual(cache.size, 0)
+
+
+    def test_disk(self):
+        directory = self.mktemp()
+        os.mkdir(directory)
+        cache = caching.OutputCache(maxBytes=3, directory=directory)
+        cache.put(("a",), b"aaa")
+        cache.put(("b",), b"bbb") # evicts a from memory
+        self.assertEqual(cache.get(("a",)), b"aaa")
+        self.assertEqual(cache.size, 3)
+
+        other = caching.OutputCache(directory=directory)
+        self.assertEqual(other.get(("b",)), b"bbb")
+
+
+    def test_diskTooBigForMemory(self):
+        directory = self.mktemp()
+        os.mkdir(directory)
+        cache = caching.OutputCache(maxBytes=2, directory=directory)
+        cache.put(("a",), b"aaa")
+        self.assertEqual(cache.get(("a",)), b"aaa")
+        self.assertEqual(cache.size, 0)
+
+
+    def test_discardWhere(self):
+        cache = caching.OutputCache()
+        cache.put(("a", 1), b"aa")
+        cache.put(("b", 2), b"bbb")
+        cache.discardWhere(lambda key: key[1] == 2)
+        self.assertIdentical(cache.get(("b", 2)), None)
+        self.assertEqual(cache.get(("a", 1)), b"aa")
+        self.assertEqual(cache.size, 2)
@@ -0,0 +1,95 @@
+from twisted.trial import unittest
+from twisted.web import http
+from twisted.web.test.requesthelper import DummyRequest
+
+from holtz import conditional
+
+etag = conditional.strongETag("abc")
+lastModified = 1000000000
+
+
+
+class RespondIfNotModifiedTest(unittest.TestCase):
+    def setUp(self):
+        self.request = DummyRequest([b""])
+
+
+    def _respond(self, **headers):
+        for name, value in headers.items():
+            name = name.replace("_", "-").encode("ascii")
+            self.request.requestHeaders.setRawHeaders(name, [value])
+        return conditional.respondIfNotModified(self.request, etag,
+                                                lastModified)
+
+
+    def assertNotModified(self, **headers):
+        self.assertTrue(self._respond(**headers))
+        self.assertEqual(self.request.responseCode, http.NOT_MODIFIED)
+
+
+    def assertModified(self, **headers):
+        self.assertFalse(self._respond(**headers))
+        self.assertIdentical(self.request.responseCode, None)
+
+
+    def test_validatorHeaders(self):
+        self._respond()
+        headers = self.request.responseHeaders
+        self.assertEqual(headers.getRawHeaders(b"etag"), [b'"abc"'])
+        self.assertEqual(headers.getRawHeaders(b"last-modified"),
+                         [http.datetimeToString(lastModified)])
+
+
+    def test_unconditional(self):
+        self.assertModified()
+
+
+    def test_matchingETag(self):
+        self.assertNotModified(If_None_Match='"xyz", "abc"')
+
+
+    def test_weakETag(self):
+        self.assertNotModified(If_None_Match='W/"abc"')
+
+
+    def test_star(self):
+        self.assertNotModified(If_None_Match="*")
+
+
+    def test_otherETag(self):
+        self.assertModified(If_None_Match='"xyz"')
+
+
+    def test_notModifiedSince(self):
+        since = http.datetimeToString(lastModified + 10)
+        self.assertNotModified(If_Modified_Since=since)
+
+
+    def test_modifiedSince(self):
+        since = http.datetimeToString(lastModified - 10)
+        self.assertModified(If_Modified_Since=since)
+
+
+    def test_badDate(self):
+        self.assertModified(If_Modified_Since="yesterday")
+
+
+    def test_eTagTakesPrecedence(self):
+        """
+        If-Modified-Since is ignored when If-None-Match is present.
+        """
+        since = http.datetimeToString(lastModified + 10)
+        self.assertModified(If_None_Match='"xyz"', If_Modified_Since=since)
+
+
+
+class ProcessedETagTest(unittest.TestCase):
+    def test_stable(self):
+        key = "digest", "A", "()"
+        self.assertEqual(conditional.processedETag(key),
+                         conditional.processedETag(key))
+
+
+    def test_differentKeys(self):
+        self.assertNotEqual(conditional.processedETag(("a", "A", "()")),
+                            conditional.processedETag(("b", "A", "()")))
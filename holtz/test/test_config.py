@@ -1,8 +1,17 @@
+import gzip
+import hashlib
+import io
+import os
+
 import mock
 
+from twisted.internet import defer
+from twisted.python import filepath
 from twisted.trial import unittest
+from twisted.web import http
 
-from holtz import compat, config
+from holtz import bundling, caching, compat, config, contenttype, execution
+from holtz import globbing, processing, stats, transfer
 
 basicConfig = """
 js/
@@ -83,6 +92,11 @@ class UnescapeTest(unittest.TestCase):
         self.assertEqual(unescaped, "a:c")
 
 
+    def test_escapedBackslash(self):
+        unescaped = config._unescape("a\\\\\\:c\\\\")
+        self.assertEqual(unescaped, "a\\:c\\")
+
+
 
 class ReadUntilTokenTest(unittest.TestCase):
     def _test(self, string, tokens, expectedIndex, expectedToken, start=0):
@@ -99,6 +113,19 @@ class ReadUntilTokenTest(unittest.TestCase):
         self.assertRaises(config.NoTokens, config._readUntilToken, "", ",")
 
 
+    def test_escaped(self):
+        self._test("a\\,b\\\\,c", ",", 6, ",")
+
+
+    def test_start(self):
+        self._test("a,b,c", ",", 3, ",", start=2)
+
+
+    def test_loneBackslash(self):
+        self.assertRaises(config.ParseError, config._readUntilToken, "a\\",
+                          ",")
+
+
 
 class EntryLineSplitTest(unittest.TestCase):
     def _testSplit(self, line, expectedHead, expectedTail):
@@ -185,6 +212,85 @@ class ConditionParseTest(unittest.TestCase):
         self._testCondition(condition, trues, falses)
 
 
+    def test_anchored(self):
+        condition = "*.js"
+        trues = "a.js", ".js"
+        falses = "a.jsx", "a.js.map", "axjs"
+        self._testCondition(condition, trues, falses)
+
+
+    def test_escapedWildcard(self):
+        condition = "a\\*b*"
+        trues = "a*b", "a*bc"
+        falses = "ab", "axb", "a\\*b"
+        self._testCondition(condition, trues, falses)
+
+
+    def test_escapedLiteral(self):
+        condition = "a\\:b"
+        trues = "a:b",
+        falses = "a\\:b",
+        self._testCondition(condition, trues, falses)
+
+
+    def test_escapedAlternation(self):
+        condition = "a{x\\,y,z}"
+        trues = "ax,y", "az"
+        falses = "ax", "ay"
+        self._testCondition(condition, trues, falses)
+
+
+
+class ConditionPatternTest(unittest.TestCase):
+    def test_literal(self):
+        self.assertIdentical(config._conditionPattern("a.js"), None)
+
+
+    def test_tokens(self):
+        pattern = config._conditionPattern("a*b?{c,d\\,e,}\\*")
+        expected = ("a", globbing.STAR, "b", globbing.ANY,
+                    ("c", "d,e", ""), "*")
+        self.assertEqual(pattern, expected)
+
+
+    def test_emptyOptions(self):
+        """
+        Leading, trailing and empty options are kept, also next to escapes.
+        """
+        cases = [("{,a\\.b}c", ("", "a.b")),
+                 ("{a\\.b,}c", ("a.b", "")),
+                 ("{a\\.b,,c}c", ("a.b", "", "c")),
+                 ("{\\,,}c", (",", "")),
+                 ("{,a.b}c", ("", "a.b"))]
+        for condition, options in cases:
+            pattern = config._conditionPattern(condition)
+            self.assertEqual(pattern, (options, "c"))
+
+        condition = config._parseCondition("{,a\\.b}c")
+        for name in "c", "a.bc":
+            self.assertTrue(condition(name))
+
+
+    def test_escapes(self):
+        """
+        Conditions with escapes are patterns, even without wildcards, so
+        they match the unescaped name.
+        """
+        self.assertEqual(config._conditionPattern("a\\:b"), ("a:b",))
+
+
+    def test_unclosedAlternation(self):
+        for condition in "a{b,c", "a{b", "a{b\\}":
+            self.assertRaises(config.NoTokens, config._conditionPattern,
+                              condition)
+
+
+    def test_loneBackslash(self):
+        for condition in "a\\", "*a\\", "{a\\":
+            self.assertRaises(config.ParseError, config._conditionPattern,
+                              condition)
+
+
 
 class AlternationParseTest(unittest.TestCase):
     def _testAlternationParse(self, string, expectedIndex, expectedOptions):
@@ -202,11 +308,50 @@ class AlternationParseTest(unittest.TestCase):
 
 
 
+class Upper(object):
+    """
+    A processor that uppercases content a chunk at a time.
+    """
+    class producer(object):
+        contentType = "text/plain"
+
+
+    def stream(self, chunks):
+        for chunk in chunks:
+            yield chunk.upper()
+
+
+
+class Suffix(object):
+    """
+    A processor that adds a suffix to all of its content.
+    """
+    class producer(object):
+        contentType = "holtz/suffixed"
+
+
+    def __init__(self, suffix):
+        self.suffix = suffix
+
+
+    def process(self, content):
+        return content + self.suffix
+
+
+
 class EffectParseTest(unittest.TestCase):
     def setUp(self):
         self.filePath = mock.Mock()
-        self.file = compat.StringIO()
+        self.filePath.path = self.mktemp()
+        open(self.filePath.path, "wb").close()
+        self.file = io.BytesIO()
         self.filePath.open.return_value = self.file
+        self.patch(processing, "digests", caching.DigestCache())
+        self.patch(processing, "files", caching.FileCache())
+        synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+        self.patch(processing, "executor", execution.Executor(synchronous))
+        self.collector = stats.Collector()
+        self.patch(stats, "collector", self.collector)
 
         self.producer = mock.Mock()
 
@@ -217,13 +362,12 @@ class EffectParseTest(unittest.TestCase):
         self.resolver = lambda fp: "holtz/fromResolver"
 
         self.request = mock.Mock()
+        self.requestHeaders = {}
+        self.request.getHeader.side_effect = self.requestHeaders.get
 
 
     def assertContentTypeEquals(self, expected):
-        self.assertEquals(self.request.setHeader.call_count, 1)
-        header, value = self.request.setHeader.call_args[0]
-        self.assertEquals(header, "Content-Type")
-        self.assertEquals(value, expected)
+        self.assertHeaderEquals("Content-Type", expected)
     
 
     def assertRegisteredProducer(self):
@@ -239,10 +383,145 @@ class EffectParseTest(unittest.TestCase):
         effect(self.filePath, self.request, self.registry, self.resolver)
 
 
+    def _processedFilePath(self, content):
+        self.patch(processing, "cache", caching.OutputCache())
+        synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+        self.patch(processing, "executor", execution.Executor(synchronous))
+        self.filePath = filepath.FilePath(self.mktemp())
+        self.filePath.setContent(content)
+        processor = self.processor.return_value = mock.Mock(spec=["process"])
+        processor.process.side_effect = lambda data: data.upper()
+        return processor
+
+
+    def assertHeaderEquals(self, name, expected):
+        headers = dict(c[0] for c in self.request.setHeader.call_args_list)
+        self.assertEquals(headers[name], expected)
+
+
     def test_simple(self):
+        self._processedFilePath(b"raw")
         self._testEffect("A()")
-        self.assertContentTypeEquals("holtz/fromProducer")
-        self.assertRegisteredProducer()
+        self.assertHeaderEquals("Content-Type", "holtz/fromProducer")
+        self.assertHeaderEquals("Content-Length", "3")
+        self.request.write.assert_called_once_with(b"RAW")
+
+
+    def test_digestedInExecutor(self):
+        """
+        Processed files are digested by the job that processes them, and
+        their digest is remembered.
+        """
+        processor = self._processedFilePath(b"raw")
+        self.patch(caching, "fileDigest", lambda f: self.fail("digested"))
+        self._testEffect("A()")
+        self._testEffect("A()")
+        self.assertEqual(self.request.write.call_args_list,
+                         [mock.call(b"RAW")] * 2)
+        self.assertEqual(processor.process.call_count, 1)
+        self.assertNotIdentical(processing.digests.known(self.filePath),
+                                None)
+
+
+    def test_stats(self):
+        """
+        The effect records how long its processor took and what it sent.
+        """
+        self._processedFilePath(b"raw")
+        self._testEffect("A()")
+        self.assertEqual(self.collector.processors["A"].count, 1)
+        self.assertEqual(self.collector.bytesSent, 3)
+
+
+    def test_arguments(self):
+        self._processedFilePath(b"raw")
+        self._testEffect("A(1, level='max')")
+        self.processor.assert_called_once_with(1, level="max")
+
+
+    def test_processorReused(self):
+        """
+        An effect creates its processor once, and again only when the
+        registry maps its name to another class.
+        """
+        self._processedFilePath(b"raw")
+        effect = config._parseEffect("A()")
+        for _ in range(2):
+            effect(self.filePath, self.request, self.registry, self.resolver)
+        self.assertEqual(self.processor.call_count, 1)
+
+        other = mock.Mock()
+        other.producer.contentType = "holtz/other"
+        other.return_value = mock.Mock(spec=["process"])
+        other.return_value.process.side_effect = lambda data: data
+        self.patch(processing, "cache", caching.OutputCache())
+        effect(self.filePath, self.request, {"A": other}, self.resolver)
+        self.assertEqual(other.call_count, 1)
+
+
+    def test_cachedOutput(self):
+        """
+        Processing the same content again uses the cached output.
+        """
+        processor = self._processedFilePath(b"raw")
+        self._testEffect("A()")
+        self._testEffect("A()")
+        self.assertEquals(processor.process.call_count, 1)
+        self.assertEquals(self.request.write.call_count, 2)
+
+
+    def test_overloaded(self):
+        """
+        When the executor is overloaded, the client is asked to come back.
+        """
+        self._processedFilePath(b"raw")
+        overloaded = execution.Executor(maxRunning=0, maxWaiting=0)
+        self.patch(processing, "executor", overloaded)
+        self._testEffect("A()")
+        self.request.setResponseCode.assert_called_once_with(503)
+        self.assertHeaderEquals("Retry-After", "1")
+
+
+    def _testGzip(self, effectString):
+        self.requestHeaders["Accept-Encoding"] = "gzip"
+        self._testEffect(effectString)
+        self.assertHeaderEquals("Content-Encoding", "gzip")
+        self.assertHeaderEquals("Vary", "Accept-Encoding")
+        body, = self.request.write.call_args[0]
+        return gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+
+
+    def test_processedGzip(self):
+        processor = self._processedFilePath(b"raw")
+        self.processor.producer.contentType = "text/css"
+        self.assertEquals(self._testGzip("A()"), b"RAW")
+        self.assertEquals(self._testGzip("A()"), b"RAW")
+        self.assertEquals(processor.process.call_count, 1)
+
+
+    def test_gzip(self):
+        self._processedFilePath(b"raw")
+        self.resolver = lambda fp: "text/plain"
+        self.assertEquals(self._testGzip("None"), b"raw")
+
+
+    def test_uncompressedVary(self):
+        """
+        Compressible content that is sent unencoded still varies on
+        Accept-Encoding.
+        """
+        self._processedFilePath(b"raw")
+        self.processor.producer.contentType = "text/css"
+        self._testEffect("A()")
+        self.assertHeaderEquals("Vary", "Accept-Encoding")
+        self.request.write.assert_called_once_with(b"RAW")
+
+
+    def test_changedArguments(self):
+        processor = self._processedFilePath(b"raw")
+        self._testEffect("A(1)")
+        self._testEffect("A(2)")
+        self.assertEquals(processor.process.call_count, 2)
 
 
     def test_none(self):
@@ -251,6 +530,218 @@ class EffectParseTest(unittest.TestCase):
         self.assertRegisteredProducer()
 
 
+    def test_noneDigestedInExecutor(self):
+        """
+        Static files are digested in the executor, not while handling the
+        request.
+        """
+        jobs = []
+        queued = lambda f, *args: jobs.append((f, args)) or defer.Deferred()
+        self.patch(processing, "executor", execution.Executor(queued))
+        self._testEffect("None")
+        job = processing.digestFile, (self.filePath.path,)
+        self.assertEqual(jobs, [job])
+        self.assertFalse(self.request.registerProducer.called)
+
+
+    def test_noneDefaultResolver(self):
+        effect = config._parseEffect("None")
+        effect(self.filePath, self.request, self.registry)
+        self.assertContentTypeEquals(contenttype.DEFAULT_TYPE)
+
+
+    def test_noneRuleExtension(self):
+        """
+        Static files of rules with a fixed extension get the content type
+        for that extension, unless a resolver is given.
+        """
+        effect = config._compileEffect(None, ".css")
+        effect(self.filePath, self.request, self.registry)
+        self.assertContentTypeEquals("text/css")
+        self.assertHeaderEquals("Vary", "Accept-Encoding")
+
+        effect(self.filePath, self.request, self.registry, self.resolver)
+        self.assertContentTypeEquals("holtz/fromResolver")
+
+
+    def test_range(self):
+        """
+        Static files that can be sent in ranges accept range requests.
+        """
+        self.filePath = filepath.FilePath(self.mktemp())
+        self.filePath.setContent(b"0123456789")
+        self.requestHeaders["Range"] = "bytes=2-5"
+        self._testEffect("None")
+        self.assertHeaderEquals("Accept-Ranges", "bytes")
+        self.assertHeaderEquals("Content-Range", "bytes 2-5/10")
+        self.request.setResponseCode.assert_called_once_with(206)
+        self.request.write.assert_called_once_with(b"2345")
+
+
+    def test_gzipRange(self):
+        """
+        Encoded variants of static files accept range requests too, over the
+        encoded bytes.
+        """
+        self._processedFilePath(b"0123456789" * 10)
+        self.resolver = lambda fp: "text/plain"
+        self.requestHeaders["Accept-Encoding"] = "gzip"
+        self._testGzip("None")
+        whole, = self.request.write.call_args[0]
+
+        self.request.reset_mock()
+        self.requestHeaders["Range"] = "bytes=2-5"
+        self._testEffect("None")
+        self.assertHeaderEquals("Accept-Ranges", "bytes")
+        self.assertHeaderEquals("Content-Range",
+                                "bytes 2-5/{}".format(len(whole)))
+        self.request.setResponseCode.assert_called_once_with(206)
+        self.request.write.assert_called_once_with(whole[2:6])
+
+
+    def _chainedFilePath(self, content):
+        self._processedFilePath(content)
+        self.registry = {"Upper": Upper, "Suffix": Suffix}
+
+
+    def _written(self):
+        return b"".join(c[0][0] for c in self.request.write.call_args_list)
+
+
+    def test_chain(self):
+        """
+        Processors that take another call as their first argument process
+        its output.
+        """
+        self._chainedFilePath(b"raw")
+        self._testEffect("Suffix(Upper(), b'!')")
+        self.assertContentTypeEquals("holtz/suffixed")
+        self.assertEqual(self._written(), b"RAW!")
+        self.assertEqual(self.collector.processors["Suffix(Upper)"].count, 1)
+
+
+    def test_chainStreams(self):
+        """
+        Chains write their output as it comes out, without a
+        Content-Length.
+        """
+        content = b"a" * (transfer.CHUNK_SIZE * 2 + 1)
+        self._chainedFilePath(content)
+        self._testEffect("Upper(Upper())")
+        headers = dict(c[0] for c in self.request.setHeader.call_args_list)
+        self.assertNotIn("Content-Length", headers)
+        self.assertEqual(self.request.write.call_count, 3)
+        self.assertEqual(self._written(), content.upper())
+        self.assertEqual(self.collector.bytesSent, len(content))
+
+
+    def test_singleProcessorStreams(self):
+        """
+        A processor with a C{stream} method streams its output on its own
+        too.
+        """
+        content = b"a" * (transfer.CHUNK_SIZE + 1)
+        self._chainedFilePath(content)
+        self._testEffect("Upper()")
+        self.assertEqual(self.request.write.call_count, 2)
+        self.assertEqual(self._written(), content.upper())
+
+
+    def test_chainInWorkerProcesses(self):
+        """
+        Chains are processed whole when the executor runs jobs in other
+        processes, which can't share a stream.
+        """
+        self._chainedFilePath(b"raw")
+        processing.executor.inProcess = False
+        self._testEffect("Suffix(Upper(), b'!')")
+        self.assertHeaderEquals("Content-Length", "4")
+        self.request.write.assert_called_once_with(b"RAW!")
+        self.assertFalse(self.request.registerProducer.called)
+
+
+    def test_chainCached(self):
+        """
+        Streamed output is cached once it's complete, and sent whole after
+        that.
+        """
+        self._chainedFilePath(b"raw")
+        self._testEffect("Suffix(Upper(), b'!')")
+        self.request.reset_mock()
+        self._testEffect("Suffix(Upper(), b'!')")
+        self.assertHeaderEquals("Content-Length", "4")
+        self.request.write.assert_called_once_with(b"RAW!")
+        self.assertFalse(self.request.registerProducer.called)
+
+
+    def test_chainTooLargeToCache(self):
+        self._chainedFilePath(b"raw")
+        self.patch(processing, "MAX_STREAMED_BYTES", 3)
+        self._testEffect("Suffix(Upper(), b'!')")
+        self._testEffect("Suffix(Upper(), b'!')")
+        self.assertEqual(self.request.registerProducer.call_count, 2)
+
+
+    def test_chainGzip(self):
+        self._chainedFilePath(b"raw")
+        self.requestHeaders["Accept-Encoding"] = "gzip"
+        self._testEffect("Upper(Suffix(b'!'))")
+        self.assertHeaderEquals("Content-Encoding", "gzip")
+        body = gzip.GzipFile(fileobj=io.BytesIO(self._written())).read()
+        self.assertEqual(body, b"RAW!")
+
+
+    def test_chainHead(self):
+        self._chainedFilePath(b"raw")
+        self.request.method = b"HEAD"
+        self._testEffect("Upper(Upper())")
+        self.request.write.assert_called_once_with(b"")
+
+
+    def test_chainOverloaded(self):
+        self._chainedFilePath(b"raw")
+        overloaded = execution.Executor(maxRunning=0, maxWaiting=0)
+        self.patch(processing, "executor", overloaded)
+        self._testEffect("Upper(Upper())")
+        self.request.setResponseCode.assert_called_once_with(503)
+        self.assertFalse(self.request.registerProducer.called)
+
+
+    def test_validators(self):
+        self._testEffect("None")
+        emptyDigest = caching.fileDigest(io.BytesIO())
+        self.assertHeaderEquals("ETag", '"{}"'.format(emptyDigest))
+        mtime = os.stat(self.filePath.path).st_mtime
+        lastModified = http.datetimeToString(mtime)
+        self.assertHeaderEquals("Last-Modified", lastModified)
+
+
+    def _testNotModified(self, effectString):
+        self._testEffect(effectString)
+        headers = dict(c[0] for c in self.request.setHeader.call_args_list)
+        self.requestHeaders["If-None-Match"] = headers["ETag"]
+        self.request.reset_mock()
+        self.filePath.open = mock.Mock(side_effect=AssertionError("opened"))
+
+        self._testEffect(effectString)
+        self.request.setResponseCode.assert_called_once_with(304)
+
+
+    def test_notModified(self):
+        """
+        Requests with a current ETag get a 304 without opening the file.
+        """
+        self._testNotModified("None")
+        self.assertFalse(self.request.registerProducer.called)
+
+
+    def test_processedNotModified(self):
+        processor = self._processedFilePath(b"raw")
+        self._testNotModified("A()")
+        self.assertEquals(processor.process.call_count, 1)
+        self.request.write.assert_called_once_with(b"")
+
+
 
 class EffectParseFailureTest(unittest.TestCase):
     def _testRaises(self, string, exceptionClass=config.ParseError):
@@ -269,6 +760,155 @@ class EffectParseFailureTest(unittest.TestCase):
         self._testRaises("a.b")
 
 
+    def test_nonLiteralArgument(self):
+        self._testRaises("A(b)")
+        self._testRaises("A(level=len('x'))")
+
+
+    def test_unevaluableArgument(self):
+        """
+        Arguments that fail to evaluate for reasons other than not being
+        literals are parse errors too.
+        """
+        self._testRaises("A({[1]: 2})")
+        self._testRaises("A(B({[1]: 2}))")
+
+
+    def test_unpackedArguments(self):
+        self._testRaises("A(*[1])")
+        self._testRaises("A(**{'a': 1})")
+
+
+    def test_innerCall(self):
+        self._testRaises("A(b.c())")
+        self._testRaises("A(B(c))")
+        self._testRaises("A(B(*[1]))")
+        self._testRaises("A(1, B())")
+
+
+
+class BundleEffectTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = filepath.FilePath(self.mktemp())
+        self.directory.makedirs()
+        self.directory.child("a.js").setContent(b"var a;")
+        self.directory.child("b.js").setContent(b"var b;")
+        self.patch(processing, "cache", caching.OutputCache())
+        synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+        self.patch(processing, "executor", execution.Executor(synchronous))
+        self.collector = stats.Collector()
+        self.patch(stats, "collector", self.collector)
+
+        self.request = mock.Mock()
+        self.requestHeaders = {}
+        self.request.getHeader.side_effect = self.requestHeaders.get
+        self.effect = config._compileEffect(
+            config._parseEffectExpression('Bundle("*.js")'), ".js")
+
+
+    def _headers(self):
+        return dict(c[0] for c in self.request.setHeader.call_args_list)
+
+
+    def _get(self, name):
+        self.request.reset_mock()
+        d = self.effect(self.directory.child(name), self.request, {})
+        self.successResultOf(d)
+        return self._headers()
+
+
+    def _fingerprinted(self):
+        return self._get("app.js")["Location"]
+
+
+    def test_redirect(self):
+        """
+        The plain name redirects to the fingerprinted one.
+        """
+        headers = self._get("app.js")
+        self.request.setResponseCode.assert_called_once_with(302)
+        digest = hashlib.sha256(b"var a;\nvar b;").hexdigest()
+        self.assertEqual(headers["Location"],
+                         "app.{}.js".format(digest[:16]))
+        self.assertEqual(headers["Cache-Control"], "no-cache")
+
+
+    def test_fingerprinted(self):
+        headers = self._get(self._fingerprinted())
+        self.assertFalse(self.request.setResponseCode.called)
+        self.assertEqual(headers["Content-Type"], "application/javascript")
+        self.assertEqual(headers["Cache-Control"], bundling.IMMUTABLE)
+        self.request.write.assert_called_once_with(b"var a;\nvar b;")
+        self.assertEqual(self.collector.processors["Bundle"].count, 2)
+
+
+    def test_staleFingerprint(self):
+        fingerprinted = self._fingerprinted()
+        headers = self._get("app.0123456789abcdef.js")
+        self.request.setResponseCode.assert_called_once_with(302)
+        self.assertEqual(headers["Location"], fingerprinted)
+
+
+    def test_gzip(self):
+        self.requestHeaders["Accept-Encoding"] = "gzip"
+        headers = self._get(self._fingerprinted())
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        body, = self.request.write.call_args[0]
+        decoded = gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+        self.assertEqual(decoded, b"var a;\nvar b;")
+
+
+    def test_notModified(self):
+        fingerprinted = self._fingerprinted()
+        etag = self._get(fingerprinted)["ETag"]
+        self.requestHeaders["If-None-Match"] = etag
+        self._get(fingerprinted)
+        self.request.setResponseCode.assert_called_once_with(304)
+
+
+    def test_separator(self):
+        self.effect = config._compileEffect(
+            config._parseEffectExpression('Bundle("a*", separator=b"")'))
+        self._get(self._fingerprinted())
+        self.request.write.assert_called_once_with(b"var a;")
+
+
+    def test_invalid(self):
+        for effectString in ('Bundle()', 'Bundle(1)', 'Bundle("*", "x")',
+                             'Bundle("*", separator=1)', 'Minify(Bundle("*"))',
+                             'Bundle("*", level=1)'):
+            self.assertRaises(config.ParseError, config._parseEffect,
+                              effectString)
+
+
+
+class StagesTest(unittest.TestCase):
+    def _stages(self, effectString):
+        expression = config._parseEffectExpression(effectString)
+        return processing.evaluateStages(expression)
+
+
+    def test_single(self):
+        stages = self._stages("A(1, b=2)")
+        self.assertEqual(stages, [("A", [1], {"b": 2})])
+        self.assertEqual(processing.chainKey(stages),
+                         processing.ruleKey("A", [1], {"b": 2}))
+
+
+    def test_chain(self):
+        stages = self._stages("A(B(C(), 2), 1)")
+        self.assertEqual(stages, [("C", [], {}), ("B", [2], {}),
+                                  ("A", [1], {})])
+        name, _ = processing.chainKey(stages)
+        self.assertEqual(name, "A(B(C))")
+
+
+    def test_chainKeyArguments(self):
+        first = processing.chainKey(self._stages("A(B(1))"))
+        second = processing.chainKey(self._stages("A(B(2))"))
+        self.assertNotEqual(first, second)
+
+
 
 nestedConfig = """
 a/
@@ -425,3 +1065,163 @@ class ParserTest(unittest.TestCase):
         self.parser.push("js/")
         self.parser.push("    *.js: Minify()")
         self.assertRaises(config.ParseError, lambda: self.parser.root)
+
+
+    def test_dedent(self):
+        """
+        Entries after a dedent end up in the directory the dedent returns to.
+        """
+        for line in ["a/", "    b/", "        x: X()", "    y: Y()", ""]:
+            self.parser.push(line)
+        a = self.parser.root.subdirectories["a"]
+        self.assertEqual(len(a.entries), 1)
+        self.assertEqual(a.entries[0].source, "y")
+        self.assertEqual(len(a.subdirectories["b"].entries), 1)
+
+
+    def test_pushAfterRoot(self):
+        """
+        Getting the root doesn't stop more lines from being pushed.
+        """
+        for line in ["b/", "    x: X()", ""]:
+            self.parser.push(line)
+        self.assertEqual(self.parser.root.match("b"), None)
+
+        for line in ["a/", "    y: Y()", "b: B()", ""]:
+            self.parser.push(line)
+        root = self.parser.root
+        self.assertEqual(list(root.subdirectories), ["b", "a"])
+        self.assertEqual(len(root.subdirectories["b"].entries), 1)
+        self.assertEqual(len(root.subdirectories["a"].entries), 1)
+        self.assertEqual(root.match("b").source, "b")
+
+
+
+class StreamingParseTest(unittest.TestCase):
+    def _lines(self, text):
+        """
+        Yields the lines of some text from a generator, which can't seek.
+        """
+        for line in text.splitlines(True):
+            yield line
+
+
+    def assertBasicTree(self, root):
+        self.assertEqual(list(root.subdirectories), ["js", "img", "style"])
+        self.assertEqual(len(root.subdirectories["img"].entries), 2)
+
+
+    def test_generator(self):
+        self.assertBasicTree(config.parse(self._lines(basicConfig)))
+
+
+    def test_file(self):
+        self.assertBasicTree(config.parse(compat.StringIO(basicConfig)))
+
+
+    def test_tabs(self):
+        tabbed = basicConfig.replace(" " * 4, "\t")
+        self.assertBasicTree(config.parse(self._lines(tabbed)))
+
+
+    def test_precedingEmptyLines(self):
+        lines = self._lines("\n\n" + basicConfig)
+        self.assertBasicTree(config.parse(lines))
+
+
+    def test_noTrailingNewline(self):
+        lines = self._lines(basicConfig.rstrip("\n"))
+        self.assertBasicTree(config.parse(lines))
+
+
+    def test_empty(self):
+        root = config.parse(iter([]))
+        self.assertEqual(len(root.subdirectories), 0)
+        self.assertEqual(len(root.entries), 0)
+
+
+    def test_explicitIndent(self):
+        root = config.parse(["a/\n", "  x: X()\n"], indent="  ")
+        self.assertEqual(len(root.subdirectories["a"].entries), 1)
+
+
+    def _parseError(self, text, exceptionClass=config.ParseError):
+        lines = self._lines(text)
+        return self.assertRaises(exceptionClass, config.parse, lines)
+
+
+    def test_errorLineNumber(self):
+        e = self._parseError("a/\n    x: X()\n    y:Y()\n")
+        self.assertEqual(e.lineNumber, 3)
+        self.assertEqual(e.line, "y:Y()")
+        self.assertEqual(e.args[2], 3)
+
+
+    def test_argumentErrorLineNumber(self):
+        e = self._parseError("a/\n    x: X(1)\n    y: Y(z)\n")
+        self.assertEqual(e.lineNumber, 3)
+
+
+    def test_syntaxErrorLineNumber(self):
+        for effect in "Minify(level=)", "Minify(1 +)":
+            text = "a/\n    x: X()\n    *.js: {}\n".format(effect)
+            e = self._parseError(text, config.EffectSyntaxError)
+            self.assertEqual(e.lineNumber, 3)
+            self.assertIn(effect, e.line)
+            self.assertIsInstance(e, SyntaxError)
+
+
+    def test_indentationErrorLineNumber(self):
+        text = "a/\n    x: X()\n\n            y: Y()\n"
+        e = self._parseError(text, config.IndentationError)
+        self.assertEqual(e.lineNumber, 4)
+
+
+    def test_emptyBlockAtEnd(self):
+        e = self._parseError("a/\n    x: X()\nb/\n")
+        self.assertEqual(e.lineNumber, 4)
+
+
+
+class ParserLineNumberTest(unittest.TestCase):
+    def test_push(self):
+        parser = config.Parser()
+        parser.push("a/")
+        e = self.assertRaises(config.ParseError, parser.push, "b/")
+        self.assertEqual(e.lineNumber, 2)
+        self.assertEqual(e.line, "b/")
+
+
+
+class CompactTreeTest(unittest.TestCase):
+    def setUp(self):
+        text = "a/\n    *.js: None\nb/\n    *.js: None\n"
+        self.root = config.parse(compat.StringIO(text))
+        self.a = self.root.subdirectories["a"]
+        self.b = self.root.subdirectories["b"]
+
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.root, "__dict__"))
+        self.assertFalse(hasattr(self.a.entries[0], "__dict__"))
+
+
+    def test_frozen(self):
+        self.assertIsInstance(self.a.entries, tuple)
+        self.assertIsInstance(self.a.subdirectories, dict)
+
+
+    def test_order(self):
+        self.assertEqual(list(self.root.subdirectories), ["a", "b"])
+
+
+    def test_internedNames(self):
+        self.assertIdentical(list(self.root.subdirectories)[0],
+                             compat.intern("a"))
+
+
+    def test_sharedConditionsAndEffects(self):
+        first, second = self.a.entries[0], self.b.entries[0]
+        self.assertIdentical(first.condition, second.condition)
+        self.assertIdentical(first.effect, second.effect)
+        self.assertIdentical(first.source, second.source)
@@ -0,0 +1,72 @@
+from twisted.python import filepath
+from twisted.trial import unittest
+
+from holtz import contenttype
+
+
+
+class ResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.resolver = contenttype.Resolver({".html": "text/html"},
+                                             cacheSize=2)
+
+
+    def test_table(self):
+        path = filepath.FilePath("/srv/INDEX.HTML")
+        self.assertEqual(self.resolver(path), "text/html")
+
+
+    def test_guessed(self):
+        self.assertEqual(self.resolver.forExtension(".png"), "image/png")
+
+
+    def test_unknown(self):
+        self.assertEqual(self.resolver.forExtension(".nope"),
+                         contenttype.DEFAULT_TYPE)
+        self.assertEqual(self.resolver.forExtension(""),
+                         contenttype.DEFAULT_TYPE)
+
+
+    def test_boundedCache(self):
+        for extension in ".a", ".b", ".c":
+            self.resolver.forExtension(extension)
+        self.assertEqual(list(self.resolver._cache), [".b", ".c"])
+
+
+
+class RuleExtensionTest(unittest.TestCase):
+    def test_literal(self):
+        self.assertEqual(contenttype.ruleExtension("Index.HTML", None),
+                         ".html")
+        self.assertIdentical(contenttype.ruleExtension("README", None), None)
+
+
+    def test_glob(self):
+        for source in "*.js", "app-*.min.js", "{a,b}.js", "?.js":
+            self.assertEqual(contenttype.ruleExtension(source, "..."), ".js")
+
+
+    def test_variableExtension(self):
+        for source in "*", "*.{js,css}", "a.*", "a.j?", "*.js*":
+            self.assertIdentical(contenttype.ruleExtension(source, "..."),
+                                 None)
+
+
+
+class StaticHeadersTest(unittest.TestCase):
+    def test_compressible(self):
+        headers, compressible = contenttype.staticHeaders("text/css")
+        self.assertTrue(compressible)
+        self.assertEqual(headers, (("Content-Type", "text/css"),
+                                   ("Vary", "Accept-Encoding")))
+
+
+    def test_incompressible(self):
+        headers, compressible = contenttype.staticHeaders("image/png")
+        self.assertFalse(compressible)
+        self.assertEqual(headers, (("Content-Type", "image/png"),))
+
+
+    def test_remembered(self):
+        self.assertIdentical(contenttype.staticHeaders("text/css"),
+                             contenttype.staticHeaders("text/css"))
@@ -0,0 +1,90 @@
+import gzip
+import io
+
+from twisted.trial import unittest
+
+from holtz import compat, encoding
+
+
+
+class NegotiateTest(unittest.TestCase):
+    def setUp(self):
+        # Make the result independent of whether brotli is installed.
+        self.patch(encoding, "ENCODERS", {"gzip": encoding._gzip})
+
+
+    def test_missing(self):
+        self.assertIdentical(encoding.negotiate(None), None)
+        self.assertIdentical(encoding.negotiate(""), None)
+
+
+    def test_gzip(self):
+        self.assertEqual(encoding.negotiate("gzip, deflate"), "gzip")
+
+
+    def test_alias(self):
+        self.assertEqual(encoding.negotiate("x-gzip"), "gzip")
+
+
+    def test_unsupported(self):
+        self.assertIdentical(encoding.negotiate("deflate, compress"), None)
+
+
+    def test_refused(self):
+        self.assertIdentical(encoding.negotiate("gzip;q=0"), None)
+
+
+    def test_star(self):
+        self.assertEqual(encoding.negotiate("*"), "gzip")
+        self.assertIdentical(encoding.negotiate("*;q=0"), None)
+
+
+    def test_badQuality(self):
+        self.assertIdentical(encoding.negotiate("gzip;q=lots"), None)
+
+
+    def test_preference(self):
+        self.patch(encoding, "ENCODERS", compat.OrderedDict([
+            ("br", None), ("gzip", encoding._gzip)]))
+        self.assertEqual(encoding.negotiate("gzip, br"), "br")
+        self.assertEqual(encoding.negotiate("gzip, br;q=0.5"), "gzip")
+
+
+
+class CompressibleTest(unittest.TestCase):
+    def test_compressible(self):
+        for contentType in ["text/css", "text/html; charset=utf-8",
+                            "application/javascript", "image/svg+xml",
+                            "application/ld+json"]:
+            self.assertTrue(encoding.isCompressible(contentType))
+
+
+    def test_incompressible(self):
+        for contentType in ["image/png", "video/mp4", "application/zip"]:
+            self.assertFalse(encoding.isCompressible(contentType))
+
+
+
+class EncodeTest(unittest.TestCase):
+    def test_gzip(self):
+        data = b"holtz " * 100
+        encoded = encoding.encode(data, "gzip")
+        self.assertTrue(len(encoded) < len(data))
+        decoded = gzip.GzipFile(fileobj=io.BytesIO(encoded)).read()
+        self.assertEqual(decoded, data)
+
+
+    def test_deterministic(self):
+        self.assertEqual(encoding.encode(b"abc", "gzip"),
+                         encoding.encode(b"abc", "gzip"))
+
+
+    def test_chunks(self):
+        chunks = [b"holtz ", b"", b"streams " * 100]
+        encoded = b"".join(encoding.encodeChunks(iter(chunks), "gzip"))
+        decoded = gzip.GzipFile(fileobj=io.BytesIO(encoded)).read()
+        self.assertEqual(decoded, b"".join(chunks))
+
+
+    def test_variantETag(self):
+        self.assertEqual(encoding.variantETag('"abc"', "gzip"), '"abc-gzip"')
@@ -0,0 +1,240 @@
+import os
+import time
+
+from twisted.internet import defer
+from twisted.trial import unittest
+
+from holtz import execution, processing
+
+
+
+class _ManualSubmit(object):
+    """
+    A submit function that only runs jobs when told to.
+    """
+    def __init__(self):
+        self.jobs = []
+
+
+    def __call__(self, f, *args):
+        d = defer.Deferred()
+        self.jobs.append((d, f, args))
+        return d
+
+
+    def runNext(self):
+        d, f, args = self.jobs.pop(0)
+        try:
+            result = f(*args)
+        except Exception as e:
+            d.errback(e)
+        else:
+            d.callback(result)
+
+
+
+class ExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.submit = _ManualSubmit()
+        self.executor = execution.Executor(self.submit, 2, 1)
+
+
+    def test_run(self):
+        d = self.executor.run("a", lambda x: x * 2, 21)
+        self.assertNoResult(d)
+        self.submit.runNext()
+        self.assertEqual(self.successResultOf(d), 42)
+        self.assertEqual(self.executor.running, 0)
+
+
+    def test_failure(self):
+        d = self.executor.run("a", lambda: 1 // 0)
+        self.submit.runNext()
+        self.failureResultOf(d, ZeroDivisionError)
+        self.assertEqual(self.executor.running, 0)
+
+
+    def test_coalesce(self):
+        """
+        Jobs with the same key as a job in flight share its result.
+        """
+        calls = []
+        job = lambda: calls.append(None) or "result"
+        first = self.executor.run("a", job)
+        second = self.executor.run("a", job)
+        self.assertEqual(len(self.submit.jobs), 1)
+        self.submit.runNext()
+
+        self.assertEqual(self.successResultOf(first), "result")
+        self.assertEqual(self.successResultOf(second), "result")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.executor.coalesced, 1)
+
+
+    def test_rerunAfterFinishing(self):
+        self.executor.run("a", lambda: 1)
+        self.submit.runNext()
+        self.executor.run("a", lambda: 2)
+        self.assertEqual(len(self.submit.jobs), 1)
+
+
+    def test_waiting(self):
+        """
+        Jobs beyond the running limit wait until a running job finishes.
+        """
+        self.executor.run("a", lambda: "a")
+        self.executor.run("b", lambda: "b")
+        c = self.executor.run("c", lambda: "c")
+        self.assertEqual(len(self.submit.jobs), 2)
+
+        self.submit.runNext()
+        self.assertEqual(len(self.submit.jobs), 2)
+        self.submit.runNext()
+        self.submit.runNext()
+        self.assertEqual(self.successResultOf(c), "c")
+
+
+    def test_coalesceWaiting(self):
+        self.executor.run("a", lambda: "a")
+        self.executor.run("b", lambda: "b")
+        c1 = self.executor.run("c", lambda: "c")
+        c2 = self.executor.run("c", lambda: "c")
+        for _ in range(3):
+            self.submit.runNext()
+        self.assertEqual(self.successResultOf(c1), "c")
+        self.assertEqual(self.successResultOf(c2), "c")
+
+
+    def test_overloaded(self):
+        self.executor.run("a", lambda: "a")
+        self.executor.run("b", lambda: "b")
+        self.executor.run("c", lambda: "c")
+        d = self.executor.run("d", lambda: "d")
+        self.failureResultOf(d, execution.Overloaded)
+        self.assertEqual(self.executor.rejected, 1)
+
+
+    def test_resume(self):
+        """
+        Resumed jobs wait for their turn even when the queue is full.
+        """
+        for key in "abc":
+            self.executor.run(key, lambda: None)
+        d = self.executor.resume("d", lambda: "d")
+        for _ in range(4):
+            self.submit.runNext()
+        self.assertEqual(self.successResultOf(d), "d")
+        self.assertEqual(self.executor.rejected, 0)
+
+
+
+def _double(x):
+    return x * 2
+
+
+
+def _fail():
+    raise ValueError("nope")
+
+
+
+def _die():
+    os._exit(1)
+
+
+
+def _unpicklable():
+    return lambda: None
+
+
+
+class _Raising(object):
+    def process(self, content):
+        raise ValueError("nope")
+
+
+
+class _ImmediateReactor(object):
+    def callFromThread(self, f, *args):
+        f(*args)
+
+
+
+class ProcessPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = execution.ProcessPool(1, _ImmediateReactor())
+        self.addCleanup(self.pool.close)
+        self.path = self.mktemp()
+        with open(self.path, "wb") as f:
+            f.write(b"content")
+
+
+    def _drain(self):
+        self.pool.close()
+
+
+    def _waitFor(self, d, timeout=10):
+        """
+        Waits for a job without closing the pool.
+        """
+        deadline = time.time() + timeout
+        while not d.called and time.time() < deadline:
+            time.sleep(0.01)
+        return d
+
+
+    def test_result(self):
+        d = self.pool(_double, 21)
+        self._drain()
+        self.assertEqual(self.successResultOf(d), 42)
+
+
+    def test_failure(self):
+        d = self.pool(_fail)
+        self._drain()
+        self.failureResultOf(d, ValueError)
+
+
+    def test_unpicklableJob(self):
+        d = self.pool(lambda: 42)
+        self.failureResultOf(d)
+
+
+    def test_unpicklableResult(self):
+        d = self.pool(_unpicklable)
+        self._drain()
+        self.failureResultOf(d)
+
+
+    def test_raisingProcessor(self):
+        d = self.pool(processing.processFile, self.path, _Raising())
+        self._drain()
+        self.failureResultOf(d, ValueError)
+
+
+    def test_executorReleased(self):
+        """
+        Jobs that can't run in the pool don't count as running anymore.
+        """
+        executor = execution.Executor(self.pool)
+        d = executor.run("a", lambda: 42)
+        self.failureResultOf(d)
+        self.assertEqual(executor.running, 0)
+
+
+    def test_notInProcess(self):
+        self.assertFalse(execution.Executor(self.pool).inProcess)
+        self.assertTrue(execution.Executor().inProcess)
+        self.assertFalse(execution.Executor(inProcess=False).inProcess)
+
+
+    def test_deadWorker(self):
+        """
+        Jobs whose worker dies fail, and the pool is started again.
+        """
+        if execution.futures is None:
+            raise unittest.SkipTest("multiprocessing can't tell")
+        d = self.pool(_die)
+        self.failureResultOf(self._waitFor(d), execution.BrokenProcessPool)
+        d = self.pool(_double, 21)
+        self.assertEqual(self.successResultOf(self._waitFor(d)), 42)
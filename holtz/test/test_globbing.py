@@ -0,0 +1,87 @@
+from twisted.trial import unittest
+
+from holtz import globbing
+from holtz.globbing import ANY, STAR
+
+
+
+class AutomatonTest(unittest.TestCase):
+    def assertMatches(self, pattern, trues, falses):
+        matches = globbing.compile(pattern)
+        for name in trues:
+            self.assertTrue(matches(name), name)
+        for name in falses:
+            self.assertFalse(matches(name), name)
+
+
+    def test_literal(self):
+        self.assertMatches(("abc",), ["abc"], ["", "ab", "abcd", "xabc"])
+
+
+    def test_empty(self):
+        self.assertMatches((), [""], ["a"])
+
+
+    def test_any(self):
+        self.assertMatches(("a", ANY, "c"), ["abc", "a?c"], ["ac", "abbc"])
+
+
+    def test_star(self):
+        self.assertMatches(("a", STAR, "c"), ["ac", "abc", "abbbc", "acc"],
+                           ["a", "ab", "acb"])
+
+
+    def test_stars(self):
+        self.assertMatches((STAR, STAR, "a", STAR), ["a", "xax", "aaa"],
+                           ["", "xyz"])
+
+
+    def test_alternation(self):
+        pattern = ("x", ("a", "bc", ""), "y")
+        self.assertMatches(pattern, ["xay", "xbcy", "xy"],
+                           ["xby", "xaby", "xaay"])
+
+
+    def test_starAfterAlternation(self):
+        self.assertMatches((("a", "b"), STAR), ["a", "bcd"], ["", "ca"])
+
+
+    def test_firstIndex(self):
+        """
+        The lowest index of the patterns matching a name is found, whatever
+        order they were given in.
+        """
+        automaton = globbing.Automaton([
+            (3, (STAR,)),
+            (1, (STAR, ".js")),
+            (2, ("a", STAR)),
+        ])
+        self.assertEqual(automaton.match("a.js"), 1)
+        self.assertEqual(automaton.match("a.css"), 2)
+        self.assertEqual(automaton.match("b.css"), 3)
+        self.assertIdentical(globbing.Automaton([]).match("a"), None)
+
+
+    def test_adversarial(self):
+        """
+        Patterns that make backtracking matchers take exponential time are
+        matched quickly.
+        """
+        pattern = (STAR, "a") * 30 + ("b",)
+        matches = globbing.compile(pattern)
+        self.assertFalse(matches("a" * 5000))
+        self.assertTrue(matches("a" * 5000 + "b"))
+
+
+    def test_maxStates(self):
+        """
+        The deterministic automaton is rebuilt when it grows too large, and
+        still matches the same names.
+        """
+        automaton = globbing.Automaton([(0, (STAR, "a", ANY, ANY, ANY))],
+                                       maxStates=4)
+        for name in "xaxxx", "aaaa", "abab", "xxxxxxaxyz":
+            self.assertEqual(automaton.match(name), 0, name)
+        for name in "xxxx", "aaa", "abxxb":
+            self.assertIdentical(automaton.match(name), None, name)
+        self.assertTrue(len(automaton._states) <= 5)
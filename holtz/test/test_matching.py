@@ -0,0 +1,142 @@
+from twisted.trial import unittest
+
+from holtz import compat, config, matching, structure
+
+
+
+def _entry(source):
+    pattern = config._conditionPattern(source)
+    condition = config._compileCondition(source, pattern)
+    return structure.Entry(condition, None, source, pattern)
+
+
+
+class MatcherTest(unittest.TestCase):
+    def _matcher(self, *sources):
+        self.entries = [_entry(s) for s in sources]
+        return matching.Matcher(self.entries)
+
+
+    def assertMatches(self, matcher, name, expectedIndex):
+        self.assertIdentical(matcher.match(name), self.entries[expectedIndex])
+
+
+    def test_empty(self):
+        self.assertIdentical(self._matcher().match("abc"), None)
+
+
+    def test_literal(self):
+        matcher = self._matcher("a.js", "b.js")
+        self.assertMatches(matcher, "b.js", 1)
+        self.assertIdentical(matcher.match("c.js"), None)
+
+
+    def test_glob(self):
+        matcher = self._matcher("*.css", "*.js")
+        self.assertMatches(matcher, "app.js", 1)
+        self.assertIdentical(matcher.match("app.png"), None)
+
+
+    def test_alternation(self):
+        matcher = self._matcher("*.{png,jpg}")
+        self.assertMatches(matcher, "a.jpg", 0)
+        self.assertIdentical(matcher.match("a.gif"), None)
+
+
+    def test_anchored(self):
+        """
+        Globs match whole names, not just their beginnings.
+        """
+        matcher = self._matcher("*.js", "*.{png,jpg}")
+        self.assertIdentical(matcher.match("app.jsx"), None)
+        self.assertIdentical(matcher.match("a.jpgx"), None)
+
+
+    def test_globBeforeLiteral(self):
+        """
+        A glob that comes before a matching literal wins.
+        """
+        matcher = self._matcher("*.js", "a.js")
+        self.assertMatches(matcher, "a.js", 0)
+
+
+    def test_literalBeforeGlob(self):
+        """
+        A literal that comes before a matching glob wins.
+        """
+        matcher = self._matcher("a.js", "*.js")
+        self.assertMatches(matcher, "a.js", 0)
+        self.assertMatches(matcher, "b.js", 1)
+
+
+    def test_duplicateLiteral(self):
+        matcher = self._matcher("a.js", "a.js")
+        self.assertMatches(matcher, "a.js", 0)
+
+
+    def test_manyGlobs(self):
+        """
+        Directories with many globs still match every entry, in order.
+        """
+        count = 1000
+        sources = ["f{}_*".format(i) for i in range(count)] + ["*"]
+        matcher = self._matcher(*sources)
+        for i in range(count):
+            self.assertMatches(matcher, "f{}_x".format(i), i)
+        self.assertMatches(matcher, "other", count)
+
+
+    def test_opaqueCondition(self):
+        """
+        Entries without a source or pattern are checked by calling their
+        condition, still in order.
+        """
+        entries = [
+            structure.Entry("a.js".__eq__, None),
+            _entry("*.js"),
+            structure.Entry(lambda name: True, None)
+        ]
+        matcher = matching.Matcher(entries)
+        self.assertIdentical(matcher.match("a.js"), entries[0])
+        self.assertIdentical(matcher.match("b.js"), entries[1])
+        self.assertIdentical(matcher.match("b.css"), entries[2])
+
+
+
+class DirectoryMatchTest(unittest.TestCase):
+    def test_lazy(self):
+        directory = structure.Directory()
+        directory.entries.append(_entry("*.js"))
+        self.assertIdentical(directory.matcher, None)
+        self.assertIdentical(directory.match("a.js"), directory.entries[0])
+        self.assertNotIdentical(directory.matcher, None)
+
+
+
+nestedConfig = """
+js/
+    *.js: X()
+    vendor/
+        jquery.js: None
+""".lstrip("\n")
+
+
+
+class CompileTreeTest(unittest.TestCase):
+    def test_parserRoot(self):
+        """
+        Getting the root from the parser builds matchers for every directory.
+        """
+        parser = config.Parser()
+        for line in compat.StringIO(nestedConfig):
+            parser.push(line)
+        parser.push("")
+        root = parser.root
+
+        js = root.subdirectories["js"]
+        vendor = js.subdirectories["vendor"]
+        for directory in root, js, vendor:
+            self.assertNotIdentical(directory.matcher, None)
+
+        self.assertIdentical(js.match("a.js"), js.entries[0])
+        self.assertIdentical(vendor.match("jquery.js"), vendor.entries[0])
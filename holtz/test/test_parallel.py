@@ -0,0 +1,143 @@
+import ast
+import multiprocessing
+import pickle
+
+from twisted.trial import unittest
+
+from holtz import config, parallel
+
+siteConfig = """
+index.html: None
+js/
+    *.js: Minify()
+    vendor/
+        jquery.js: None
+favicon.ico: None
+css/
+    *.{css,less}: LESSMasker()
+img/
+    *.png: PNGOptimizer()
+    icons/
+        *.svg: None
+js/
+    app.js: Minify()
+robots.txt: None
+""".lstrip("\n")
+
+
+
+def _shape(directory):
+    """
+    Describes a directory tree with values that compare equal if the trees
+    are the same.
+    """
+    entries = [(e.source, e.pattern, e.expression and ast.dump(e.expression))
+               for e in directory.entries]
+    subdirectories = [(name, _shape(subdirectory))
+                      for name, subdirectory
+                      in directory.subdirectories.items()]
+    return entries, subdirectories
+
+
+
+class ParallelParseTest(unittest.TestCase):
+    def _parse(self, text, **kwargs):
+        kwargs.setdefault("processes", 2)
+        return parallel.parse(text.splitlines(True), **kwargs)
+
+
+    def test_sameTree(self):
+        """
+        The tree is the same as the one parsed in one go, with top-level
+        entries and directories in order.
+        """
+        expected = config.parse(siteConfig.splitlines(True))
+        root = self._parse(siteConfig)
+        self.assertEqual(_shape(root), _shape(expected))
+        self.assertEqual(list(root.subdirectories), ["js", "css", "img"])
+        css = root.subdirectories["css"]
+        self.assertEqual(css.match("a.less").source, "*.{css,less}")
+
+
+    def test_batches(self):
+        """
+        Configurations are split at top-level directories.
+        """
+        lines = siteConfig.splitlines(True)
+        batches = parallel._split(lines, 4)
+        self.assertTrue(len(batches) > 1)
+        self.assertEqual(batches[0][0], 0)
+        self.assertEqual(batches[-1][1], len(lines))
+        for (_, end), (start, _) in zip(batches, batches[1:]):
+            self.assertEqual(end, start)
+            self.assertTrue(lines[start].endswith("/\n"))
+
+
+    def test_pool(self):
+        pool = multiprocessing.Pool(2)
+        self.addCleanup(pool.join)
+        self.addCleanup(pool.close)
+        root = self._parse(siteConfig, pool=pool)
+        self.assertEqual(list(root.subdirectories), ["js", "css", "img"])
+
+
+    def test_singleProcess(self):
+        root = self._parse(siteConfig, processes=1)
+        self.assertEqual(list(root.subdirectories), ["js", "css", "img"])
+
+
+    def assertSameError(self, text):
+        lines = text.splitlines(True)
+        expected = self.assertRaises(config.ParseError, config.parse, lines)
+        error = self.assertRaises(config.ParseError, self._parse, text)
+        self.assertEqual(type(error), type(expected))
+        self.assertEqual(error.args, expected.args)
+
+
+    def test_errorLineNumber(self):
+        self.assertSameError(siteConfig + "a/\n    b\n")
+
+
+    def test_noTokensError(self):
+        self.assertSameError(siteConfig.replace("*.js", "{*.js"))
+
+
+    def test_emptyBlockError(self):
+        """
+        An empty block at the end of a batch is reported at the first line
+        of the next batch, like it is when parsing in one go.
+        """
+        for index in range(12):
+            lines = siteConfig.splitlines(True)
+            if lines[index].endswith("/\n") and lines[index][0] != " ":
+                lines.insert(index + 1, "empty/\n")
+                self.assertSameError("".join(lines))
+
+
+    def test_firstError(self):
+        """
+        If several batches don't parse, the first error is raised.
+        """
+        text = siteConfig.replace("index.html", "index.html\\")
+        text = text.replace("robots.txt", "robots.txt\\")
+        self.assertSameError(text)
+
+
+
+class ParseErrorPickleTest(unittest.TestCase):
+    def test_noTokens(self):
+        error = config.NoTokens(",}", "{a")
+        error._locate("{a", 3)
+        unpickled = pickle.loads(pickle.dumps(error))
+        self.assertEqual(type(unpickled), config.NoTokens)
+        self.assertEqual(unpickled.args, error.args)
+        self.assertEqual(unpickled.lineNumber, 3)
+
+
+    def test_effectSyntaxError(self):
+        error = config.EffectSyntaxError("Effect isn't valid syntax")
+        error._locate("*.js: Minify(1 +)", 3)
+        unpickled = pickle.loads(pickle.dumps(error))
+        self.assertEqual(type(unpickled), config.EffectSyntaxError)
+        self.assertEqual(unpickled.args, error.args)
+        self.assertEqual(unpickled.lineNumber, 3)
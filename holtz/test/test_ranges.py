@@ -0,0 +1,188 @@
+from twisted.trial import unittest
+from twisted.web import http
+from twisted.web.test.requesthelper import DummyRequest
+
+from holtz import conditional, ranges
+
+content = b"".join(b"%04d" % i for i in range(50000))
+etag = conditional.strongETag("abc")
+lastModified = 1000000000
+
+
+
+class ParseTest(unittest.TestCase):
+    def test_single(self):
+        self.assertEqual(ranges.parse("bytes=0-499", 1000), [(0, 500)])
+
+
+    def test_open(self):
+        self.assertEqual(ranges.parse("bytes=900-", 1000), [(900, 100)])
+
+
+    def test_suffix(self):
+        self.assertEqual(ranges.parse("bytes=-100", 1000), [(900, 100)])
+        self.assertEqual(ranges.parse("bytes=-5000", 1000), [(0, 1000)])
+
+
+    def test_clamped(self):
+        self.assertEqual(ranges.parse("bytes=900-5000", 1000), [(900, 100)])
+
+
+    def test_several(self):
+        self.assertEqual(ranges.parse("bytes=500-599, 0-99", 1000),
+                         [(0, 100), (500, 100)])
+
+
+    def test_coalesced(self):
+        """
+        Overlapping and adjacent ranges are merged.
+        """
+        self.assertEqual(ranges.parse("bytes=0-99,50-149,150-199", 1000),
+                         [(0, 200)])
+
+
+    def test_unsatisfiable(self):
+        self.assertEqual(ranges.parse("bytes=1000-", 1000), [])
+        self.assertEqual(ranges.parse("bytes=-0", 1000), [])
+        self.assertEqual(ranges.parse("bytes=-10", 0), [])
+
+
+    def test_partlySatisfiable(self):
+        self.assertEqual(ranges.parse("bytes=0-9,2000-", 1000), [(0, 10)])
+
+
+    def test_invalid(self):
+        """
+        Headers that aren't byte range sets are ignored.
+        """
+        for header in ["items=0-9", "bytes", "bytes=", "bytes=9-0",
+                       "bytes=a-b", "bytes=-", "bytes=1-2-3"]:
+            self.assertIdentical(ranges.parse(header, 1000), None, header)
+
+
+    def test_tooMany(self):
+        header = "bytes=" + ",".join("%d-%d" % (i * 10, i * 10)
+                                     for i in range(ranges.MAX_RANGES + 1))
+        self.assertIdentical(ranges.parse(header, 1000), None)
+
+
+
+class RequestedTest(unittest.TestCase):
+    def _requested(self, **headers):
+        request = DummyRequest([b""])
+        for name, value in headers.items():
+            name = name.replace("_", "-").encode("ascii")
+            request.requestHeaders.setRawHeaders(name, [value])
+        return ranges.requested(request, 1000, etag, lastModified)
+
+
+    def test_noRange(self):
+        self.assertIdentical(self._requested(), None)
+
+
+    def test_range(self):
+        self.assertEqual(self._requested(Range="bytes=0-9"), [(0, 10)])
+
+
+    def test_ifRangeETag(self):
+        self.assertEqual(self._requested(Range="bytes=0-9", If_Range=etag),
+                         [(0, 10)])
+        self.assertIdentical(
+            self._requested(Range="bytes=0-9", If_Range='"xyz"'), None)
+
+
+    def test_ifRangeWeakETag(self):
+        """
+        Weak entity tags never match.
+        """
+        self.assertIdentical(
+            self._requested(Range="bytes=0-9", If_Range="W/" + etag), None)
+
+
+    def test_ifRangeDate(self):
+        date = http.datetimeToString(lastModified)
+        self.assertEqual(self._requested(Range="bytes=0-9", If_Range=date),
+                         [(0, 10)])
+        date = http.datetimeToString(lastModified - 1)
+        self.assertIdentical(
+            self._requested(Range="bytes=0-9", If_Range=date), None)
+
+
+
+class SendTest(unittest.TestCase):
+    def setUp(self):
+        path = self.mktemp()
+        with open(path, "wb") as f:
+            f.write(content)
+        self.file = open(path, "rb")
+        self.addCleanup(self.file.close)
+        self.request = DummyRequest([b""])
+
+
+    def _send(self, wanted, source=None):
+        if source is None:
+            source = self.file
+        d = ranges.send(source, self.request, len(content), "text/plain",
+                        wanted)
+        self.assertEqual(self.successResultOf(d), None)
+        return b"".join(self.request.written)
+
+
+    def header(self, name):
+        value = self.request.responseHeaders.getRawHeaders(name)[0]
+        if not isinstance(value, str):
+            value = value.decode("latin-1")
+        return value
+
+
+    def test_unsatisfiable(self):
+        self.assertEqual(self._send([]), b"")
+        self.assertEqual(self.request.responseCode,
+                         http.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(self.header(b"content-range"),
+                         "bytes */%d" % len(content))
+
+
+    def test_single(self):
+        self.assertEqual(self._send([(4, 8)]), content[4:12])
+        self.assertEqual(self.request.responseCode, http.PARTIAL_CONTENT)
+        self.assertEqual(self.header(b"content-range"),
+                         "bytes 4-11/%d" % len(content))
+        self.assertEqual(self.header(b"content-length"), "8")
+
+
+    def test_large(self):
+        """
+        Ranges too large to write at once are sent with a producer.
+        """
+        body = self._send([(1000, 150000)])
+        self.assertEqual(body, content[1000:151000])
+
+
+    def test_bytes(self):
+        self.assertEqual(self._send([(4, 8)], content), content[4:12])
+
+
+    def test_multipart(self):
+        body = self._send([(0, 4), (100000, 100000)])
+        contentType = self.header(b"content-type")
+        self.assertTrue(contentType.startswith(
+            "multipart/byteranges; boundary="))
+        boundary = contentType.split("=", 1)[1].encode("ascii")
+        self.assertEqual(int(self.header(b"content-length")), len(body))
+
+        parts = body.split(b"\r\n--" + boundary)
+        self.assertEqual(parts[0], b"")
+        self.assertEqual(parts[-1], b"--\r\n")
+        first, second = [part.split(b"\r\n\r\n", 1) for part in parts[1:-1]]
+        self.assertEqual(first[1], content[:4])
+        self.assertEqual(second[1], content[100000:200000])
+        self.assertIn(b"Content-Type: text/plain", first[0])
+        self.assertIn(b"Content-Range: bytes 0-3/%d" % len(content),
+                      first[0])
+
+
+    def test_head(self):
+        self.request.method = b"HEAD"
+        self.assertEqual(self._send([(4, 8)]), b"")
+        self.assertEqual(self.header(b"content-length"), "8")
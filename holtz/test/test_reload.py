@@ -0,0 +1,132 @@
+from twisted.internet import task
+from twisted.trial import unittest
+
+from holtz import caching, config, processing, reload
+
+siteConfig = """
+index.html: None
+js/
+    *.js: JavascriptSomething()
+img/
+    *.png: PNGOptimizer(level=3)
+""".lstrip("\n")
+
+
+
+class LiveConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.path = self.mktemp()
+        self._writeConfig(siteConfig)
+        self.live = reload.LiveConfig(self.path)
+
+
+    def _writeConfig(self, text):
+        with open(self.path, "w") as f:
+            f.write(text)
+
+
+    def _reload(self, text):
+        self._writeConfig(text)
+        return self.live.reload()
+
+
+    def test_resolve(self):
+        entry, effect = self.live.resolve("/js/app.js")
+        js = self.live.root.subdirectories["js"]
+        self.assertIdentical(entry, js.entries[0])
+
+
+    def test_unchanged(self):
+        root = self.live.root
+        self.assertEqual(self._reload(siteConfig), [])
+        self.assertIdentical(self.live.root, root)
+
+
+    def test_changedEntries(self):
+        old = self.live.root
+        oldJs = old.subdirectories["js"]
+        oldEntries = tuple(oldJs.entries)
+
+        changed = siteConfig.replace("*.js", "*.{js,coffee}")
+        self.assertEqual(self._reload(changed), [(["js"], False)])
+
+        new = self.live.root
+        self.assertNotIdentical(new, old)
+        self.assertIdentical(new.subdirectories["img"],
+                             old.subdirectories["img"])
+        self.assertIdentical(new.entries, old.entries)
+        self.assertIdentical(new.matcher, old.matcher)
+
+        js = new.subdirectories["js"]
+        self.assertIdentical(js.match("app.coffee"), js.entries[0])
+
+        # The old tree is untouched.
+        self.assertIdentical(old.subdirectories["js"], oldJs)
+        self.assertEqual(oldJs.entries, oldEntries)
+        self.assertIdentical(oldJs.match("app.coffee"), None)
+
+
+    def test_addedDirectory(self):
+        changes = self._reload(siteConfig + "css/\n    *.css: None\n")
+        self.assertEqual(changes, [(["css"], True)])
+        css = self.live.root.subdirectories["css"]
+        self.assertNotIdentical(css.matcher, None)
+
+
+    def test_removedDirectory(self):
+        changes = self._reload(siteConfig.split("img/")[0])
+        self.assertEqual(changes, [(["img"], True)])
+        self.assertNotIn("img", self.live.root.subdirectories)
+
+
+    def test_selectiveInvalidation(self):
+        resolver = self.live.resolver
+        for path in "/js/app.js", "/img/logo.png", "/css/style.css":
+            self.live.resolve(path)
+
+        changed = siteConfig.replace("*.js", "*.{js,coffee}")
+        self._reload(changed + "css/\n    *.css: None\n")
+
+        self.live.resolve("/img/logo.png")
+        self.assertEqual(resolver.hits, 1)
+        self.live.resolve("/js/app.js")
+        entry, _ = self.live.resolve("/css/style.css")
+        self.assertEqual(resolver.hits, 1)
+        self.assertEqual(entry.source, "*.css")
+
+
+    def test_parseError(self):
+        root = self.live.root
+        self.assertEqual(self._reload("js/\n    *.js:Nope\n"), [])
+        self.assertIdentical(self.live.root, root)
+        self.assertEqual(len(self.flushLoggedErrors(config.ParseError)), 1)
+
+
+    def test_removedRuleOutput(self):
+        cache = caching.OutputCache()
+        self.patch(processing, "cache", cache)
+        jsKey = processing.cacheKey("d", "JavascriptSomething", [], {})
+        pngKey = processing.cacheKey("d", "PNGOptimizer", [], {"level": 3})
+        cache.put(jsKey, b"js")
+        cache.put(pngKey, b"png")
+        cache.put(pngKey + ("gzip",), b"png.gz")
+
+        self._reload(siteConfig.replace("level=3", "level=4"))
+        self.assertEqual(cache.get(jsKey), b"js")
+        self.assertIdentical(cache.get(pngKey), None)
+        self.assertIdentical(cache.get(pngKey + ("gzip",)), None)
+
+
+    def test_watch(self):
+        clock = task.Clock()
+        call = self.live.watch(1.0, clock)
+        self.addCleanup(call.stop)
+        root = self.live.root
+
+        clock.advance(1.0)
+        self.assertIdentical(self.live.root, root)
+
+        self._writeConfig(siteConfig + "css/\n    *.css: None\n")
+        clock.advance(1.0)
+        self.assertIn("css", self.live.root.subdirectories)
+
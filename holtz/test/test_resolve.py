@@ -0,0 +1,107 @@
+from twisted.trial import unittest
+
+from holtz import compat, config, resolve
+
+siteConfig = """
+index.html: None
+js/
+    *.js: JavascriptSomething()
+    vendor/
+        jquery.js: None
+img/
+    *.png: PNGOptimizer()
+""".lstrip("\n")
+
+
+
+def _parse(text):
+    parser = config.Parser()
+    for line in compat.StringIO(text):
+        parser.push(line)
+    parser.push("")
+    return parser.root
+
+
+
+class PathResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.root = _parse(siteConfig)
+        self.resolver = resolve.PathResolver(self.root, cacheSize=2)
+
+
+    def assertResolvesTo(self, path, entry):
+        self.assertEqual(self.resolver.resolve(path), (entry, entry.effect))
+
+
+    def assertUnresolved(self, path):
+        self.assertEqual(self.resolver.resolve(path), (None, None))
+
+
+    def test_topLevel(self):
+        self.assertResolvesTo("/index.html", self.root.entries[0])
+
+
+    def test_nested(self):
+        js = self.root.subdirectories["js"]
+        vendor = js.subdirectories["vendor"]
+        self.assertResolvesTo("/js/app.js", js.entries[0])
+        self.assertResolvesTo("js/vendor/jquery.js", vendor.entries[0])
+
+
+    def test_missingDirectory(self):
+        self.assertUnresolved("/css/style.css")
+
+
+    def test_noMatchingEntry(self):
+        self.assertUnresolved("/img/logo.gif")
+        self.assertUnresolved("/js/")
+
+
+    def test_hitsAndMisses(self):
+        self.resolver.resolve("/index.html")
+        self.resolver.resolve("/index.html")
+        self.resolver.resolve("/nope")
+        self.resolver.resolve("/nope")
+        self.assertEqual(self.resolver.hits, 2)
+        self.assertEqual(self.resolver.misses, 2)
+
+
+    def test_leastRecentlyUsedEviction(self):
+        self.resolver.resolve("/a.html")
+        self.resolver.resolve("/b.html")
+        self.resolver.resolve("/a.html")
+        self.resolver.resolve("/c.html") # evicts /b.html
+
+        self.resolver.resolve("/a.html")
+        self.assertEqual(self.resolver.hits, 2)
+        self.resolver.resolve("/b.html")
+        self.assertEqual(self.resolver.misses, 4)
+
+
+    def test_clear(self):
+        self.resolver.resolve("/index.html")
+        self.resolver.clear()
+        self.assertEqual((self.resolver.hits, self.resolver.misses), (0, 0))
+        self.resolver.resolve("/index.html")
+        self.assertEqual(self.resolver.misses, 1)
+
+
+    def test_invalidate(self):
+        self.resolver.cacheSize = 10
+        self.resolver.resolve("/js/app.js")
+        self.resolver.resolve("/js/vendor/jquery.js")
+        self.resolver.invalidate(["js"])
+        self.resolver.resolve("/js/vendor/jquery.js")
+        self.assertEqual(self.resolver.hits, 1)
+        self.resolver.resolve("/js/app.js")
+        self.assertEqual(self.resolver.misses, 3)
+
+
+    def test_invalidateRecursive(self):
+        self.resolver.cacheSize = 10
+        self.resolver.resolve("/index.html")
+        self.resolver.resolve("/js/vendor/jquery.js")
+        self.resolver.invalidate(["js"], recursive=True)
+        self.resolver.resolve("/js/vendor/jquery.js")
+        self.resolver.resolve("/index.html")
+        self.assertEqual((self.resolver.hits, self.resolver.misses), (1, 3))
@@ -0,0 +1,164 @@
+from twisted.internet import defer
+from twisted.python import filepath
+from twisted.trial import unittest
+from twisted.web import server as web
+from twisted.web.test.requesthelper import DummyRequest
+
+from holtz import caching, compat, config, execution, processing, resolve
+from holtz import server, stats
+
+siteConfig = """
+*.html: None
+docs/
+    all.txt: Bundle("*.txt")
+    *.txt: None
+""".lstrip("\n")
+
+
+
+class LookupTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = filepath.FilePath(self.mktemp())
+        self.directory.child("docs").makedirs()
+        self.directory.child("index.html").setContent(b"<p>hello</p>")
+        self.directory.child("docs").child("a b.txt").setContent(b"ab")
+        root = config.parse(compat.StringIO(siteConfig))
+        self.tree = resolve.PathResolver(root)
+        self.patch(processing, "files", caching.FileCache())
+
+
+    def _lookup(self, path):
+        return server.lookup(self.tree, self.directory, path)
+
+
+    def test_found(self):
+        filePath, effect = self._lookup(b"/index.html")
+        self.assertEqual(filePath, self.directory.child("index.html"))
+        self.assertIdentical(effect, self.tree.root.entries[0].effect)
+
+
+    def test_quoted(self):
+        filePath, _ = self._lookup("/docs/a%20b.txt")
+        self.assertEqual(filePath.basename(), "a b.txt")
+
+
+    def test_unhandled(self):
+        self.assertEqual(self._lookup("/index.css"), (None, None))
+
+
+    def test_missingFile(self):
+        self.assertEqual(self._lookup("/missing.html"), (None, None))
+
+
+    def test_directory(self):
+        self.directory.child("dir.html").makedirs()
+        self.assertEqual(self._lookup("/dir.html"), (None, None))
+
+
+    def test_insecure(self):
+        self.assertEqual(self._lookup("/docs/../../x.txt"), (None, None))
+
+
+    def test_bundle(self):
+        """
+        Bundles are found with or without a fingerprint, without a file.
+        """
+        docs = self.tree.root.subdirectories["docs"]
+        for name in "all.txt", "all.0123456789abcdef.txt":
+            filePath, effect = self._lookup("/docs/" + name)
+            self.assertEqual(filePath.segmentsFrom(self.directory),
+                             ["docs", name])
+            self.assertIdentical(effect, docs.entries[0].effect)
+
+
+    def test_fingerprintedFile(self):
+        """
+        Names that only look fingerprinted are files like any other.
+        """
+        name = "a.0123456789abcdef.txt"
+        self.directory.child("docs").child(name).setContent(b"a")
+        collector = stats.Collector()
+        self.patch(stats, "collector", collector)
+        filePath, effect = self._lookup("/docs/" + name)
+        self.assertEqual(filePath.basename(), name)
+        docs = self.tree.root.subdirectories["docs"]
+        self.assertIdentical(effect, docs.entries[1].effect)
+
+        self.assertEqual(collector.ruleHits, {("docs/", "*.txt"): 1})
+        self.assertEqual(self.tree.misses, 1)
+        self.assertEqual(list(self.tree._cache), ["/docs/" + name])
+
+
+    def test_fingerprintedBundleRecordedOnce(self):
+        collector = stats.Collector()
+        self.patch(stats, "collector", collector)
+        self._lookup("/docs/all.0123456789abcdef.txt")
+        self.assertEqual(collector.ruleHits, {("docs/", "all.txt"): 1})
+
+
+
+class HoltzResourceTest(LookupTest):
+    def setUp(self):
+        LookupTest.setUp(self)
+        self.patch(processing, "digests", caching.DigestCache())
+        synchronous = lambda f, *args: defer.maybeDeferred(f, *args)
+        self.patch(processing, "executor", execution.Executor(synchronous))
+        self.resource = server.HoltzResource(self.tree, self.directory, {})
+
+
+    def _render(self, path):
+        request = DummyRequest(path.lstrip(b"/").split(b"/"))
+        request.path = path
+        result = self.resource.render_GET(request)
+        return request, result
+
+
+    def test_render(self):
+        request, result = self._render(b"/index.html")
+        self.assertEqual(result, web.NOT_DONE_YET)
+        self.assertEqual(request.finished, 1)
+        self.assertEqual(b"".join(request.written), b"<p>hello</p>")
+
+
+    def test_notFound(self):
+        request, _ = self._render(b"/index.css")
+        self.assertEqual(request.responseCode, 404)
+
+
+    def _renderFailing(self, startedWriting):
+        fail = lambda *args: defer.fail(RuntimeError("processing failed"))
+        filePath = self.directory.child("index.html")
+        self.patch(server, "lookup", lambda *args: (filePath, fail))
+
+        request = DummyRequest([b"index.html"])
+        request.path = b"/index.html"
+        request.startedWriting = startedWriting
+        request.transport = _Transport()
+        self.resource.render_GET(request)
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+        return request
+
+
+    def test_failed(self):
+        request = self._renderFailing(False)
+        self.assertEqual(request.responseCode, 500)
+        self.assertEqual(request.finished, 1)
+        self.assertFalse(request.transport.aborted)
+
+
+    def test_failedWhileWriting(self):
+        """
+        Requests that fail after part of the body was written are cut
+        short, not finished.
+        """
+        request = self._renderFailing(True)
+        self.assertTrue(request.transport.aborted)
+        self.assertEqual(request.finished, 0)
+
+
+
+class _Transport(object):
+    aborted = False
+
+    def abortConnection(self):
+        self.aborted = True
@@ -0,0 +1,127 @@
+import io
+import json
+
+from twisted.internet import defer, task
+from twisted.trial import unittest
+from twisted.web.test.requesthelper import DummyRequest
+
+from holtz import compat, config, resolve, stats, transfer
+
+siteConfig = """
+index.html: None
+js/
+    *.js: Minify()
+""".lstrip("\n")
+
+
+
+class HistogramTest(unittest.TestCase):
+    def test_record(self):
+        histogram = stats.Histogram(bounds=(1.0, 2.0))
+        for seconds in 0.5, 1.0, 1.5, 3.0:
+            histogram.record(seconds)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 4)
+        self.assertEqual(snapshot["total"], 6.0)
+        self.assertEqual(snapshot["buckets"],
+                         [(1.0, 2), (2.0, 1), (None, 1)])
+
+
+
+class CollectorTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.collector = stats.Collector(clock=self.clock.seconds)
+        self.patch(stats, "collector", self.collector)
+        self.root = config.parse(compat.StringIO(siteConfig))
+        self.resolver = resolve.PathResolver(self.root)
+
+
+    def _rules(self):
+        snapshot = self.collector.snapshot(self.root)
+        return dict(((rule["directory"], rule["condition"]), rule)
+                    for rule in snapshot["rules"])
+
+
+    def test_ruleHits(self):
+        self.resolver.resolve("/js/app.js")
+        self.resolver.resolve("/js/app.js")
+        self.resolver.resolve("/nope.css")
+
+        rules = self._rules()
+        self.assertEqual(rules["js/", "*.js"]["hits"], 2)
+        self.assertEqual(rules["js/", "*.js"]["processor"], "Minify")
+        self.assertEqual(self.collector.resolving.count, 3)
+        self.assertEqual(self.collector.unmatched, 1)
+
+
+    def test_matchingTimedSeparately(self):
+        """
+        Only resolutions that weren't cached match names against rules.
+        """
+        self.resolver.resolve("/js/app.js")
+        self.resolver.resolve("/js/app.js")
+        self.assertEqual(self.collector.resolving.count, 2)
+        self.assertEqual(self.collector.matching.count, 1)
+
+
+    def test_reloadedRules(self):
+        """
+        Rules are counted by their directory and condition, so counts carry
+        over to a reloaded tree, and no entries are kept alive.
+        """
+        self.resolver.resolve("/js/app.js")
+        self.root = config.parse(compat.StringIO(siteConfig))
+        resolve.PathResolver(self.root).resolve("/js/app.js")
+        self.assertEqual(self._rules()["js/", "*.js"]["hits"], 2)
+        self.assertEqual(list(self.collector.ruleHits), [("js/", "*.js")])
+
+
+    def test_chainName(self):
+        """
+        Rules with a chain of processors are listed under the same name
+        their effect records requests under.
+        """
+        self.root = config.parse(["*.css: Minify(Concat(), 1)\n"])
+        rules = self._rules()
+        self.assertEqual(rules["", "*.css"]["processor"], "Minify(Concat)")
+
+
+    def test_deadRules(self):
+        """
+        Rules that were never hit are in the snapshot with no hits.
+        """
+        self.assertEqual(self._rules()["", "index.html"]["hits"], 0)
+
+
+    def test_handled(self):
+        d = defer.Deferred()
+        d.addBoth(self.collector.handled, "Minify", self.clock.seconds())
+        self.clock.advance(0.2)
+        d.callback("result")
+
+        self.assertEqual(self.successResultOf(d), "result")
+        histogram = self.collector.processors["Minify"]
+        self.assertEqual((histogram.count, histogram.total), (1, 0.2))
+
+
+    def test_bytesSent(self):
+        request = DummyRequest([b""])
+        f = io.BytesIO(b"hello")
+        self.successResultOf(transfer.beginTransfer(f, request))
+        config._writeBody(b"abc", request)
+        self.assertEqual(self.collector.bytesSent, 8)
+
+
+    def test_resource(self):
+        self.resolver.resolve("/index.html")
+        request = DummyRequest([b""])
+        body = stats.StatsResource(self.resolver).render_GET(request)
+
+        snapshot = json.loads(body.decode("utf-8"))
+        self.assertEqual(snapshot["resolving"]["count"], 1)
+        self.assertEqual(snapshot["matching"]["count"], 1)
+        self.assertEqual(len(snapshot["rules"]), 2)
+        self.assertEqual(request.responseHeaders.getRawHeaders(
+            b"content-type"), [b"application/json"])
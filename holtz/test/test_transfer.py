@@ -0,0 +1,282 @@
+import io
+import socket
+
+from twisted.internet import defer
+from twisted.trial import unittest
+from twisted.web.test.requesthelper import DummyRequest
+
+from holtz import transfer
+
+content = b"".join(b"%04d" % i for i in range(50000))
+
+
+
+class _TransferTestMixin(object):
+    def setUp(self):
+        path = self.mktemp()
+        with open(path, "wb") as f:
+            f.write(content)
+        self.file = open(path, "rb")
+        self.addCleanup(self.file.close)
+        self.request = DummyRequest([b""])
+
+
+    def contentLength(self):
+        headers = self.request.responseHeaders
+        return headers.getRawHeaders(b"content-length")[0]
+
+
+
+class BeginTransferTest(_TransferTestMixin, unittest.TestCase):
+    def test_read(self):
+        d = transfer.beginTransfer(self.file, self.request)
+        self.assertEqual(self.successResultOf(d), None)
+        self.assertEqual(b"".join(self.request.written), content)
+        self.assertEqual(self.contentLength(), b"%d" % len(content))
+        self.assertFalse(self.file.closed)
+
+
+    def test_head(self):
+        self.request.method = b"HEAD"
+        d = transfer.beginTransfer(self.file, self.request)
+        self.assertEqual(self.successResultOf(d), None)
+        self.assertEqual(b"".join(self.request.written), b"")
+        self.assertEqual(self.contentLength(), b"%d" % len(content))
+
+
+    def test_empty(self):
+        path = self.mktemp()
+        open(path, "wb").close()
+        with open(path, "rb") as f:
+            d = transfer.beginTransfer(f, self.request)
+        self.assertEqual(self.successResultOf(d), None)
+        self.assertEqual(self.contentLength(), b"0")
+
+
+    def test_small(self):
+        """
+        Files that fit in a chunk are written at once.
+        """
+        path = self.mktemp()
+        with open(path, "wb") as f:
+            f.write(b"small")
+        with open(path, "rb") as f:
+            d = transfer.beginTransfer(f, self.request)
+        self.assertEqual(self.successResultOf(d), None)
+        self.assertEqual(self.request.written, [b"small"])
+
+
+    def test_noDescriptor(self):
+        """
+        Files without a descriptor are sent with a FileSender.
+        """
+        f = io.BytesIO(content)
+        d = transfer.beginTransfer(f, self.request)
+        self.successResultOf(d)
+        self.assertEqual(b"".join(self.request.written), content)
+
+
+
+class _FakeSocketTransport(object):
+    def __init__(self, sock):
+        self.socket = sock
+        self.dataBuffer = b""
+        self.offset = 0
+        self.writes = 0
+
+
+    def fileno(self):
+        return self.socket.fileno()
+
+
+    def startWriting(self):
+        self.writes += 1
+
+
+
+class _FakeRequest(object):
+    method = b"GET"
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.headers = {}
+        self.producer = None
+        self.written = []
+
+
+    def setHeader(self, name, value):
+        self.headers[name] = value
+
+
+    def write(self, data):
+        self.written.append(data)
+
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+
+    def unregisterProducer(self):
+        self.producer = None
+
+
+
+class SendfileTest(_TransferTestMixin, unittest.TestCase):
+    if transfer._sendfile is None:
+        skip = "os.sendfile is not available"
+
+    def setUp(self):
+        _TransferTestMixin.setUp(self)
+        self.server, self.client = socket.socketpair()
+        self.addCleanup(self.server.close)
+        self.addCleanup(self.client.close)
+        self.transport = _FakeSocketTransport(self.server)
+        self.request = _FakeRequest(self.transport)
+
+
+    def test_sendfile(self):
+        d = transfer.beginTransfer(self.file, self.request)
+        received = []
+        while self.request.producer is not None:
+            self.request.producer.resumeProducing()
+            received.append(self.client.recv(len(content)))
+        self.successResultOf(d)
+
+        self.client.setblocking(False)
+        try:
+            received.append(self.client.recv(len(content)))
+        except socket.error:
+            pass
+        self.assertEqual(b"".join(received), content)
+
+
+    def test_waitsForBufferedData(self):
+        """
+        Nothing is sent while the transport still has buffered data.
+        """
+        self.transport.dataBuffer = b"headers"
+        transfer.beginTransfer(self.file, self.request)
+        self.request.producer.resumeProducing()
+        self.server.setblocking(False)
+        self.client.setblocking(False)
+        self.assertRaises(socket.error, self.client.recv, 1)
+
+
+
+class ReadProducerTest(_TransferTestMixin, unittest.TestCase):
+    def test_truncated(self):
+        """
+        Files that are truncated while they're being sent end the transfer
+        with an EOFError.
+        """
+        request = _FakeRequest(None)
+        def write(data):
+            request.written.append(data)
+            open(self.file.name, "wb").close()
+        request.write = write
+
+        producer = transfer.ReadProducer(self.file, request, 0, len(content))
+        self.failureResultOf(producer.begin(), EOFError)
+        self.assertEqual(request.written, [content[:transfer.CHUNK_SIZE]])
+        self.assertIdentical(request.producer, None)
+
+
+
+class ChunkProducerTest(unittest.TestCase):
+    def setUp(self):
+        self.request = _FakeRequest(None)
+        self.fetches = []
+        self.closed = []
+
+
+    def _chunks(self, chunks):
+        try:
+            for chunk in chunks:
+                yield chunk
+        finally:
+            self.closed.append(True)
+
+
+    def _fetch(self, chunks):
+        d = defer.Deferred()
+        self.fetches.append((d, chunks))
+        return d
+
+
+    def _fetchNext(self):
+        d, chunks = self.fetches.pop(0)
+        d.callback(next(chunks, None))
+
+
+    def _begin(self, chunks, fetch=None):
+        producer = transfer.ChunkProducer(self._chunks(chunks), self.request,
+                                          fetch or self._fetch)
+        return producer, producer.begin()
+
+
+    def test_chunks(self):
+        _, d = self._begin([b"a", b"b"])
+        self._fetchNext()
+        self.assertEqual(self.request.written, [b"a"])
+        self.assertNotIn("Content-Length", self.request.headers)
+        self._fetchNext()
+        self._fetchNext()
+        self.successResultOf(d)
+        self.assertEqual(self.request.written, [b"a", b"b"])
+        self.assertIdentical(self.request.producer, None)
+        self.assertEqual(self.closed, [True])
+
+
+    def test_synchronous(self):
+        """
+        Chunks that are fetched synchronously are all sent, without
+        recursing once per chunk.
+        """
+        chunks = [b"x"] * 5000
+        fetch = lambda chunks: defer.succeed(next(chunks, None))
+        _, d = self._begin(chunks, fetch)
+        self.successResultOf(d)
+        self.assertEqual(len(self.request.written), 5000)
+
+
+    def test_pause(self):
+        producer, _ = self._begin([b"a", b"b"])
+        self._fetchNext()
+        producer.pauseProducing()
+        self._fetchNext()
+        self.assertEqual(self.fetches, [])
+        producer.resumeProducing()
+        self.assertEqual(len(self.fetches), 1)
+
+
+    def test_empty(self):
+        _, d = self._begin([])
+        self._fetchNext()
+        self.successResultOf(d)
+        self.assertEqual(self.request.headers["Content-Length"], "0")
+        self.assertIdentical(self.request.producer, None)
+
+
+    def test_firstFetchFails(self):
+        """
+        Nothing is written if the first chunk can't be fetched.
+        """
+        _, d = self._begin([b"a"])
+        self.fetches.pop(0)[0].errback(ZeroDivisionError())
+        self.failureResultOf(d, ZeroDivisionError)
+        self.assertEqual(self.request.written, [])
+
+
+    def test_stopWhileFetching(self):
+        """
+        The iterator is closed once a chunk being fetched when the producer
+        is stopped arrives, and not before.
+        """
+        producer, d = self._begin([b"a", b"b"])
+        self._fetchNext()
+        producer.stopProducing()
+        self.failureResultOf(d)
+        self.assertEqual(self.closed, [])
+        self._fetchNext()
+        self.assertEqual(self.closed, [True])
+        self.assertEqual(self.request.written, [b"a"])
@@ -0,0 +1,445 @@
+"""
+Sending files, and bodies that are made as they're sent, as responses.
+"""
+import errno
+import os
+
+from twisted.internet import defer, interfaces
+from twisted.protocols import basic
+from zope.interface import Interface, implementer
+
+from holtz import stats
+
+
+CHUNK_SIZE = 2 ** 16
+
+_sendfile = getattr(os, "sendfile", None)
+_pread = getattr(os, "pread", None)
+
+
+
+def beginTransfer(f, request):
+    """
+    Sends an open file as the body of a response.
+
+    Files without a descriptor are sent with a FileSender. Other files are
+    sent with L{sendRange}.
+
+    Returns a Deferred that fires when the file has been sent. The file is
+    left open, and its position isn't used.
+    """
+    fileno = _fileno(f)
+    if fileno is None:
+        d = basic.FileSender().beginFileTransfer(f, request)
+        return d.addCallback(lambda _: stats.collector.sent(f.tell()))
+
+    size = os.fstat(fileno).st_size
+    request.setHeader("Content-Length", str(size))
+
+    if getattr(request, "method", None) == b"HEAD" or size == 0:
+        request.write(b"")
+        return defer.succeed(None)
+
+    return sendRange(f, request, 0, size)
+
+
+
+def sendBytes(data, request):
+    """
+    Sends some bytes as the body of a response.
+
+    Returns a Deferred that fires when they have been sent.
+    """
+    request.setHeader("Content-Length", str(len(data)))
+    if getattr(request, "method", None) == b"HEAD" or not data:
+        request.write(b"")
+        return defer.succeed(None)
+
+    return sendRange(data, request, 0, len(data))
+
+
+
+def send(source, request):
+    """
+    Sends bytes or an open file as the body of a response.
+    """
+    if isinstance(source, bytes):
+        return sendBytes(source, request)
+    return beginTransfer(source, request)
+
+
+
+def sourceSize(source):
+    """
+    Returns the size of some bytes or an open file with a descriptor.
+
+    Returns None for files without a descriptor.
+    """
+    if isinstance(source, bytes):
+        return len(source)
+    fileno = _fileno(source)
+    if fileno is None:
+        return None
+    return os.fstat(fileno).st_size
+
+
+
+def sendRange(source, request, offset, length):
+    """
+    Sends a range of some bytes, or of an open file with a descriptor, as
+    (part of) the body of a response whose headers are already set.
+
+    Ranges that fit in a chunk are read and written in one go, so they can
+    go out along with the headers. Sending larger ranges of files is left to
+    the request if it can send files itself. If the request's transport is a
+    plain socket, they're sent with sendfile, without copying them through
+    Python. Otherwise, they're read and written a chunk at a time.
+
+    Returns a Deferred that fires when the range has been sent.
+    """
+    if isinstance(source, bytes):
+        request.write(source[offset:offset + length])
+        d = defer.succeed(None)
+    elif length <= CHUNK_SIZE:
+        d = _writeSmallRange(source, request, offset, length)
+    elif IFileSendingRequest.providedBy(request):
+        d = request.sendFile(source, offset, length)
+    else:
+        transport = _socketTransport(request)
+        if transport is not None:
+            producer = SendfileProducer(source, request, transport,
+                                        offset, length)
+        else:
+            producer = ReadProducer(source, request, offset, length)
+        d = producer.begin()
+    return d.addCallback(lambda _: stats.collector.sent(length))
+
+
+
+def _writeSmallRange(f, request, offset, length):
+    data = _readAt(f, offset, length)
+    if len(data) != length:
+        return defer.fail(EOFError("File ended before the transfer did"))
+    request.write(data)
+    return defer.succeed(None)
+
+
+
+def _readAt(f, offset, length):
+    """
+    Reads up to length bytes of a file, starting at an offset.
+
+    The file may be shared with other transfers, so every read says where
+    it starts.
+    """
+    if _pread is not None:
+        fileno = _fileno(f)
+        if fileno is not None:
+            return _pread(fileno, length, offset)
+    f.seek(offset)
+    return f.read(length)
+
+
+
+class IFileSendingRequest(Interface):
+    """
+    A request that can send a range of a file as its body by itself.
+    """
+    def sendFile(f, offset, length):
+        """
+        Sends a range of an open file, after the response headers.
+
+        Returns a Deferred that fires when the range has been sent.
+        """
+
+
+
+def _fileno(f):
+    """
+    Returns the file descriptor for a file, or None if it doesn't have one.
+    """
+    try:
+        return f.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+
+
+
+def _socketTransport(request):
+    """
+    Returns the request's transport if sendfile can write to it directly.
+    """
+    if _sendfile is None:
+        return None
+
+    transport = getattr(request, "transport", None)
+    if transport is None or interfaces.ISSLTransport.providedBy(transport):
+        return None
+    if _fileno(transport) is None or not hasattr(transport, "startWriting"):
+        return None
+    return transport
+
+
+
+def _hasBufferedData(transport):
+    """
+    Checks if a transport still has data waiting to be written.
+
+    Data written with sendfile bypasses the transport's buffer, so it may
+    only be written once everything written before it, like the response
+    headers, has gone out.
+    """
+    buffered = len(getattr(transport, "dataBuffer", b""))
+    buffered -= getattr(transport, "offset", 0)
+    return buffered > 0 or getattr(transport, "_tempDataLen", 0) > 0
+
+
+
+class _RangeProducer(object):
+    """
+    A producer for a range of bytes from a file.
+    """
+    streaming = False
+
+    def __init__(self, f, request, offset, length):
+        self.file = f
+        self.request = request
+        self.offset = offset
+        self.remaining = length
+        self.deferred = defer.Deferred()
+        self._done = False
+
+
+    def begin(self):
+        """
+        Starts sending the range.
+
+        Returns a Deferred that fires when the range has been sent.
+        """
+        self.request.registerProducer(self, self.streaming)
+        return self.deferred
+
+
+    def _finish(self, failure=None):
+        if self._done:
+            return
+        self._done = True
+        self._close()
+        self.request.unregisterProducer()
+        if failure is None:
+            self.deferred.callback(None)
+        else:
+            self.deferred.errback(failure)
+
+
+    def _close(self):
+        pass
+
+
+    def stopProducing(self):
+        self._finish(Exception("Consumer asked producer to stop"))
+
+
+
+@implementer(interfaces.IPullProducer)
+class SendfileProducer(_RangeProducer):
+    """
+    Sends a range of a file straight from the kernel to a socket transport.
+    """
+    def __init__(self, f, request, transport, offset, length):
+        _RangeProducer.__init__(self, f, request, offset, length)
+        self.transport = transport
+
+
+    def begin(self):
+        # The headers and the file go out in separate writes. Don't let
+        # Nagle's algorithm hold the file back until the headers are acked.
+        setTcpNoDelay = getattr(self.transport, "setTcpNoDelay", None)
+        if setTcpNoDelay is not None:
+            setTcpNoDelay(True)
+
+        self.request.write(b"") # make sure the headers go out first
+        return _RangeProducer.begin(self)
+
+
+    def resumeProducing(self):
+        if self._done or _hasBufferedData(self.transport):
+            return
+
+        try:
+            sent = _sendfile(self.transport.fileno(), self.file.fileno(),
+                             self.offset, min(self.remaining, CHUNK_SIZE))
+        except EnvironmentError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self._finish(e)
+                return
+            sent = None
+
+        if sent == 0:
+            self._finish(EOFError("File ended before the transfer did"))
+            return
+
+        if sent is not None:
+            self.offset += sent
+            self.remaining -= sent
+            if not self.remaining:
+                self._finish()
+                return
+
+        # Ask to be resumed once the socket is writable again.
+        self.transport.startWriting()
+
+
+
+@implementer(interfaces.IPushProducer)
+class ReadProducer(_RangeProducer):
+    """
+    Sends a range of a file in chunks read from it one at a time.
+
+    Every chunk is read at its own offset, so a file that is truncated in
+    the meantime ends the transfer with an EOFError, where slicing a memory
+    map of it would kill the process with SIGBUS.
+
+    Chunks are written until the consumer pauses the producer. twisted.web
+    resumes pull producers through a cooperator, which would wait for the
+    next scheduling slice after every chunk.
+    """
+    streaming = True
+
+    def begin(self):
+        self._paused = False
+        d = _RangeProducer.begin(self)
+        self._produce() # unless registering paused us already
+        return d
+
+
+    def pauseProducing(self):
+        self._paused = True
+
+
+    def resumeProducing(self):
+        self._paused = False
+        self._produce()
+
+
+    def _produce(self):
+        while not self._done and not self._paused:
+            size = min(self.remaining, CHUNK_SIZE)
+            chunk = _readAt(self.file, self.offset, size)
+            if not chunk:
+                self._finish(EOFError("File ended before the transfer did"))
+                return
+
+            self.offset += len(chunk)
+            self.remaining -= len(chunk)
+            self.request.write(chunk)
+            if not self.remaining:
+                self._finish()
+
+
+
+@implementer(interfaces.IPushProducer)
+class ChunkProducer(object):
+    """
+    Sends chunks of a response body as they're fetched, without a
+    Content-Length.
+
+    Chunks are fetched one at a time with a function that takes the
+    iterator they come from and returns a Deferred that fires with the next
+    chunk, or None once there are no more. Nothing is fetched while the
+    consumer has paused the producer. If fetching the first chunk fails,
+    nothing is written at all.
+    """
+    def __init__(self, chunks, request, fetch):
+        self.chunks = chunks
+        self.request = request
+        self.fetch = fetch
+        self.sent = 0
+        self.deferred = defer.Deferred()
+        self._registered = self._paused = self._done = False
+        self._fetching = self._producing = False
+
+
+    def begin(self):
+        """
+        Starts fetching and sending chunks.
+
+        Returns a Deferred that fires when they have all been sent.
+        """
+        self._produce()
+        return self.deferred
+
+
+    def pauseProducing(self):
+        self._paused = True
+
+
+    def resumeProducing(self):
+        self._paused = False
+        self._produce()
+
+
+    def stopProducing(self):
+        self._finish(Exception("Consumer asked producer to stop"))
+
+
+    def _produce(self):
+        # Chunks that are fetched synchronously are written in this loop
+        # rather than recursively.
+        if self._producing:
+            return
+        self._producing = True
+        try:
+            while not (self._paused or self._fetching or self._done):
+                self._fetching = True
+                d = self.fetch(self.chunks)
+                d.addCallbacks(self._fetched, self._failed)
+        finally:
+            self._producing = False
+
+
+    def _fetched(self, chunk):
+        self._fetching = False
+        if self._done:
+            self._close() # stopped while the chunk was being fetched
+            return
+
+        if chunk is None:
+            if not self._registered:
+                self.request.setHeader("Content-Length", "0")
+                self.request.write(b"")
+            self._finish()
+            return
+
+        if not self._registered:
+            self._registered = True
+            self.request.registerProducer(self, True)
+        self.sent += len(chunk)
+        self.request.write(chunk)
+        self._produce()
+
+
+    def _failed(self, failure):
+        self._fetching = False
+        self._finish(failure)
+
+
+    def _finish(self, failure=None):
+        if self._done:
+            return
+        self._done = True
+        if not self._fetching:
+            self._close()
+        if self._registered:
+            self.request.unregisterProducer()
+        stats.collector.sent(self.sent)
+        if failure is None:
+            self.deferred.callback(None)
+        else:
+            self.deferred.errback(failure)
+
+
+    def _close(self):
+        close = getattr(self.chunks, "close", None)
+        if close is not None:
+            close()